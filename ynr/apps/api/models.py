@@ -1 +1,51 @@
-# Create your models here.
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.next.cache import invalidate_serializer_cache
+from candidates.models import Ballot
+from official_documents.models import OfficialDocument
+from people.models import Person, PersonIdentifier, PersonImage
+from popolo.models import Membership
+from uk_results.models import ResultSet
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def invalidate_person(sender, instance, **kwargs):
+    invalidate_serializer_cache("person", [instance.pk])
+    # Ballots list the name of each candidate
+    invalidate_serializer_cache(
+        "ballot",
+        Membership.objects.filter(person_id=instance.pk).values_list(
+            "ballot_id", flat=True
+        ),
+    )
+
+
+@receiver(post_save, sender=PersonImage)
+@receiver(post_delete, sender=PersonImage)
+@receiver(post_save, sender=PersonIdentifier)
+@receiver(post_delete, sender=PersonIdentifier)
+def invalidate_person_details(sender, instance, **kwargs):
+    invalidate_serializer_cache("person", [instance.person_id])
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_membership(sender, instance, **kwargs):
+    invalidate_serializer_cache("person", [instance.person_id])
+    invalidate_serializer_cache("ballot", [instance.ballot_id])
+
+
+@receiver(post_save, sender=Ballot)
+@receiver(post_delete, sender=Ballot)
+def invalidate_ballot(sender, instance, **kwargs):
+    invalidate_serializer_cache("ballot", [instance.pk])
+
+
+@receiver(post_save, sender=ResultSet)
+@receiver(post_delete, sender=ResultSet)
+@receiver(post_save, sender=OfficialDocument)
+@receiver(post_delete, sender=OfficialDocument)
+def invalidate_ballot_details(sender, instance, **kwargs):
+    invalidate_serializer_cache("ballot", [instance.ballot_id])
@@ -0,0 +1,146 @@
+"""
+A cache of the serialized form of objects in the API.
+
+Building the nested representation of people and ballots needs a stack of
+prefetches and a lot of model instances. The serialized data for each object
+is cached instead, keyed on its primary key, and list and detail views are
+built from the cached data. The signal handlers in `api.models` invalidate
+objects when they, or anything shown with them, change.
+
+Each object also has a version in the cache, which is changed when it's
+invalidated, and cached data is only used if it was built at the current
+version. A request that read from the database before a change was
+committed can still cache what it read after the invalidation, but that
+data has the old version, so it isn't used.
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework.response import Response
+
+# Things we don't invalidate on (party names, for example) can go stale, so
+# don't keep anything for too long
+SERIALIZER_CACHE_TIMEOUT = 60 * 60
+
+
+def serializer_cache_key(kind, pk):
+    return "api-next-{}-{}".format(kind, pk)
+
+
+def serializer_cache_version_key(kind, pk):
+    return "api-next-{}-{}-version".format(kind, pk)
+
+
+def invalidate_serializer_cache(kind, pks):
+    """
+    Change the version of each of `pks`, and remove their cached data, once
+    the current transaction is committed.
+
+    Changing the version stops data read before the change from being used,
+    even if it's cached after this.
+
+    `pks` can be a queryset, which isn't evaluated until then.
+    """
+
+    def invalidate():
+        pks_to_invalidate = [pk for pk in pks if pk]
+        if not pks_to_invalidate:
+            return
+        version = uuid.uuid4().hex
+        cache.set_many(
+            {
+                serializer_cache_version_key(kind, pk): version
+                for pk in pks_to_invalidate
+            },
+            None,
+        )
+        cache.delete_many(
+            [serializer_cache_key(kind, pk) for pk in pks_to_invalidate]
+        )
+
+    transaction.on_commit(invalidate)
+
+
+class SerializerCacheMixin:
+    """
+    Serve `list` and `retrieve` from the serializer cache.
+
+    Serialized objects contain absolute URLs, so each cache entry holds a
+    copy of the data for each host and format it's been requested with,
+    along with the version of the object it was built at.
+    """
+
+    serializer_cache_kind = None
+
+    def get_serializer_cache_variant(self):
+        return "{}|{}".format(
+            self.request.build_absolute_uri("/"),
+            self.request.query_params.get("format", ""),
+        )
+
+    def get_light_queryset(self):
+        """
+        The view's queryset without the prefetches needed to serialize it,
+        for finding which objects to return.
+        """
+        return self.filter_queryset(self.get_queryset()).prefetch_related(None)
+
+    def get_cached_data(self, objects):
+        """
+        Return the serialized data for each of `objects`, from the cache
+        where possible. Anything not in the cache is fetched from
+        `get_queryset`, serialized and cached.
+
+        The versions are read before the database, so anything changed
+        after that is cached with the old version.
+        """
+        kind = self.serializer_cache_kind
+        variant = self.get_serializer_cache_variant()
+        keys = {obj.pk: serializer_cache_key(kind, obj.pk) for obj in objects}
+        version_keys = {
+            obj.pk: serializer_cache_version_key(kind, obj.pk)
+            for obj in objects
+        }
+        cached = cache.get_many(
+            list(keys.values()) + list(version_keys.values())
+        )
+
+        data = {}
+        entries = {}
+        for pk, key in keys.items():
+            version = cached.get(version_keys[pk])
+            entry = cached.get(key)
+            if not entry or entry["version"] != version:
+                entry = {"version": version, "variants": {}}
+            entries[pk] = entry
+            if variant in entry["variants"]:
+                data[pk] = entry["variants"][variant]
+
+        missing = [pk for pk in keys if pk not in data]
+        if missing:
+            to_cache = {}
+            for obj in self.get_queryset().filter(pk__in=missing):
+                data[obj.pk] = self.get_serializer(obj).data
+                entries[obj.pk]["variants"][variant] = data[obj.pk]
+                to_cache[keys[obj.pk]] = entries[obj.pk]
+            cache.set_many(to_cache, SERIALIZER_CACHE_TIMEOUT)
+
+        return [data[obj.pk] for obj in objects if obj.pk in data]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_light_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_cached_data(page))
+        return Response(self.get_cached_data(list(queryset)))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = get_object_or_404(
+            self.get_light_queryset(),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(request, instance)
+        return Response(self.get_cached_data([instance])[0])
@@ -25,6 +25,44 @@ class ResultsSetPagination(pagination.PageNumberPagination):
     max_page_size = 200
 
 
+class CursorResultsSetPagination(pagination.CursorPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("id",)
+
+
+class CursorPaginationMixin:
+    """
+    Lets API users opt in to cursor pagination by adding `pagination=cursor`
+    to the query string.
+
+    Cursor pages are keyed on `get_cursor_ordering`, so they don't need a
+    `COUNT(*)` or a deep `OFFSET`, and the `next` links stay stable while
+    objects are added. This makes them better for syncing everything in an
+    endpoint.
+    """
+
+    cursor_ordering = ("id",)
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def use_cursor_pagination(self):
+        query_params = self.request.query_params
+        return (
+            query_params.get("pagination") == "cursor"
+            or CursorResultsSetPagination.cursor_query_param in query_params
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and self.use_cursor_pagination():
+            self._paginator = CursorResultsSetPagination()
+            self._paginator.ordering = self.get_cursor_ordering()
+        return super().paginator
+
+
 class OrganizationViewSet(viewsets.ReadOnlyModelViewSet):
 
     queryset = (
@@ -37,7 +75,7 @@ class OrganizationViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = ResultsSetPagination
 
 
-class LoggedActionViewSet(viewsets.ReadOnlyModelViewSet):
+class LoggedActionViewSet(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
     queryset = extra_models.LoggedAction.objects.order_by("id")
     serializer_class = candidates.api.next.serializers.LoggedActionSerializer
     pagination_class = ResultsSetPagination
@@ -1,6 +1,9 @@
 from django.core.files.storage import DefaultStorage
+from django.test import override_settings
 from django_webtest import WebTest
+from mock import patch
 
+from api.next.cache import invalidate_serializer_cache
 from candidates.tests.auth import TestUserMixin
 from candidates.tests.factories import MembershipFactory
 from candidates.tests.helpers import TmpMediaRootMixin
@@ -8,6 +11,7 @@ from candidates.tests.uk_examples import UK2015ExamplesMixin
 from moderation_queue.tests.paths import EXAMPLE_IMAGE_FILENAME
 from official_documents.models import OfficialDocument
 from parties.tests.factories import PartyDescriptionFactory, PartyEmblemFactory
+from people.api.next.api_views import PersonViewSet
 from people.models import PersonImage
 from people.tests.factories import PersonFactory
 
@@ -112,6 +116,113 @@ class TestAPI(TmpMediaRootMixin, TestUserMixin, UK2015ExamplesMixin, WebTest):
         parties_resp = self.app.get("/api/next/parties/")
         self.assertEqual(parties_resp.status_code, 200)
 
+    def test_cursor_pagination(self):
+        people_ids = []
+        url = "/api/next/people/?pagination=cursor&page_size=2"
+        while url:
+            response = self.app.get(url).json
+            self.assertNotIn("count", response)
+            people_ids += [person["id"] for person in response["results"]]
+            url = response["next"]
+        self.assertEqual(people_ids, [818, 2009, 4322, 5163, 5795])
+
+        response = self.app.get("/api/next/ballots/?pagination=cursor").json
+        self.assertNotIn("count", response)
+        self.assertIn("results", response)
+
+        # Without asking for it, page number pagination is still used
+        response = self.app.get("/api/next/people/?page_size=2").json
+        self.assertEqual(response["count"], 5)
+
+    def test_cursor_pagination_updated_gte(self):
+        person = PersonFactory.create(id=1, name="Recently Changed")
+        person.save()
+        response = self.app.get(
+            "/api/next/people/?pagination=cursor&updated_gte=2000-01-01"
+        ).json
+        # Ordered by when people were last changed, rather than ID
+        self.assertEqual(response["results"][-1]["id"], 1)
+        # People with more than one membership are only listed once
+        ids = [person["id"] for person in response["results"]]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+            }
+        }
+    )
+    @patch("api.next.cache.transaction.on_commit", side_effect=lambda f: f())
+    def test_serializer_cache(self, mock_on_commit):
+        person_url = "/api/next/people/{}/".format(self.person.pk)
+        ballot_url = "/api/next/ballots/{}/".format(
+            self.dulwich_post_ballot.ballot_paper_id
+        )
+        person_json = self.app.get(person_url).json
+        self.app.get(ballot_url)
+
+        # The second request is served from the cache
+        with patch.object(
+            PersonViewSet, "get_serializer", side_effect=AssertionError
+        ):
+            self.assertEqual(self.app.get(person_url).json, person_json)
+            people = self.app.get("/api/next/people/").json["results"]
+            self.assertIn(person_json, people)
+
+        # Changing the person removes them from the cache, along with the
+        # ballots they're standing on
+        self.person.name = "Tessa Palmer"
+        self.person.save()
+        self.assertEqual(self.app.get(person_url).json["name"], "Tessa Palmer")
+        candidate_names = [
+            candidacy["person"]["name"]
+            for candidacy in self.app.get(ballot_url).json["candidacies"]
+        ]
+        self.assertIn("Tessa Palmer", candidate_names)
+
+        # As does changing a membership
+        self.person.memberships.filter(ballot=self.dulwich_post_ballot).delete()
+        self.assertEqual(
+            len(self.app.get(person_url).json["candidacies"]),
+            len(person_json["candidacies"]) - 1,
+        )
+
+    @override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+            }
+        }
+    )
+    @patch("api.next.cache.transaction.on_commit", side_effect=lambda f: f())
+    def test_serializer_cache_ignores_data_from_before_a_change(
+        self, mock_on_commit
+    ):
+        person_url = "/api/next/people/{}/".format(self.person.pk)
+        get_serializer = PersonViewSet.get_serializer
+
+        def get_serializer_during_change(view, *args, **kwargs):
+            # The change is committed after this request has read the person
+            # from the database, but before it caches them
+            invalidate_serializer_cache("person", [self.person.pk])
+            return get_serializer(view, *args, **kwargs)
+
+        with patch.object(
+            PersonViewSet, "get_serializer", get_serializer_during_change
+        ):
+            self.app.get(person_url)
+
+        # What was cached is from before the change, so it isn't used
+        with patch.object(
+            PersonViewSet,
+            "get_serializer",
+            autospec=True,
+            side_effect=get_serializer,
+        ) as mock_get_serializer:
+            self.app.get(person_url)
+            self.assertTrue(mock_get_serializer.called)
+
     def test_party_endpoint(self):
         parties_resp = self.app.get("/api/next/parties/")
         self.assertEqual(parties_resp.json["count"], 7)
@@ -6,6 +6,8 @@ from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.files.storage import DefaultStorage
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django_webtest import WebTest
 from mock import patch
 
@@ -144,6 +146,18 @@ class TestAPI(TestUserMixin, TmpMediaRootMixin, UK2015ExamplesMixin, WebTest):
         self.assertEqual(persons["count"], len(persons["results"]))
         self.assertEqual(persons["count"], 5)
 
+    def test_api_persons_versions_prefetched(self):
+        with CaptureQueriesContext(connection) as queries:
+            persons = self.app.get("/api/v0.9/persons/").json
+        self.assertEqual(persons["count"], 5)
+        # One query for every person's versions, rather than one each
+        version_queries = [
+            query
+            for query in queries
+            if 'FROM "people_personversion"' in query["sql"]
+        ]
+        self.assertEqual(len(version_queries), 1)
+
     def test_api_person(self):
         person_resp = self.app.get("/api/v0.9/persons/2009/")
 
@@ -390,6 +404,107 @@ class TestAPI(TestUserMixin, TmpMediaRootMixin, UK2015ExamplesMixin, WebTest):
             "https://candidates.democracyclub.org.uk/api/next/people/818/?format=json",
         )
 
+    def _read_cached_pages(self, timestamp):
+        directory = join("cached-api", timestamp)
+        pages = {}
+        for filename in self.storage.listdir(directory)[1]:
+            with self.storage.open(join(directory, filename)) as f:
+                pages[filename] = f.read().decode("utf8").replace(timestamp, "")
+        return pages
+
+    @patch(
+        "candidates.management.commands.candidates_cache_api_to_directory.datetime"
+    )
+    def test_cache_api_to_directory_workers(self, mock_datetime):
+        mock_datetime.now.return_value = datetime(2017, 5, 14, 12, 33, 5, 0)
+        call_command(
+            "candidates_cache_api_to_directory",
+            page_size="3",
+            url_prefix="https://example.com/media/api-cache-for-wcivf",
+        )
+        mock_datetime.now.return_value = datetime(2017, 5, 14, 13, 33, 5, 0)
+        call_command(
+            "candidates_cache_api_to_directory",
+            page_size="3",
+            url_prefix="https://example.com/media/api-cache-for-wcivf",
+            workers=1,
+        )
+
+        # Rendering straight from the serializers gives the same pages as
+        # going through the API
+        self.assertEqual(
+            self._read_cached_pages("2017-05-14T13:33:05"),
+            self._read_cached_pages("2017-05-14T12:33:05"),
+        )
+        self.assertFalse(self.storage.exists("cached-api/checkpoint.json"))
+
+    @patch(
+        "candidates.management.commands.candidates_cache_api_to_directory.datetime"
+    )
+    def test_cache_api_to_directory_resume(self, mock_datetime):
+        from candidates.management.commands import (
+            candidates_cache_api_to_directory,
+        )
+
+        mock_datetime.now.return_value = datetime(2017, 5, 14, 12, 33, 5, 0)
+        render_page = candidates_cache_api_to_directory.render_page
+        rendered = []
+
+        def fail_on_ballots_page_two(job):
+            if (job["endpoint"], job["page_number"]) == ("ballots", 2):
+                raise ValueError("Interrupted")
+            rendered.append((job["endpoint"], job["page_number"]))
+            return render_page(job)
+
+        with patch.object(
+            candidates_cache_api_to_directory,
+            "render_page",
+            side_effect=fail_on_ballots_page_two,
+        ):
+            with self.assertRaises(ValueError):
+                call_command(
+                    "candidates_cache_api_to_directory",
+                    page_size="3",
+                    url_prefix="https://example.com/media/api-cache-for-wcivf",
+                    workers=1,
+                )
+        self.assertTrue(self.storage.exists("cached-api/checkpoint.json"))
+        self.assertEqual(
+            rendered, [("people", 1), ("people", 2), ("ballots", 1)]
+        )
+
+        # A later run picks up where the last one stopped, in the same
+        # directory
+        mock_datetime.now.return_value = datetime(2017, 5, 14, 13, 0, 0, 0)
+        with patch.object(
+            candidates_cache_api_to_directory,
+            "render_page",
+            side_effect=render_page,
+        ) as mock_render_page:
+            call_command(
+                "candidates_cache_api_to_directory",
+                url_prefix="https://example.com/media/api-cache-for-wcivf",
+                resume=True,
+            )
+        self.assertEqual(
+            [
+                (call[0][0]["endpoint"], call[0][0]["page_number"])
+                for call in mock_render_page.call_args_list
+            ],
+            [("ballots", 2), ("ballots", 3)],
+        )
+        self.assertEqual(
+            set(self.storage.listdir("cached-api/2017-05-14T12:33:05")[1]),
+            {
+                "people-000001.json",
+                "people-000002.json",
+                "ballots-000001.json",
+                "ballots-000002.json",
+                "ballots-000003.json",
+            },
+        )
+        self.assertFalse(self.storage.exists("cached-api/checkpoint.json"))
+
     def _setup_cached_api_directory(self, dir_list):
         """
         Saves a tmp file in settings.MEDIA_ROOT, called `.keep` in each
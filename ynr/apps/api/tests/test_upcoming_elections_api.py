@@ -1,10 +1,13 @@
 from datetime import date, timedelta
 
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.six.moves.urllib_parse import urljoin
 from django_webtest import WebTest
 from mock import Mock, patch
 
+from candidates.models import Ballot
 from candidates.tests.factories import (
     ElectionFactory,
     MembershipFactory,
@@ -230,6 +233,42 @@ class TestUpcomingElectionsAPI(UK2015ExamplesMixin, WebTest):
 
         self.assertEqual(expected, output)
 
+    def test_candidates_for_postcode_constant_queries(self, mock_requests):
+        self._setup_data()
+        mock_requests.get.side_effect = fake_requests_for_every_election
+        url = "/api/v0.9/candidates_for_postcode/?postcode=SE24+0AG"
+
+        MembershipFactory.create(
+            person=PersonFactory.create(name="Tessa Jowell"),
+            post=self.post,
+            party=self.labour_party,
+            ballot=self.election_gla.ballot_set.get(post=self.post),
+        )
+        with CaptureQueriesContext(connection) as one_ballot:
+            self.app.get(url)
+
+        lac_ballot = Ballot.objects.get(election__slug="gla.c.2016-05-05")
+        for name in ["Candidate One", "Candidate Two"]:
+            person = PersonFactory.create(name=name)
+            person.tmp_person_identifiers.create(
+                value_type="homepage_url", value="https://example.com/" + name
+            )
+            MembershipFactory.create(
+                person=person,
+                post=lac_ballot.post,
+                party=self.green_party,
+                ballot=lac_ballot,
+            )
+        with CaptureQueriesContext(connection) as two_ballots:
+            response = self.app.get(url)
+
+        self.assertEqual(
+            [len(ballot["candidates"]) for ballot in response.json], [2, 1]
+        )
+        self.assertEqual(
+            len(one_ballot.captured_queries), len(two_ballots.captured_queries)
+        )
+
 
 class TestCurrentElections(UK2015ExamplesMixin, WebTest):
     def test_future_flag(self):
@@ -345,13 +345,12 @@ class PersonSerializer(MinimalPersonSerializer):
             "wikipedia": "wikipedia_url",
         }
         pi_types_to_notes = {v: k for k, v in notes_tp_pi_types.items()}
-        qs = obj.tmp_person_identifiers.filter(
-            value_type__in=pi_types_to_notes.values()
-        )
-        for pi in qs:
-            links.append(
-                {"note": pi_types_to_notes[pi.value_type], "url": pi.value}
-            )
+        # Filter the identifiers in Python so prefetched identifiers are used
+        for pi in obj.get_identifiers_of_type():
+            if pi.value_type in pi_types_to_notes:
+                links.append(
+                    {"note": pi_types_to_notes[pi.value_type], "url": pi.value}
+                )
         return links
 
 
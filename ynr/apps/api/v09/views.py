@@ -1,13 +1,14 @@
 import json
 import subprocess
 import sys
+from collections import defaultdict
 from datetime import date, datetime, timedelta
 from os.path import dirname
 
 import django
 from dateutil import parser
 from django.contrib.auth.models import User
-from django.db.models import Count, Prefetch, Q
+from django.db.models import Count, Prefetch
 from django.http import HttpResponse, HttpResponsePermanentRedirect
 from django.views.generic import View
 from rest_framework import viewsets
@@ -24,7 +25,7 @@ from elections.uk.geo_helpers import (
     get_ballots_from_coords,
     get_ballots_from_postcode,
 )
-from people.models import Person
+from people.models import Person, PersonImage, PersonVersion
 from popolo.models import Membership, Organization, Post
 from ynr_refactoring.views import get_changed_election_slug
 
@@ -109,33 +110,51 @@ class CandidatesAndElectionsForPostcodeViewSet(ViewSet):
         except Exception as e:
             return self._error(e.message)
 
+        ballots = list(
+            ballots.select_related("post__organization", "election").order_by(
+                "-ballot_paper_id"
+            )
+        )
+
+        # Fetch the candidates for every ballot in one go, rather than a
+        # query (and set of prefetches) for each ballot
+        memberships_by_ballot = defaultdict(list)
+        for membership in (
+            Membership.objects.filter(ballot__in=ballots)
+            .select_related("person")
+            .prefetch_related(
+                Prefetch(
+                    "person__memberships",
+                    Membership.objects.select_related(
+                        "party", "post", "ballot__election"
+                    ),
+                ),
+                Prefetch(
+                    "person__images",
+                    PersonImage.objects.select_related("uploading_user"),
+                ),
+                "person__other_names",
+                "person__tmp_person_identifiers",
+            )
+        ):
+            memberships_by_ballot[membership.ballot_id].append(membership)
+
+        # A person standing in more than one of the ballots is only
+        # serialized once
+        people_data = {}
         results = []
-        ballots = ballots.select_related(
-            "post__organization", "election"
-        ).order_by("-ballot_paper_id")
         for ballot in ballots:
             candidates = []
-            for membership in (
-                ballot.membership_set.filter(ballot__election=ballot.election)
-                .prefetch_related(
-                    Prefetch(
-                        "person__memberships",
-                        Membership.objects.select_related(
-                            "party", "post", "ballot__election"
-                        ),
-                    ),
-                    "person__images",
-                    "person__other_names",
-                )
-                .select_related("person")
-            ):
-                candidates.append(
-                    serializers.NoVersionPersonSerializer(
-                        instance=membership.person,
+            for membership in memberships_by_ballot[ballot.pk]:
+                person = membership.person
+                if person.pk not in people_data:
+                    serializer = serializers.NoVersionPersonSerializer(
+                        instance=person,
                         context={"request": request},
                         read_only=True,
-                    ).data
-                )
+                    )
+                    people_data[person.pk] = serializer.data
+                candidates.append(people_data[person.pk])
             election = {
                 "election_date": text_type(ballot.election.election_date),
                 "election_name": ballot.election.name,
@@ -230,13 +249,12 @@ class PersonViewSet(viewsets.ModelViewSet):
             "memberships__ballot__election",
             "other_names",
             "images",
+            Prefetch("version_set", PersonVersion.objects.newest_first()),
         ).order_by("id")
         date_qs = self.request.query_params.get("updated_gte", None)
         if date_qs:
             date = parser.parse(date_qs)
-            queryset = queryset.filter(
-                Q(updated_at__gte=date) | Q(memberships__updated_at__gte=date)
-            )
+            queryset = queryset.filter(last_touched__gte=date)
         return queryset
 
     serializer_class = serializers.PersonSerializer
@@ -1,7 +1,7 @@
 import csv
 
 from bulk_adding.models import RawPeople
-from candidates.models import LoggedAction, raise_if_unsafe_to_delete
+from candidates.models import LoggedAction, raise_if_any_unsafe_to_delete
 from candidates.models.auth import check_creation_allowed
 from candidates.models.db import EditType
 from candidates.views.version_data import get_change_metadata, get_client_ip
@@ -61,13 +61,14 @@ def update_person(
     # object that has a
     # ForeignKey to the membership, since that would result in
     # losing data.
-    old_memberships = (
+    old_memberships = list(
         Membership.objects.exclude(pk=membership.pk)
         .exclude(ballot__candidates_locked=True)
         .filter(person=person, ballot__election=ballot.election)
+        .select_related("ballot")
     )
+    raise_if_any_unsafe_to_delete(old_memberships)
     for old_membership in old_memberships:
-        raise_if_unsafe_to_delete(old_membership)
         old_membership.delete()
 
     memberships_for_election = Membership.objects.filter(
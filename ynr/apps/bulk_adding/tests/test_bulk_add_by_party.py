@@ -122,7 +122,7 @@ class TestBulkAddingByParty(TestUserMixin, UK2015ExamplesMixin, WebTest):
         form = response.forms[1]
 
         # Now submit the valid form
-        with self.assertNumQueries(55):
+        with self.assertNumQueries(59):
             form["{}-0-select_person".format(ballot.pk)] = "_new"
             response = form.submit().follow()
 
@@ -1,9 +1,18 @@
+import csv
+import hashlib
+import json
+import shutil
+import tempfile
 from collections import defaultdict
 
 from django.conf import settings
+from django.core.files.storage import DefaultStorage
+from django.db.models import Count, Q, Sum, prefetch_related_objects
 
-from candidates.models import PersonRedirect
+from candidates.models import Ballot, PersonRedirect
 from compat import BufferDictWriter
+from elections.models import Election
+from people.models import PersonIdentifier, PersonImage
 from popolo.models import Membership
 
 
@@ -49,3 +58,160 @@ def memberships_dicts_for_csv(election_slug=None, post_slug=None):
         sort_memberships(membership_list)
 
     return (memberships_by_election, elected_by_election)
+
+
+class CSVOutputFile:
+    """
+    A CSV file that membership rows are written to one at a time.
+
+    Rows are written to a local temporary file and only copied to the
+    storage backend on `close`, so memory use doesn't grow with the number of
+    rows and the stored file is never half written.
+    """
+
+    def __init__(self, name, storage=None):
+        self.name = name
+        self.storage = storage or DefaultStorage()
+        self.tmp_file = tempfile.TemporaryFile(
+            mode="w+", encoding="utf-8", newline=""
+        )
+        self.writer = csv.DictWriter(
+            self.tmp_file, fieldnames=settings.CSV_ROW_FIELDS
+        )
+        self.writer.writeheader()
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.tmp_file.seek(0)
+        with self.storage.open(self.name, "wb") as out_file:
+            shutil.copyfileobj(_EncodingReader(self.tmp_file), out_file)
+        self.tmp_file.close()
+
+
+class _EncodingReader:
+    """
+    Wrap a text file so `shutil.copyfileobj` can copy it to a binary file.
+    """
+
+    def __init__(self, text_file):
+        self.text_file = text_file
+
+    def read(self, size=-1):
+        return self.text_file.read(size).encode("utf-8")
+
+
+def dicts_for_csv(memberships, redirects=None):
+    """
+    Return a CSV row for each of `memberships`.
+
+    `memberships` should come from `Membership.objects.for_csv()`. The
+    identifiers and primary images (with their uploading users) of every
+    person are fetched for the whole batch at once, as are their redirects
+    if `redirects` isn't given, so the number of queries doesn't depend on
+    the number of memberships.
+    """
+    memberships = list(memberships)
+    prefetch_related_objects(
+        memberships, *Membership.objects.csv_prefetch_lookups()
+    )
+    if redirects is None:
+        redirects = PersonRedirect.all_redirects_dict(
+            new_person_ids={m.person_id for m in memberships}
+        )
+    return [m.dict_for_csv(redirects=redirects) for m in memberships]
+
+
+def iter_dicts_for_csv(memberships, chunk_size=2000):
+    """
+    Yield a CSV row for each membership in `memberships`, reading them with a
+    server side cursor and building the rows a chunk at a time.
+
+    `QuerySet.iterator` ignores `prefetch_related`, so `dicts_for_csv` does
+    the prefetching for each chunk instead.
+    """
+    memberships = memberships.prefetch_related(None)
+
+    chunk = []
+    for membership in memberships.iterator(chunk_size=chunk_size):
+        chunk.append(membership)
+        if len(chunk) >= chunk_size:
+            yield from dicts_for_csv(chunk)
+            chunk = []
+    if chunk:
+        yield from dicts_for_csv(chunk)
+
+
+def membership_counts_by_election():
+    return dict(
+        Membership.objects.order_by()
+        .values_list("ballot__election__slug")
+        .annotate(Count("pk"))
+    )
+
+
+def elections_changed_since(since):
+    """
+    Return the slugs of elections with a membership, person, person
+    identifier or party that has been modified since `since`.
+
+    Removed memberships aren't found by this, use
+    `membership_counts_by_election` to catch those.
+    """
+    changed = (
+        Q(updated_at__gt=since)
+        | Q(person__updated_at__gt=since)
+        | Q(person__tmp_person_identifiers__modified__gt=since)
+        | Q(party__modified__gt=since)
+    )
+    return set(
+        Membership.objects.filter(changed)
+        .order_by()
+        .values_list("ballot__election__slug", flat=True)
+        .distinct()
+    )
+
+
+def election_fingerprints():
+    """
+    Return a hash for each election of the data in its CSV rows that
+    `elections_changed_since` can't find changes to by timestamp.
+
+    Elections and ballots don't record when they were modified, and
+    removing an identifier or changing a person's image doesn't change
+    anything with a timestamp, so this covers the election's fields, each
+    ballot's cancelled status and post label, and the identifiers and
+    primary images of its candidates.
+    """
+    data = defaultdict(list)
+    for slug, *fields in Election.objects.order_by("slug").values_list(
+        "slug", "current", "party_lists_in_use", "name"
+    ):
+        data[slug].append(fields)
+    ballots = Ballot.objects.order_by("ballot_paper_id").values_list(
+        "election__slug", "ballot_paper_id", "cancelled", "post__short_label"
+    )
+    for slug, *fields in ballots:
+        data[slug].append(fields)
+    for model, extra_filter in (
+        (PersonIdentifier, {}),
+        (PersonImage, {"is_primary": True}),
+    ):
+        totals = (
+            model.objects.filter(
+                person__memberships__isnull=False, **extra_filter
+            )
+            .order_by("person__memberships__ballot__election__slug")
+            .values_list("person__memberships__ballot__election__slug")
+            .annotate(Count("pk"), Sum("pk"))
+        )
+        for slug, *fields in totals:
+            data[slug].append([model._meta.label] + fields)
+
+    return {
+        slug: hashlib.sha1(
+            json.dumps(fields, default=str).encode("utf-8")
+        ).hexdigest()
+        for slug, fields in data.items()
+    }
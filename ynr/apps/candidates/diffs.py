@@ -2,15 +2,12 @@
 # between our JSON representation of candidates.
 
 
-import json
+import copy
 import re
-
-import jsonpatch
-import jsonpointer
-from django.http import Http404
+from collections import OrderedDict
 
 from candidates.models.versions import get_versions_parent_map
-from elections.models import Election
+from elections.slug_cache import election_slug_cache
 
 
 def get_descriptive_value(election, attribute, value, leaf):
@@ -21,11 +18,11 @@ def get_descriptive_value(election, attribute, value, leaf):
     be under that year in the 'standing_in' or 'party_memberships'
     dictionary (see the comment at the top of update.py)."""
 
-    try:
-        election_data = Election.objects.get_by_slug(election)
-        future_election = not election_data.in_past
-        election_name = election_data.name
-    except Http404:
+    election_data = election_slug_cache.name_and_in_past(election)
+    if election_data:
+        election_name, in_past = election_data
+        future_election = not in_past
+    else:
         # The election slug may have changed since the diff was stored.
         # Assume this is an older election
         future_election = False
@@ -147,12 +144,175 @@ def explain_standing_in_and_party_memberships(
             operation[key] = " and ".join(clauses)
 
 
-def get_version_diff(from_data, to_data):
-    """Calculate the diff (a mangled JSON patch) between from_data and to_data"""
+def join_path(path, key):
+    """Add key to a JSON pointer, escaped as in RFC 6901"""
+
+    return "{}/{}".format(path, str(key).replace("~", "~0").replace("/", "~1"))
+
+
+class VersionDiffBuilder(object):
+    """Build the JSON patch operations between two versions' data
+
+    This produces the same operations as `jsonpatch.make_patch`, including
+    turning the removal of a value from one place and its addition in
+    another in to a 'move', but it also records the value each 'replace'
+    and 'remove' changes as 'previous_value'.
+
+    Values removed from or added to lists are never turned in to moves
+    (nothing moves between the lists of dicts in version data), so no
+    operation changes the path of a later one, and the previous values can
+    be read from the old data as the operations are built."""
+
+    def __init__(self):
+        self.operations = []
+        # Removes and adds that haven't been paired up in to a move yet,
+        # by value. Like jsonpatch, values that can't be hashed are kept in
+        # a list and compared one by one.
+        self.unpaired = {"remove": ({}, []), "add": ({}, [])}
+
+    def store(self, op, value, index):
+        hashed, unhashable = self.unpaired[op]
+        try:
+            hashed.setdefault(value, []).append(index)
+        except TypeError:
+            unhashable.append((value, index))
+
+    def take(self, op, value):
+        """Return the index of the latest unpaired op of value, if any"""
+
+        hashed, unhashable = self.unpaired[op]
+        try:
+            stored = hashed.get(value)
+            if stored:
+                return stored.pop()
+        except TypeError:
+            for i in range(len(unhashable) - 1, -1, -1):
+                if unhashable[i][0] == value:
+                    return unhashable.pop(i)[1]
+        return None
+
+    def add_operation(self, operation):
+        self.operations.append(operation)
+        return len(self.operations) - 1
+
+    def removed(self, path, value):
+        index = self.add_operation(
+            {"op": "remove", "path": path, "previous_value": value}
+        )
+        added_index = self.take("add", value)
+        if added_index is None:
+            self.store("remove", value, index)
+            return
+        added_path = self.operations[added_index]["path"]
+        self.operations[added_index] = None
+        if added_path == path:
+            self.operations[index] = None
+        else:
+            self.operations[index] = {
+                "op": "move",
+                "from": path,
+                "path": added_path,
+            }
+
+    def added(self, path, value):
+        removed_index = self.take("remove", value)
+        if removed_index is None:
+            index = self.add_operation(
+                {"op": "add", "path": path, "value": value}
+            )
+            self.store("add", value, index)
+            return
+        removed_path = self.operations[removed_index]["path"]
+        self.operations[removed_index] = None
+        if removed_path != path:
+            self.add_operation(
+                {"op": "move", "from": removed_path, "path": path}
+            )
+
+    def replaced(self, path, from_value, to_value):
+        self.add_operation(
+            {
+                "op": "replace",
+                "path": path,
+                "value": to_value,
+                "previous_value": from_value,
+            }
+        )
+
+    def compare_values(self, path, from_value, to_value):
+        if from_value == to_value:
+            return
+        if isinstance(from_value, dict) and isinstance(to_value, dict):
+            self.compare_dicts(path, from_value, to_value)
+        elif isinstance(from_value, list) and isinstance(to_value, list):
+            self.compare_lists(path, from_value, to_value)
+        else:
+            self.replaced(path, from_value, to_value)
+
+    def compare_dicts(self, path, from_dict, to_dict):
+        # The keys are visited in the same order as jsonpatch, so the same
+        # removes and adds are paired up in to moves
+        from_keys = set(from_dict.keys())
+        to_keys = set(to_dict.keys())
+        for key in from_keys - to_keys:
+            self.removed(join_path(path, key), from_dict[key])
+        for key in to_keys - from_keys:
+            self.added(join_path(path, key), to_dict[key])
+        for key in from_keys & to_keys:
+            self.compare_values(
+                join_path(path, key), from_dict[key], to_dict[key]
+            )
+
+    def compare_lists(self, path, from_list, to_list):
+        common = min(len(from_list), len(to_list))
+        for i in range(common):
+            self.compare_values(join_path(path, i), from_list[i], to_list[i])
+        # Items are removed from, and added to, the end of the list
+        for value in from_list[common:]:
+            self.operations.append(
+                {
+                    "op": "remove",
+                    "path": join_path(path, common),
+                    "previous_value": value,
+                }
+            )
+        for i, value in enumerate(to_list[common:], common):
+            self.operations.append(
+                {"op": "add", "path": join_path(path, i), "value": value}
+            )
+
+    def get_operations(self):
+        operations = [o for o in self.operations if o is not None]
+        # Copy the values so that changing the operations doesn't change
+        # the data they came from
+        return copy.deepcopy(
+            sorted(operations, key=lambda o: (o["op"], o["path"]))
+        )
+
+
+def get_raw_version_diff(from_data, to_data):
+    """Calculate the JSON patch operations between from_data and to_data
+
+    Each operation that replaces or removes something also records the
+    value it replaced as 'previous_value'. The result doesn't depend on
+    anything that changes over time, so it can be stored. Use
+    `explain_version_diff` to turn it into the human readable version."""
+
+    builder = VersionDiffBuilder()
+    builder.compare_values("", from_data, to_data)
+    return builder.get_operations()
+
+
+def explain_version_diff(raw_diff):
+    """Turn the output of `get_raw_version_diff` into a mangled JSON patch
+
+    Operations on standing_in and party_memberships get readable
+    descriptions, and operations that don't change anything meaningful
+    are dropped."""
 
-    basic_patch = jsonpatch.make_patch(from_data, to_data)
     result = []
-    for operation in sorted(basic_patch, key=lambda o: (o["op"], o["path"])):
+    for operation in raw_diff:
+        operation = copy.deepcopy(operation)
         op = operation["op"]
         ignore = False
         # We deal with standing_in and party_memberships slightly
@@ -162,10 +322,6 @@ def get_version_diff(from_data, to_data):
             r"(standing_in|party_memberships)(?:/([^/]+))?(?:/(\w+))?",
             operation["path"],
         )
-        if op in ("replace", "remove"):
-            operation["previous_value"] = jsonpointer.resolve_pointer(
-                from_data, operation["path"], default=None
-            )
 
         attribute, election, leaf = m.groups() if m else (None, None, None)
         if attribute:
@@ -185,37 +341,46 @@ def get_version_diff(from_data, to_data):
             # saying 'we *know* they're not standing then'
             if (not operation["value"]) and (attribute != "standing_in"):
                 ignore = True
-        operation["path"] = re.sub(r"^/", "", operation["path"])
+        operation["path"] = operation["path"].lstrip("/")
         if not ignore:
             result.append(operation)
-        # The operations generated by jsonpatch are incremental, so we
-        # need to apply each before going on to parse the next:
-        operation["path"] = "/" + operation["path"]
-        from_data = jsonpatch.apply_patch(from_data, [operation])
-    for operation in result:
-        operation["path"] = operation["path"].lstrip("/")
     return result
 
 
+def get_version_diff(from_data, to_data):
+    """Calculate the diff (a mangled JSON patch) between from_data and to_data"""
+
+    return explain_version_diff(get_raw_version_diff(from_data, to_data))
+
+
 def clean_version_data(data):
+    """Return a copy of data without the values that we don't show changes
+    in. Nested values that are changed are copied, so data isn't changed.
+    """
+
     data = data.copy()
-    for election_slug, standing_in in data.get("standing_in", {}).items():
-        if standing_in:
-            standing_in.pop("mapit_url", None)
+    if data.get("standing_in"):
+        data["standing_in"] = {
+            election_slug: (
+                {k: v for k, v in standing_in.items() if k != "mapit_url"}
+                if standing_in
+                else standing_in
+            )
+            for election_slug, standing_in in data["standing_in"].items()
+        }
     # We're not interested in changes of these IDs:
-    for i in data.get("identifiers", []):
-        i.pop("id", None)
-
-    # Remove duplicate dicts in the Identifiers
-    identifiers_set = set()
-    for i in data.get("identifiers", []):
-        identifiers_set.add(json.dumps(i, sort_keys=True))
-    # now replace the identifiers list with the unique values
-    if identifiers_set:
-        data["identifiers"] = [json.loads(i) for i in identifiers_set]
-
-    for on in data.get("other_names", []):
-        on.pop("id", None)
+    if data.get("identifiers"):
+        # Remove duplicate dicts in the Identifiers
+        identifiers = OrderedDict()
+        for i in data["identifiers"]:
+            i = {k: v for k, v in i.items() if k != "id"}
+            identifiers.setdefault(tuple(sorted(i.items())), i)
+        data["identifiers"] = list(identifiers.values())
+    if data.get("other_names"):
+        data["other_names"] = [
+            {k: v for k, v in on.items() if k != "id"}
+            for on in data["other_names"]
+        ]
     data.pop("last_party", None)
     data.pop("proxy_image", None)
     data.pop("date_of_birth", None)
@@ -229,6 +394,35 @@ def get_parents_version_data(parents, id_to_version):
     return [(None, {})]
 
 
+def get_raw_diffs_against_parents(data, parents_with_data):
+    """Calculate the raw diff of a version's data against each parent
+
+    'parents_with_data' is a list of (parent_version_id, parent_data)
+    pairs, as returned by `get_parents_version_data`. The result can be
+    stored, and passed to `explain_diffs_against_parents` later."""
+
+    data = clean_version_data(data)
+    return [
+        {
+            "parent_version_id": parent_version_id,
+            "parent_diff": get_raw_version_diff(
+                clean_version_data(parent_data), data
+            ),
+        }
+        for parent_version_id, parent_data in parents_with_data
+    ]
+
+
+def explain_diffs_against_parents(raw_diffs):
+    return [
+        {
+            "parent_version_id": parent_diff["parent_version_id"],
+            "parent_diff": explain_version_diff(parent_diff["parent_diff"]),
+        }
+        for parent_diff in raw_diffs
+    ]
+
+
 def get_version_diffs(versions):
     """Add a diff to each of an array of version dicts
 
@@ -246,17 +440,13 @@ def get_version_diffs(versions):
             version_with_diffs["data"]
         )
         version_with_diffs["parent_version_ids"] = id_to_parent_ids[version_id]
-        version_with_diffs["diffs"] = [
-            {
-                "parent_version_id": parent_with_data[0],
-                "parent_diff": get_version_diff(
-                    clean_version_data(parent_with_data[1]),
-                    version_with_diffs["data"],
+        version_with_diffs["diffs"] = explain_diffs_against_parents(
+            get_raw_diffs_against_parents(
+                version_with_diffs["data"],
+                get_parents_version_data(
+                    id_to_parent_ids[version_id], id_to_version
                 ),
-            }
-            for parent_with_data in get_parents_version_data(
-                id_to_parent_ids[version_id], id_to_version
             )
-        ]
+        )
         result.append(version_with_diffs)
     return result
@@ -1,13 +1,20 @@
 import json
+import multiprocessing
 import re
 from datetime import datetime
 from os.path import join
 
 from django.core.files.base import ContentFile
 from django.core.files.storage import DefaultStorage
-from django.core.management.base import BaseCommand
-from django.test import Client
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, RequestFactory
 from django.utils.six.moves.urllib_parse import parse_qs, urlsplit
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.next.views import ResultsSetPagination
+from elections.api.next.api_views import BallotViewSet
+from people.api.next.api_views import PersonViewSet
 
 
 def path_and_query(url):
@@ -30,6 +37,75 @@ def is_timestamped_dir(directory):
     return re.search(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$", directory)
 
 
+ENDPOINT_VIEWSETS = {"people": PersonViewSet, "ballots": BallotViewSet}
+
+
+def get_list_view(endpoint, hostname, secure):
+    """
+    Return the API viewset for `endpoint`, set up as if it was handling a
+    request for the list of objects.
+    """
+    request = RequestFactory().get(
+        "/api/next/{}/".format(endpoint),
+        {"format": "json"},
+        secure=secure,
+        SERVER_NAME=hostname,
+    )
+    view = ENDPOINT_VIEWSETS[endpoint](
+        action_map={"get": "list"}, args=(), kwargs={"version": "next"}
+    )
+    view.format_kwarg = None
+    view.request = view.initialize_request(request)
+    view.initial(view.request, version="next")
+    return view
+
+
+def page_url(url_prefix, timestamp, endpoint, page_number):
+    return "/".join(
+        [url_prefix, timestamp, page_filename(endpoint, page_number)]
+    )
+
+
+def render_page(job):
+    """
+    Serialize a single page of an endpoint straight from the API serializer
+    and write it to storage.
+
+    This is run in worker processes, so takes and returns plain data.
+    Returns the JSON for the first page, so the "latest" copy can be written.
+    """
+    view = get_list_view(job["endpoint"], job["hostname"], job["secure"])
+    queryset = view.get_queryset().filter(pk__in=job["pks"])
+    results = view.get_serializer(queryset, many=True).data
+
+    page_number = job["page_number"]
+    link_args = (job["url_prefix"], job["timestamp"], job["endpoint"])
+    data = {
+        "count": job["count"],
+        "next": None,
+        "previous": None,
+        "results": results,
+    }
+    if page_number < job["page_count"]:
+        data["next"] = page_url(*link_args, page_number + 1)
+    if page_number > 1:
+        data["previous"] = page_url(*link_args, page_number - 1)
+    json_page = json.dumps(
+        data, cls=JSONEncoder, indent=4, sort_keys=True
+    ).encode("utf8")
+
+    # Only pages recorded in the checkpoint are complete, so anything
+    # already here is left over from an interrupted write.
+    storage = DefaultStorage()
+    if storage.exists(job["output_filename"]):
+        storage.delete(job["output_filename"])
+    storage.save(job["output_filename"], ContentFile(json_page))
+
+    if page_number == 1:
+        return job["endpoint"], page_number, json_page
+    return job["endpoint"], page_number, None
+
+
 class Command(BaseCommand):
 
     help = "Cache the output of the persons and posts endpoints to a directory"
@@ -57,6 +133,22 @@ class Command(BaseCommand):
             type=int,
             help="How many results should be output per file (max 200)",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help=(
+                "Render pages straight from the API serializers using this "
+                "many processes, checkpointing progress as pages are written"
+            ),
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help=(
+                "Carry on from the checkpoint left by an interrupted "
+                "--workers run, rather than starting again"
+            ),
+        )
         parser.add_argument(
             "--prune",
             action="store_true",
@@ -163,6 +255,113 @@ class Command(BaseCommand):
             else:
                 url = None
 
+    @property
+    def checkpoint_path(self):
+        return join(self.directory_path, "checkpoint.json")
+
+    @property
+    def progress_path(self):
+        return join(self.directory_path, "checkpoint-progress.json")
+
+    def write_json(self, path, data):
+        if self.storage.exists(path):
+            self.storage.delete(path)
+        self.storage.save(path, ContentFile(json.dumps(data).encode("utf8")))
+
+    def read_json(self, path):
+        with self.storage.open(path) as f:
+            return json.loads(f.read().decode("utf8"))
+
+    def load_checkpoint(self):
+        """
+        Return the stored checkpoint, with the pages that have already been
+        written in "done".
+        """
+        if not self.storage.exists(self.checkpoint_path):
+            raise CommandError("There is no checkpoint to resume from")
+        checkpoint = self.read_json(self.checkpoint_path)
+        checkpoint["done"] = {}
+        if self.storage.exists(self.progress_path):
+            checkpoint["done"] = self.read_json(self.progress_path)
+        return checkpoint
+
+    def make_checkpoint(self, page_size):
+        """
+        Split each endpoint into pages of primary keys, in the order the API
+        lists them. The split is stored, so a resumed run writes exactly the
+        same pages even if the data has changed since.
+        """
+        page_size = min(page_size, ResultsSetPagination.max_page_size)
+        pages = {}
+        for endpoint in self.endpoints:
+            view = get_list_view(endpoint, self.hostname, self.secure)
+            pks = list(
+                view.get_queryset()
+                .prefetch_related(None)
+                .values_list("pk", flat=True)
+            )
+            pages[endpoint] = [
+                pks[i : i + page_size] for i in range(0, len(pks), page_size)
+            ] or [[]]
+        return {"timestamp": self.timestamp, "pages": pages}
+
+    def page_jobs(self, checkpoint, json_directory):
+        for endpoint in self.endpoints:
+            pages = checkpoint["pages"][endpoint]
+            done = set(checkpoint["done"].get(endpoint, []))
+            count = sum(len(pks) for pks in pages)
+            for page_number, pks in enumerate(pages, start=1):
+                if page_number in done:
+                    continue
+                yield {
+                    "endpoint": endpoint,
+                    "page_number": page_number,
+                    "page_count": len(pages),
+                    "count": count,
+                    "pks": pks,
+                    "output_filename": join(
+                        json_directory, page_filename(endpoint, page_number)
+                    ),
+                    "hostname": self.hostname,
+                    "secure": self.secure,
+                    "url_prefix": self.url_prefix,
+                    "timestamp": self.timestamp,
+                }
+
+    def render_pages_to_directory(self, checkpoint, json_directory, workers):
+        jobs = self.page_jobs(checkpoint, json_directory)
+        if workers > 1:
+            # Each process needs its own database connection
+            connections.close_all()
+            pool = multiprocessing.Pool(workers)
+            results = pool.imap_unordered(render_page, jobs)
+        else:
+            pool = None
+            results = map(render_page, jobs)
+
+        first_pages = {}
+        try:
+            for endpoint, page_number, json_page in results:
+                checkpoint["done"].setdefault(endpoint, []).append(page_number)
+                self.write_json(self.progress_path, checkpoint["done"])
+                if json_page:
+                    first_pages[endpoint] = json_page
+        finally:
+            if pool:
+                pool.terminate()
+
+        for endpoint in self.endpoints:
+            if endpoint not in first_pages:
+                with self.storage.open(
+                    join(json_directory, page_filename(endpoint, 1))
+                ) as f:
+                    first_pages[endpoint] = f.read()
+            self.first_page_json = first_pages[endpoint]
+            self.update_latest_page(self.directory_path, endpoint)
+        for path in [self.checkpoint_path, self.progress_path]:
+            if self.storage.exists(path):
+                self.storage.delete(path)
+
     def handle(self, *args, **options):
         self.client = Client()
         self.directory_path = "cached-api"
@@ -172,11 +371,30 @@ class Command(BaseCommand):
         self.url_prefix = self.get_url_prefix(options["url_prefix"])
 
         self.timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-        json_directory = join(self.directory_path, self.timestamp)
 
         page_size = options["page_size"]
         if not page_size:
             page_size = 200
+
+        if options["workers"] or options["resume"]:
+            if options["resume"]:
+                checkpoint = self.load_checkpoint()
+                self.timestamp = checkpoint["timestamp"]
+            else:
+                checkpoint = self.make_checkpoint(page_size)
+                self.write_json(self.checkpoint_path, checkpoint)
+                if self.storage.exists(self.progress_path):
+                    self.storage.delete(self.progress_path)
+                checkpoint["done"] = {}
+            json_directory = join(self.directory_path, self.timestamp)
+            self.render_pages_to_directory(
+                checkpoint, json_directory, options["workers"] or 1
+            )
+            if options["prune"]:
+                self.prune()
+            return
+
+        json_directory = join(self.directory_path, self.timestamp)
         for endpoint in self.endpoints:
             self.get_api_results_to_directory(
                 endpoint, json_directory, page_size
@@ -1,37 +1,33 @@
-from collections import defaultdict
+import csv
+import io
+import json
 
 from django.core.files.storage import DefaultStorage
 from django.core.management.base import BaseCommand, CommandError
-
-from candidates.csv_helpers import list_to_csv, memberships_dicts_for_csv
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from candidates.csv_helpers import (
+    CSVOutputFile,
+    election_fingerprints,
+    elections_changed_since,
+    iter_dicts_for_csv,
+    membership_counts_by_election,
+)
 from elections.models import Election
+from popolo.models import Membership
 
 
-def safely_write(output_filename, memberships_list):
-    """
-    Use Django's storage backend to write the CSV file to the MEDIA_ROOT.
-
-    If using S3 (via Django Storages) the file is atomically written when the
-    file is closed (when the context manager closes).
-
-    That is, the file can be opened and written to but nothing changes at
-    the public S3 URL until the object is closed. Meaning it's not possible to
-    have a half written file.
-
-    If not using S3, there will be a short time where the file is empty
-    during write.
-    """
-
-    csv = list_to_csv(memberships_list)
-    file_store = DefaultStorage()
-    with file_store.open(output_filename, "wb") as out_file:
-        out_file.write(csv.encode("utf-8"))
+def slug_to_date(slug):
+    return slug.split(".")[-1]
 
 
 class Command(BaseCommand):
 
     help = "Output CSV files for all elections"
 
+    state_file_name = "csv_export_state/candidates.json"
+
     def add_arguments(self, parser):
         parser.add_argument(
             "--site-base-url",
@@ -42,10 +38,145 @@ class Command(BaseCommand):
             metavar="ELECTION-SLUG",
             help="Only output CSV for the election with this slug",
         )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help=(
+                "Regenerate every file, rather than only those for elections "
+                "that have changed since the last run"
+            ),
+        )
 
     def slug_to_file_name(self, slug):
         return "{}-{}.csv".format(self.output_prefix, slug)
 
+    def load_state(self):
+        if not self.storage.exists(self.state_file_name):
+            return None
+        with self.storage.open(self.state_file_name, "rb") as state_file:
+            state = json.loads(state_file.read().decode("utf-8"))
+        state["last_run"] = parse_datetime(state["last_run"])
+        return state
+
+    def save_state(self, run_started, counts, fingerprints):
+        state = {
+            "last_run": run_started.isoformat(),
+            "election_counts": counts,
+            "election_fingerprints": fingerprints,
+        }
+        if self.storage.exists(self.state_file_name):
+            self.storage.delete(self.state_file_name)
+        self.storage.save(
+            self.state_file_name, io.BytesIO(json.dumps(state).encode("utf-8")),
+        )
+
+    def elections_to_regenerate(self, all_slugs, counts, fingerprints):
+        """
+        Work out which elections need their files writing again, based on what
+        has changed since the last run.
+
+        As well as memberships and people modified since then, this catches
+        elections where the number of memberships or the fingerprint from
+        `election_fingerprints` is different to the last run.
+
+        Returns None if every file needs writing.
+        """
+        if self.options["full"]:
+            return None
+        state = self.load_state()
+        if not state:
+            return None
+
+        changed = elections_changed_since(state["last_run"])
+        old_fingerprints = state.get("election_fingerprints", {})
+        for slug in all_slugs:
+            if counts.get(slug, 0) != state["election_counts"].get(slug, 0):
+                changed.add(slug)
+            elif fingerprints.get(slug) != old_fingerprints.get(slug):
+                changed.add(slug)
+            elif not self.storage.exists(self.slug_to_file_name(slug)):
+                changed.add(slug)
+        return changed
+
+    def write_memberships(self, election_slugs, write_all=False):
+        """
+        Stream the memberships for `election_slugs` from the database, writing
+        each row to the election file, the election date file and, if
+        `write_all` is True, the all and elected-all files.
+
+        Memberships come out of `for_csv` ordered by election, so only one
+        election file is open at a time.
+        """
+        memberships = Membership.objects.for_csv()
+        if not write_all:
+            memberships = memberships.filter(
+                ballot__election__slug__in=election_slugs
+            )
+
+        shared_files = []
+        if write_all:
+            all_file = CSVOutputFile(self.slug_to_file_name("all"))
+            elected_file = CSVOutputFile(self.slug_to_file_name("elected-all"))
+            shared_files = [all_file, elected_file]
+
+        date_files = {}
+        election_file = None
+        written = []
+        for row in iter_dicts_for_csv(memberships):
+            election_slug = row["election"]
+            if not written or written[-1] != election_slug:
+                if election_file:
+                    election_file.close()
+                election_file = CSVOutputFile(
+                    self.slug_to_file_name(election_slug)
+                )
+                written.append(election_slug)
+
+            date = slug_to_date(election_slug)
+            if date not in date_files:
+                date_files[date] = CSVOutputFile(self.slug_to_file_name(date))
+
+            election_file.writerow(row)
+            date_files[date].writerow(row)
+            if write_all:
+                all_file.writerow(row)
+                if row["elected"]:
+                    elected_file.writerow(row)
+
+        if election_file:
+            election_file.close()
+        for output_file in list(date_files.values()) + shared_files:
+            output_file.close()
+
+        # We still want a file to exist if there are no candidates yet,
+        # as the files linked to as soon as the election is created
+        for election_slug in set(election_slugs) - set(written):
+            CSVOutputFile(self.slug_to_file_name(election_slug)).close()
+
+    def write_all_from_election_files(self, ordered_slugs):
+        """
+        Build the all and elected-all files by joining up the existing
+        election files, rather than querying for every membership again.
+        """
+        all_file = CSVOutputFile(self.slug_to_file_name("all"))
+        elected_file = CSVOutputFile(self.slug_to_file_name("elected-all"))
+        for slug in ordered_slugs:
+            file_name = self.slug_to_file_name(slug)
+            if not self.storage.exists(file_name):
+                continue
+            with self.storage.open(file_name, "rb") as election_file:
+                reader = csv.DictReader(
+                    io.TextIOWrapper(
+                        election_file, encoding="utf-8", newline=""
+                    )
+                )
+                for row in reader:
+                    all_file.writerow(row)
+                    if row["elected"] == "True":
+                        elected_file.writerow(row)
+        all_file.close()
+        elected_file.close()
+
     def handle(self, **options):
         if options["election"]:
             try:
@@ -61,39 +192,48 @@ class Command(BaseCommand):
 
         self.options = options
         self.output_prefix = "candidates"
+        self.storage = DefaultStorage()
 
-        membership_by_election, elected_by_election = memberships_dicts_for_csv(
-            election_slug
-        )
-        # Write a file per election, optionally adding candidates
-        # We still want a file to exist if there are no candidates yet,
-        # as the files linked to as soon as the election is created
-        for election in Election.objects.all():
-            safely_write(
-                self.slug_to_file_name(election.slug),
-                membership_by_election.get(election.slug, []),
+        run_started = timezone.now()
+        ordered_slugs = list(
+            Election.objects.order_by("election_date", "-slug").values_list(
+                "slug", flat=True
             )
+        )
 
-        # Make a CSV file per election date
-        slugs_by_date = defaultdict(list)
-        for slug in membership_by_election.keys():
-            slugs_by_date[slug.split(".")[-1]].append(slug)
-        for date, slugs in slugs_by_date.items():
-            memberships_for_date = []
-            for slug in slugs:
-                memberships_for_date += membership_by_election[slug]
-            safely_write(self.slug_to_file_name(date), memberships_for_date)
-
-        # If we're not outputting a single election, output all elections
-        if not election_slug:
-            sorted_elections = sorted(
-                membership_by_election.keys(),
-                key=lambda key: key.split(".")[-1],
+        if election_slug:
+            # Every file for the date of this election has to be rewritten,
+            # so write all the elections on that date.
+            date = slug_to_date(election_slug)
+            self.write_memberships(
+                [slug for slug in ordered_slugs if slug_to_date(slug) == date]
             )
-            all_memberships = []
-            all_elected = []
-            for slug in sorted_elections:
-                all_memberships += membership_by_election[slug]
-                all_elected += elected_by_election[slug]
-            safely_write(self.slug_to_file_name("all"), all_memberships)
-            safely_write(self.slug_to_file_name("elected-all"), all_elected)
+            for slug in ordered_slugs:
+                file_name = self.slug_to_file_name(slug)
+                if not self.storage.exists(file_name):
+                    CSVOutputFile(file_name).close()
+            return
+
+        counts = membership_counts_by_election()
+        fingerprints = election_fingerprints()
+        changed = self.elections_to_regenerate(
+            ordered_slugs, counts, fingerprints
+        )
+        if changed is None:
+            self.write_memberships(ordered_slugs, write_all=True)
+        elif changed:
+            # Date files hold every election on that date, so elections
+            # sharing a date with a changed election need writing too
+            changed_dates = {slug_to_date(slug) for slug in changed}
+            self.write_memberships(
+                [
+                    slug
+                    for slug in ordered_slugs
+                    if slug_to_date(slug) in changed_dates
+                ]
+            )
+            self.write_all_from_election_files(ordered_slugs)
+        elif int(options["verbosity"]) > 1:
+            self.stdout.write("No elections have changed since the last run")
+
+        self.save_state(run_started, counts, fingerprints)
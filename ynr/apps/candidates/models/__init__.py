@@ -17,5 +17,6 @@ from candidates.models.popolo_extra import (  # noqa
     Ballot,
     PartySet,
     UnsafeToDelete,
+    raise_if_any_unsafe_to_delete,
     raise_if_unsafe_to_delete,
 )
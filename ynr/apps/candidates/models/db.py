@@ -4,9 +4,10 @@ from enum import Enum, unique
 
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import JSONField
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.db.models.signals import post_save
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.html import escape
 from django.utils.six import text_type
 
@@ -133,6 +134,17 @@ class LoggedAction(models.Model):
             )
         return ""
 
+    @cached_property
+    def person_version_diff(self):
+        """
+        The person version this action created, with its diffs against its
+        parents. This is cached so that everything deciding if this action
+        needs review shares a single lookup.
+        """
+        if not self.person or not self.popit_person_new_version:
+            return None
+        return self.person.get_version_diff(self.popit_person_new_version)
+
     @property
     def diff_html(self):
         from popolo.models import VersionNotFound
@@ -183,16 +195,111 @@ class PersonRedirect(models.Model):
     old_person_id = models.IntegerField()
     new_person_id = models.IntegerField()
 
+    # Stop following a chain of redirects after this many, in case there's
+    # a loop
+    MAX_CHAIN_LENGTH = 100
+
     @classmethod
-    def all_redirects_dict(cls):
+    def all_redirects_dict(cls, new_person_ids=None):
+        """
+        Return a dict of each person ID to the sorted list of the old IDs
+        that redirect to it.
+
+        Chains of redirects are collapsed when people are merged, so this
+        doesn't need to follow them.
+        """
+        redirects = cls.objects.all()
+        if new_person_ids is not None:
+            redirects = redirects.filter(new_person_id__in=new_person_ids)
         new_to_sorted_old = defaultdict(list)
-        for old, new in cls.objects.values_list(
-            "old_person_id", "new_person_id"
-        ):
+        for old, new in redirects.values_list("old_person_id", "new_person_id"):
             new_to_sorted_old[new].append(old)
-            new_to_sorted_old[new].sort()
+        for old_person_ids in new_to_sorted_old.values():
+            old_person_ids.sort()
         return new_to_sorted_old
 
+    @classmethod
+    def get_new_person_id(cls, old_person_id):
+        """
+        Return the ID of the person that `old_person_id` redirects to,
+        following any chain of redirects in one query, or raise
+        `PersonRedirect.DoesNotExist`.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                WITH RECURSIVE chain(person_id, length) AS (
+                    SELECT new_person_id, 1
+                    FROM {table}
+                    WHERE old_person_id = %s
+                  UNION
+                    SELECT redirect.new_person_id, chain.length + 1
+                    FROM {table} redirect
+                    JOIN chain ON redirect.old_person_id = chain.person_id
+                    WHERE chain.length < %s
+                )
+                SELECT person_id FROM chain
+                ORDER BY length DESC, person_id
+                LIMIT 1
+                """.format(
+                    table=cls._meta.db_table
+                ),
+                [old_person_id, cls.MAX_CHAIN_LENGTH],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise cls.DoesNotExist
+        return row[0]
+
+    @classmethod
+    def add_redirects(cls, new_person_ids):
+        """
+        Redirect each old person ID in the dict `new_person_ids` to the new
+        person ID it maps to, along with any IDs that already redirect to
+        the old IDs, so that every redirect points at a person that exists.
+        """
+        cls.objects.filter(new_person_id__in=list(new_person_ids)).update(
+            new_person_id=models.Case(
+                *[
+                    models.When(new_person_id=old, then=models.Value(new))
+                    for old, new in new_person_ids.items()
+                ],
+                output_field=models.IntegerField()
+            )
+        )
+        return cls.objects.bulk_create(
+            [
+                cls(old_person_id=old, new_person_id=new)
+                for old, new in sorted(new_person_ids.items())
+            ]
+        )
+
+    @classmethod
+    def collapse_chains(cls):
+        """
+        Point every redirect that leads to another redirect at the end of
+        its chain, returning the redirects that were changed.
+
+        Loops of redirects are left as they are.
+        """
+        redirects = list(cls.objects.all())
+        old_to_new = {r.old_person_id: r.new_person_id for r in redirects}
+        changed = []
+        for redirect in redirects:
+            new_person_id = redirect.new_person_id
+            seen = {redirect.old_person_id}
+            while new_person_id in old_to_new and new_person_id not in seen:
+                seen.add(new_person_id)
+                new_person_id = old_to_new[new_person_id]
+            if new_person_id in seen:
+                # A loop
+                continue
+            if new_person_id != redirect.new_person_id:
+                redirect.new_person_id = new_person_id
+                changed.append(redirect)
+        cls.objects.bulk_update(changed, ["new_person_id"])
+        return changed
+
 
 class UserTermsAgreement(models.Model):
     user = models.OneToOneField(
@@ -1,13 +1,13 @@
 import datetime
 
-from django.contrib.admin.utils import NestedObjects
-from django.db import connection, models
+from django.db import models
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import mark_safe
 
 from candidates.models.auth import TRUSTED_TO_LOCK_GROUP_NAME
 from elections.models import Election
+from utils.db import get_related_object_labels
 
 
 """Extensions to the base django-popolo classes for YourNextRepresentative
@@ -26,36 +26,55 @@ class UnsafeToDelete(Exception):
 
 
 def raise_if_unsafe_to_delete(model):
-    if model._meta.label == "popolo.Membership":
-        if model.ballot.candidates_locked:
-            raise UnsafeToDelete(
-                "Can't delete a membership of a locked ballot ({})".format(
-                    model.ballot.ballot_paper_id
+    raise_if_any_unsafe_to_delete([model])
+
+
+def raise_if_any_unsafe_to_delete(objects):
+    """
+    Raise UnsafeToDelete if any of `objects` is a membership of a locked
+    ballot, or has other objects that depend on it.
+
+    The related objects of all the objects of each model are checked in one
+    query, so use `select_related("ballot")` when checking memberships.
+    """
+    by_model = {}
+    for obj in objects:
+        if obj._meta.label == "popolo.Membership":
+            if obj.ballot.candidates_locked:
+                raise UnsafeToDelete(
+                    "Can't delete a membership of a locked ballot ({})".format(
+                        obj.ballot.ballot_paper_id
+                    )
                 )
-            )
-    related_models = model_has_related_objects(model)
-    if related_models:
-        msg = (
-            "Trying to delete a {model} (pk={pk}) that other "
-            "objects depend on ({related_models})"
+        by_model.setdefault(obj._meta.model, []).append(obj)
+
+    for model, model_objects in by_model.items():
+        related = get_related_object_labels(
+            model, [obj.pk for obj in model_objects]
         )
-        raise UnsafeToDelete(
-            msg.format(
-                model=model._meta.model.__name__,
-                pk=model.id,
-                related_models=str(related_models),
+        for obj in model_objects:
+            if obj.pk not in related:
+                continue
+            msg = (
+                "Trying to delete a {model} (pk={pk}) that other "
+                "objects depend on ({related_models})"
+            )
+            raise UnsafeToDelete(
+                msg.format(
+                    model=model.__name__,
+                    pk=obj.pk,
+                    related_models=", ".join(related[obj.pk]),
+                )
             )
-        )
 
 
 def model_has_related_objects(model):
-    collector = NestedObjects(using="default")
-    collector.collect([model])
-    collected = collector.nested()
-    if len(collected) >= 2:
-        return collected[1]
-    assert collected[0] == model
-    return False
+    """
+    Return the labels of the models with objects that depend on `model`,
+    or False if there aren't any
+    """
+    related = get_related_object_labels(model._meta.model, [model.pk])
+    return related.get(model.pk, False)
 
 
 class BallotQueryset(models.QuerySet):
@@ -141,9 +160,7 @@ class Ballot(models.Model):
         return reverse("election_view", args=[self.ballot_paper_id])
 
     def safe_delete(self):
-        collector = NestedObjects(using=connection.cursor().db.alias)
-        collector.collect([self])
-        if len(collector.nested()) > 1:
+        if model_has_related_objects(self):
             raise self.UnsafeToDelete(
                 "Can't delete PEE {} with related objects".format(
                     self.ballot_paper_id
@@ -122,7 +122,7 @@ def get_person_as_version_data(person, new_person=False):
 def revert_person_from_version_data(person, version_data):
 
     from popolo.models import Membership, Post
-    from candidates.models import raise_if_unsafe_to_delete
+    from candidates.models import raise_if_any_unsafe_to_delete
 
     from elections.models import Election
 
@@ -164,13 +164,14 @@ def revert_person_from_version_data(person, version_data):
         )
 
     # Remove all candidacies, and recreate:
-    qs = (
+    memberships = list(
         Membership.objects.filter(person=person)
         .filter(result=None)
         .filter(ballot__candidates_locked=False)
+        .select_related("ballot")
     )
-    for membership in qs:
-        raise_if_unsafe_to_delete(membership)
+    raise_if_any_unsafe_to_delete(memberships)
+    for membership in memberships:
         membership.delete()
     # Also remove the indications of elections that this person is
     # known not to be standing in:
@@ -13,6 +13,7 @@ from mock import patch
 import people.tests.factories
 from candidates.models import LoggedAction
 from candidates.tests.uk_examples import UK2015ExamplesMixin
+from candidates.views.version_data import get_change_metadata
 from parties.models import Party
 from people.models import Person
 from people.tests.test_version_diffs import tidy_html_whitespace
@@ -183,6 +184,54 @@ class TestFlaggedEdits(UK2015ExamplesMixin, TestUserMixin, WebTest):
             1,
         )
 
+    def test_deciders_share_version_diff(self):
+        example_person = people.tests.factories.PersonFactory.create(
+            id="2009", name="Tessa Jowell"
+        )
+        for i in range(20):
+            LoggedAction.objects.create(
+                id=(1000 + i),
+                user=self.user,
+                action_type="person-update",
+                person=example_person,
+                popit_person_new_version=random_person_id(),
+                source="Just for tests...",
+            )
+        self.local_ballot.candidates_locked = True
+        self.local_ballot.save()
+        self.local_ballot.election.current = True
+        self.local_ballot.election.save()
+        example_person.memberships.create(
+            ballot=self.local_ballot, party=self.green_party
+        )
+        example_person.record_version(get_change_metadata(None, "Initial"))
+        example_person.save()
+
+        example_person.name = "A different name"
+        change_metadata = get_change_metadata(None, "Changed name")
+        example_person.record_version(change_metadata)
+        example_person.save()
+
+        original_get_version_diff = Person.get_version_diff
+        with patch.object(
+            Person,
+            "get_version_diff",
+            autospec=True,
+            side_effect=original_get_version_diff,
+        ) as get_version_diff:
+            la = LoggedAction.objects.create(
+                user=self.user,
+                action_type="person-update",
+                person=example_person,
+                popit_person_new_version=change_metadata["version_id"],
+                source="Changed name",
+            )
+        self.assertEqual(
+            la.flagged_type, "needs_review_due_to_current_candidate_name_change"
+        )
+        # Both the statement and the name deciders look at the diff
+        self.assertEqual(get_version_diff.call_count, 1)
+
 
 @patch.object(Person, "diff_for_version", fake_diff_html)
 @patch("candidates.models.db.datetime")
@@ -1,4 +1,7 @@
+import csv
+import io
 from datetime import timedelta
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.storage import DefaultStorage
@@ -7,7 +10,12 @@ from django.core.management.base import CommandError
 from django.test import TestCase
 
 import people.tests.factories
-from candidates.csv_helpers import list_to_csv, memberships_dicts_for_csv
+from candidates.csv_helpers import (
+    CSVOutputFile,
+    dicts_for_csv,
+    list_to_csv,
+    memberships_dicts_for_csv,
+)
 from candidates.models import PersonRedirect
 from candidates.tests.helpers import TmpMediaRootMixin
 from moderation_queue.tests.paths import EXAMPLE_IMAGE_FILENAME
@@ -121,8 +129,48 @@ class CSVTests(TmpMediaRootMixin, TestUserMixin, UK2015ExamplesMixin, TestCase):
             "http://www.theyworkforyou.com/mp/10326",
         )
 
+    def test_dicts_for_csv_constant_queries(self):
+        def get_memberships():
+            return list(Membership.objects.for_csv().prefetch_related(None))
+
+        # Identifiers, primary images with their users, and redirects
+        memberships = get_memberships()
+        with self.assertNumQueries(3):
+            rows = dicts_for_csv(memberships)
+        self.assertEqual(len(rows), 4)
+
+        for i in range(10):
+            person = people.tests.factories.PersonFactory.create(
+                id=3000 + i, name="Candidate {}".format(i)
+            )
+            person.tmp_person_identifiers.create(
+                value_type="email", value="candidate{}@example.com".format(i)
+            )
+            PersonImage.objects.create(
+                person=person,
+                image="images/candidate-{}.jpg".format(i),
+                is_primary=True,
+                uploading_user=self.user,
+            )
+            factories.MembershipFactory.create(
+                person=person,
+                post=self.camberwell_post,
+                party=self.labour_party,
+                ballot=self.camberwell_post_ballot,
+            )
+        PersonRedirect.objects.create(old_person_id=12, new_person_id=3000)
+
+        memberships = get_memberships()
+        with self.assertNumQueries(3):
+            rows = dicts_for_csv(memberships)
+        self.assertEqual(len(rows), 14)
+        row = [row for row in rows if row["id"] == 3000][0]
+        self.assertEqual(row["email"], "candidate0@example.com")
+        self.assertEqual(row["image_uploading_user"], "john")
+        self.assertEqual(row["old_person_ids"], "12")
+
     def test_as_dict_2010(self):
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(4):
             memberships_dicts, elected = memberships_dicts_for_csv(
                 self.earlier_election.slug
             )
@@ -157,7 +205,7 @@ class CSVTests(TmpMediaRootMixin, TestUserMixin, UK2015ExamplesMixin, TestCase):
             )
         )
 
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(4):
             memberships_dicts, elected = memberships_dicts_for_csv()
         all_members = []
         for slug, members in memberships_dicts.items():
@@ -253,3 +301,80 @@ class CSVTests(TmpMediaRootMixin, TestUserMixin, UK2015ExamplesMixin, TestCase):
             "candidates-parl.2015-05-07.csv"
         ).read()
         self.assertEqual(len(non_empty_file.splitlines()), 3)
+
+    def test_create_csv_all_file_matches_list_to_csv(self):
+        call_command("candidates_create_csv")
+        memberships_dicts, elected = memberships_dicts_for_csv()
+        all_members = []
+        for slug, members in memberships_dicts.items():
+            all_members += members
+        self.assertEqual(
+            self.storage.open("candidates-all.csv").read().decode("utf-8"),
+            list_to_csv(all_members),
+        )
+
+    def test_create_csv_only_writes_changed_elections(self):
+        call_command("candidates_create_csv")
+
+        membership = self.gb_person.memberships.get(
+            ballot=self.camberwell_post_ballot
+        )
+        membership.elected = True
+        membership.save()
+
+        with mock.patch(
+            "candidates.management.commands.candidates_create_csv.CSVOutputFile",
+            wraps=CSVOutputFile,
+        ) as output_file:
+            call_command("candidates_create_csv")
+        self.assertSetEqual(
+            {call[0][0] for call in output_file.call_args_list},
+            {
+                "candidates-parl.2015-05-07.csv",
+                "candidates-2015-05-07.csv",
+                "candidates-all.csv",
+                "candidates-elected-all.csv",
+            },
+        )
+        elected_file = self.storage.open("candidates-elected-all.csv").read()
+        self.assertEqual(len(elected_file.splitlines()), 2)
+        incremental_all = self.storage.open("candidates-all.csv").read()
+
+        # Nothing has changed, so nothing is written
+        with mock.patch(
+            "candidates.management.commands.candidates_create_csv.CSVOutputFile",
+            wraps=CSVOutputFile,
+        ) as output_file:
+            call_command("candidates_create_csv")
+        self.assertEqual(output_file.call_count, 0)
+
+        call_command("candidates_create_csv", "--full")
+        self.assertEqual(
+            self.storage.open("candidates-all.csv").read(), incremental_all
+        )
+
+    def read_csv_rows(self, file_name):
+        with self.storage.open(file_name) as f:
+            return list(csv.DictReader(io.StringIO(f.read().decode("utf-8"))))
+
+    def test_create_csv_writes_elections_with_changed_fields(self):
+        call_command("candidates_create_csv")
+        rows = self.read_csv_rows("candidates-parl.2015-05-07.csv")
+        self.assertTrue(rows)
+        self.assertEqual({row["election_current"] for row in rows}, {"True"})
+
+        # Elections have no timestamp, so this is only noticed by the
+        # fingerprint of the election
+        self.election.current = False
+        self.election.save()
+        with mock.patch(
+            "candidates.management.commands.candidates_create_csv.CSVOutputFile",
+            wraps=CSVOutputFile,
+        ) as output_file:
+            call_command("candidates_create_csv")
+        self.assertIn(
+            "candidates-parl.2015-05-07.csv",
+            {call[0][0] for call in output_file.call_args_list},
+        )
+        rows = self.read_csv_rows("candidates-parl.2015-05-07.csv")
+        self.assertEqual({row["election_current"] for row in rows}, {"False"})
@@ -1,10 +1,13 @@
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
 
 from candidates.models.popolo_extra import (
     UnsafeToDelete,
     model_has_related_objects,
+    raise_if_any_unsafe_to_delete,
     raise_if_unsafe_to_delete,
 )
+from people.models import Person
 from people.tests.factories import PersonFactory
 
 
@@ -21,3 +24,28 @@ class TestSafeDelete(TestCase):
         )
         with self.assertRaises(UnsafeToDelete):
             raise_if_unsafe_to_delete(person)
+
+    def test_cant_delete_with_generic_related_objects(self):
+        person = PersonFactory()
+        person.other_names.create(name="Another name")
+        self.assertEqual(
+            model_has_related_objects(person), ["popolo.OtherName"]
+        )
+
+    def test_checks_many_objects_in_one_query(self):
+        people = [PersonFactory() for i in range(5)]
+        # Generic relations look up the ContentType, which is cached after
+        # the first lookup. Warm the cache so the count doesn't depend on
+        # which tests ran first.
+        ContentType.objects.get_for_model(Person)
+        with self.assertNumQueries(1):
+            raise_if_any_unsafe_to_delete(people)
+
+        people[3].tmp_person_identifiers.create(
+            value="foo@example.com", value_type="email"
+        )
+        with self.assertNumQueries(1):
+            with self.assertRaisesRegex(
+                UnsafeToDelete, r"pk={}\)".format(people[3].pk)
+            ):
+                raise_if_any_unsafe_to_delete(people)
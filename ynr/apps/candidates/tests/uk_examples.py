@@ -5,6 +5,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.management import call_command
 
 import people.tests.factories
+from elections.slug_cache import election_slug_cache
 from parties.tests.factories import PartyFactory
 
 from . import factories
@@ -51,6 +52,7 @@ EXAMPLE_PARTIES = [
 class UK2015ExamplesMixin(object, metaclass=ABCMeta):
     def setUp(self):
         ContentType.objects.clear_cache()
+        election_slug_cache.clear()
 
     @classmethod
     def setUpTestData(cls):
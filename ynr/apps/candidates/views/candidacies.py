@@ -5,7 +5,7 @@ from django.shortcuts import get_object_or_404
 from django.views.generic import FormView
 
 from auth_helpers.views import user_in_group
-from candidates.models import raise_if_unsafe_to_delete
+from candidates.models import raise_if_any_unsafe_to_delete
 from candidates.models.constraints import check_no_candidancy_for_election
 from elections.mixins import ElectionMixin
 from people.forms import CandidacyCreateForm, CandidacyDeleteForm
@@ -95,11 +95,13 @@ class CandidacyDeleteView(ElectionMixin, LoginRequiredMixin, FormView):
                 source=change_metadata["information_source"],
             )
 
-            memberships_to_delete = person.memberships.filter(
-                post=post, ballot__election=self.election_data
+            memberships_to_delete = list(
+                person.memberships.filter(
+                    post=post, ballot__election=self.election_data
+                ).select_related("ballot")
             )
+            raise_if_any_unsafe_to_delete(memberships_to_delete)
             for m in memberships_to_delete:
-                raise_if_unsafe_to_delete(m)
                 m.delete()
 
             check_no_candidancy_for_election(person, self.election_data)
@@ -1,4 +1,3 @@
-import json
 import re
 
 from braces.views import LoginRequiredMixin
@@ -136,10 +135,7 @@ class PersonView(TemplateView):
     def get_person_redirect(self, person_id):
         # If there's a PersonRedirect for this person ID, do the
         # redirect, otherwise process the GET request as usual.
-        # try:
-        new_person_id = PersonRedirect.objects.get(
-            old_person_id=person_id
-        ).new_person_id
+        new_person_id = PersonRedirect.get_new_person_id(person_id)
         return HttpResponsePermanentRedirect(
             reverse("person-view", kwargs={"person_id": new_person_id})
         )
@@ -158,13 +154,11 @@ class RevertPersonView(LoginRequiredMixin, View):
 
             person = get_object_or_404(Person, id=person_id)
 
-            versions = json.loads(person.versions)
-
-            data_to_revert_to = None
-            for version in versions:
-                if version["version_id"] == version_id:
-                    data_to_revert_to = version["data"]
-                    break
+            data_to_revert_to = (
+                person.version_set.filter(version_id=version_id)
+                .values_list("data", flat=True)
+                .first()
+            )
 
             if not data_to_revert_to:
                 message = "Couldn't find the version {0} of person {1}"
@@ -267,8 +261,7 @@ class CorrectNotStandingMergeView(
     required_group_name = TRUSTED_TO_MERGE_GROUP_NAME
 
     def extract_not_standing_edit(self, election, versions):
-        versions_json = json.loads(versions)
-        for version in versions_json:
+        for version in versions:
             try:
                 membership = version["data"]["standing_in"][election.slug]
                 if membership is None:
@@ -291,7 +284,7 @@ class CorrectNotStandingMergeView(
                         "person_not_standing": person_not_standing,
                         "version": self.extract_not_standing_edit(
                             membership.ballot.election,
-                            person_not_standing.versions,
+                            person_not_standing.get_versions(),
                         ),
                     }
                 )
@@ -370,7 +363,7 @@ class UpdatePersonView(ProcessInlineFormsMixin, LoginRequiredMixin, FormView):
             self.request.user
         )
 
-        context["versions"] = get_version_diffs(json.loads(person.versions))
+        context["versions"] = get_version_diffs(person.get_versions())
 
         context = get_person_form_fields(context, context["form"])
 
@@ -8,7 +8,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 import elections.api.next.serializers
-from api.next.views import ResultsSetPagination
+from api.next.cache import SerializerCacheMixin
+from api.next.views import CursorPaginationMixin, ResultsSetPagination
 from candidates import models as extra_models
 from candidates.api.next.serializers import LoggedActionSerializer
 from elections.filters import BallotFilter
@@ -27,12 +28,16 @@ class ElectionViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = ResultsSetPagination
 
 
-class BallotViewSet(viewsets.ReadOnlyModelViewSet):
+class BallotViewSet(
+    CursorPaginationMixin, SerializerCacheMixin, viewsets.ReadOnlyModelViewSet
+):
     """
     A paginated list of all ballots
 
     """
 
+    serializer_cache_kind = "ballot"
+
     lookup_field = "ballot_paper_id"
     lookup_value_regex = r"(?!\.json$)[^/]+"
     queryset = (
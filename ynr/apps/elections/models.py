@@ -1,12 +1,16 @@
 from collections import OrderedDict
 from datetime import date
 
-from django.contrib.admin.utils import NestedObjects
-from django.db import connection, models
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django.utils import timezone
 
+from elections.slug_cache import election_slug_cache
+from utils.db import get_related_object_labels
+
 
 class ElectionQuerySet(models.QuerySet):
     def current(self, current=True):
@@ -69,6 +73,16 @@ class Election(models.Model):
     objects = ElectionManager.from_queryset(ElectionQuerySet)()
     UnsafeToDelete = Exception
 
+    # Whether this election was current when it was loaded, so that party
+    # candidate counts are only updated when that changes
+    loaded_current = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_current = instance.__dict__.get("current")
+        return instance
+
     def __str__(self):
         return self.name
 
@@ -223,9 +237,7 @@ class Election(models.Model):
                 "Can't delete 'current' election {}".format(self.slug)
             )
 
-        collector = NestedObjects(using=connection.cursor().db.alias)
-        collector.collect([self])
-        if len(collector.nested()) > 1:
+        if get_related_object_labels(Election, [self.pk]):
             raise self.UnsafeToDelete(
                 "Can't delete election {} with related objects".format(
                     self.slug
@@ -233,3 +245,9 @@ class Election(models.Model):
             )
 
         self.delete()
+
+
+@receiver(post_save, sender=Election)
+@receiver(post_delete, sender=Election)
+def invalidate_election_slug_cache(sender, instance, **kwargs):
+    election_slug_cache.invalidate()
@@ -0,0 +1,98 @@
+"""
+A process level cache of the name and date of every election, by slug.
+
+Rendering a person's history describes a lot of operations on elections,
+and looking each one up would be a query per operation. There aren't many
+elections, so they're all loaded at once, and the slugs of elections that
+have been renamed (see `ynr_refactoring.constants.UPDATED_SLUGS`) are
+mapped to the election they were renamed to.
+
+The cache is cleared when an election is saved or deleted. Other processes
+notice that within `CHECK_INTERVAL` seconds, via a version number in the
+Django cache.
+"""
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+
+from ynr_refactoring.constants import UPDATED_SLUGS
+
+VERSION_CACHE_KEY = "election-slug-cache-version"
+CHECK_INTERVAL = 30
+
+ElectionInfo = namedtuple("ElectionInfo", ["name", "election_date"])
+
+
+class ElectionSlugCache(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.elections = None
+        self.version = None
+        self.checked_at = 0
+
+    def load(self):
+        from elections.models import Election
+
+        elections = {
+            slug: ElectionInfo(name, election_date)
+            for slug, name, election_date in Election.objects.values_list(
+                "slug", "name", "election_date"
+            )
+        }
+        for old_slug, new_slug in UPDATED_SLUGS.items():
+            if old_slug not in elections and new_slug in elections:
+                elections[old_slug] = elections[new_slug]
+        return elections
+
+    def is_stale(self):
+        if time.time() - self.checked_at < CHECK_INTERVAL:
+            return False
+        self.checked_at = time.time()
+        return cache.get(VERSION_CACHE_KEY) != self.version
+
+    def get(self, slug):
+        """
+        Return the `ElectionInfo` for `slug`, or None if there isn't an
+        election with that slug
+        """
+        with self.lock:
+            if self.elections is None or self.is_stale():
+                self.version = cache.get(VERSION_CACHE_KEY)
+                self.checked_at = time.time()
+                self.elections = self.load()
+            return self.elections.get(slug)
+
+    def name_and_in_past(self, slug):
+        """
+        Return the name of the election with `slug` and whether it's in the
+        past, or None if there isn't one
+        """
+        election = self.get(slug)
+        if election is None:
+            return None
+        return election.name, election.election_date < date.today()
+
+    def clear(self):
+        with self.lock:
+            self.elections = None
+
+    def invalidate(self):
+        """
+        Clear the cache in this process, and tell other processes to once
+        the current transaction is committed
+        """
+
+        def invalidate_everywhere():
+            cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            self.clear()
+
+        self.clear()
+        transaction.on_commit(invalidate_everywhere)
+
+
+election_slug_cache = ElectionSlugCache()
@@ -0,0 +1,61 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+
+from candidates.diffs import get_descriptive_value
+from candidates.tests.factories import (
+    ElectionFactory,
+    ParliamentaryChamberFactory,
+)
+from elections.slug_cache import election_slug_cache
+
+
+class TestElectionSlugCache(TestCase):
+    def setUp(self):
+        election_slug_cache.clear()
+        self.election = ElectionFactory.create(
+            slug="parl.2010-05-06",
+            name="2010 General Election",
+            election_date=date(2010, 5, 6),
+            organization=ParliamentaryChamberFactory.create(),
+        )
+
+    def test_name_and_in_past(self):
+        self.assertEqual(
+            election_slug_cache.name_and_in_past("parl.2010-05-06"),
+            ("2010 General Election", True),
+        )
+        self.assertIsNone(election_slug_cache.name_and_in_past("parl.2099"))
+
+    def test_updated_slugs(self):
+        self.assertEqual(
+            election_slug_cache.name_and_in_past("2010"),
+            ("2010 General Election", True),
+        )
+
+    def test_no_queries_once_loaded(self):
+        election_slug_cache.get("parl.2010-05-06")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                get_descriptive_value("2010", "standing_in", True, "elected"),
+                "was elected in the 2010 General Election",
+            )
+            self.assertEqual(
+                get_descriptive_value("parl.2099", "standing_in", None, None),
+                "was known not to be standing in the parl.2099 election",
+            )
+
+    def test_invalidated_on_save(self):
+        election_slug_cache.get("parl.2010-05-06")
+        self.election.name = "UK General Election 2010"
+        self.election.election_date = date.today() + timedelta(days=1)
+        self.election.save()
+        self.assertEqual(
+            election_slug_cache.name_and_in_past("parl.2010-05-06"),
+            ("UK General Election 2010", False),
+        )
+
+    def test_invalidated_on_delete(self):
+        election_slug_cache.get("parl.2010-05-06")
+        self.election.delete()
+        self.assertIsNone(election_slug_cache.get("parl.2010-05-06"))
@@ -1,28 +1,34 @@
+import hashlib
+import json
+import os
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
-from urllib.parse import urlencode
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import requests
 from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
+from api.next.cache import invalidate_serializer_cache
 from candidates.models import Ballot, PartySet
 from elections.models import Election as YNRElection
-from popolo.models import Organization, Post
+from elections.slug_cache import election_slug_cache
+from parties.models import update_candidate_counts_on_commit
+from popolo.models import Membership, Organization, Post
 
 ALWAYS_USES_LISTS = ["europarl"]
 
-ELECTION_CACHE = {}
-POST_CACHE = {}
-ORGANISATION_CACHE = {}
-PARTYSET_CACHE = {}
-
 
 class EEElection(dict):
     """
     An "Election" object represents something stored by EveryElection.
 
-    It knows how to turn itself in to a Post or Election in YNR terms
-    depending on the type of election group it is. This is a slight fudge
+    It knows the values of the Post or Election it becomes in YNR terms
+    depending on the type of election group it is; `EveryElectionSync`
+    does the saving. This is a slight fudge
     as YNR only has 2 tiers of "election"; the group (or "Election") and the
     post object. EE has up to 4 tiers down to the ballot paper ID.
     """
@@ -42,62 +48,44 @@ class EEElection(dict):
             None,
         ]
 
-    def get_or_create_organisation(self):
-        if not self["organisation"]:
-            return (None, False)
-        org_name = self["organisation"]["official_name"]
-        classification = self["organisation"]["organisation_type"]
-        org_slug = ":".join([classification, self["organisation"]["slug"]])
-
-        if hasattr(self, "organization_object"):
-            self.organization_created = False
-        else:
-            try:
-                organization = Organization.objects.get(slug=org_slug)
-                self.organization_created = False
-            except Organization.DoesNotExist:
-                organization = Organization.objects.create(
-                    name=org_name, classification=classification, slug=org_slug
-                )
-                self.organization_created = True
-
-            self.organization_object = organization
-        return (self.organization_object, self.organization_created)
+    @property
+    def organisation_slug(self):
+        return ":".join(
+            [
+                self["organisation"]["organisation_type"],
+                self["organisation"]["slug"],
+            ]
+        )
 
-    def get_or_create_election(self):
-        if self["election_id"] in ELECTION_CACHE:
-            self.election_created = False
-            self.election_object = ELECTION_CACHE[self["election_id"]]
-        else:
-            party_lists_in_use = False
-            election_type = self["election_id"].split(".")[0]
-            if self["voting_system"]:
-                party_lists_in_use = self["voting_system"]["uses_party_lists"]
-            elif election_type in ALWAYS_USES_LISTS:
-                party_lists_in_use = True
-
-            election_obj, created = YNRElection.objects.update_or_create(
-                slug=self["election_id"],
-                election_date=self["poll_open_date"],
-                defaults={
-                    "current": self["current"],
-                    "candidate_membership_role": "Candidate",
-                    "for_post_role": self["election_type"]["name"],
-                    "show_official_documents": True,
-                    "name": self["election_title"],
-                    "party_lists_in_use": party_lists_in_use,
-                    "organization": self.get_or_create_organisation()[0],
-                },
-            )
-            self.election_object = election_obj
-            self.election_created = created
-            ELECTION_CACHE[self["election_id"]] = election_obj
-        return (self.election_object, self.election_created)
+    @property
+    def election_values(self):
+        """
+        The values for the YNR Election for this group, other than the slug,
+        date and organisation.
+        """
+        party_lists_in_use = False
+        election_type = self["election_id"].split(".")[0]
+        if self["voting_system"]:
+            party_lists_in_use = self["voting_system"]["uses_party_lists"]
+        elif election_type in ALWAYS_USES_LISTS:
+            party_lists_in_use = True
+
+        return {
+            "current": self["current"],
+            "candidate_membership_role": "Candidate",
+            "for_post_role": self["election_type"]["name"],
+            "show_official_documents": True,
+            "name": self["election_title"],
+            "party_lists_in_use": party_lists_in_use,
+        }
 
-    def get_or_create_partyset(self):
+    @property
+    def party_set_values(self):
         """
         The list of parties used for this election depends on the territory.
         Currently only Northern Ireland uses a different set.
+
+        Returns the slug and name of the PartySet.
         """
         # The division can have a different code to the organisation
         # for example UK wide orgs like `parl` has divisions in 4 differet
@@ -108,32 +96,14 @@ class EEElection(dict):
             territory_code = self["organisation"]["territory_code"]
 
         if territory_code == "NIR":
-            partyset_name = "Northern Ireland"
-            country = "ni"
-        else:
-            partyset_name = "Great Britain"
-            country = "gb"
-
-        if country in PARTYSET_CACHE:
-            self.party_set_created = False
-            self.party_set_object = PARTYSET_CACHE[country]
-        else:
-            (
-                self.party_set_object,
-                self.party_set_created,
-            ) = PartySet.objects.update_or_create(
-                slug=country, defaults={"name": partyset_name}
-            )
-            PARTYSET_CACHE[country] = self.party_set_object
-        return (self.party_set_object, self.party_set_created)
-
-    def get_or_create_post(self):
-        if not self.parent or self.children:
-            raise ValueError("Can't create YNR Post from a election group ID")
-
-        # Make an organisation
-        self.get_or_create_organisation()
+            return ("ni", "Northern Ireland")
+        return ("gb", "Great Britain")
 
+    @property
+    def post_values(self):
+        """
+        The slug, label and role of the YNR Post for this ballot
+        """
         if self["division"]:
             # Case 1, there is an organisational division relted to this
             # post
@@ -151,95 +121,7 @@ class EEElection(dict):
             slug = self["organisation"]["slug"]
             label = self["organisation"]["official_name"]
             role = self["elected_role"]
-
-        cache_key = "--".join([slug, self.organization_object.slug, label])
-        if cache_key in POST_CACHE:
-            self.post_created = False
-            self.post_object = POST_CACHE[cache_key]
-        else:
-            try:
-                self.post_object = Post.objects.get(
-                    slug=slug, organization=self.organization_object
-                )
-                self.post_created = False
-            except Post.DoesNotExist:
-                self.post_object = Post(
-                    label=label,
-                    organization=self.organization_object,
-                    slug=slug,
-                )
-                self.post_created = True
-
-            self.post_object.role = role
-            self.post_object.label = label
-            self.post_object.party_set = self.get_or_create_partyset()[0]
-            self.post_object.organization = self.organization_object
-            self.post_object.save()
-            POST_CACHE[cache_key] = self.post_object
-        return (self.post_object, self.post_created)
-
-    def get_or_create_ballot(self, parent):
-        if hasattr(self, "ballot_object"):
-            self.ballot_created = False
-        else:
-            # First, set up the Post and Election with related objects
-            self.get_or_create_post()
-
-            # Make sure we're creating an ID for the right parent
-            assert self.parent == parent["election_id"], "{} != {}".format(
-                self.parent, parent["election_id"]
-            )
-
-            # Note that we create the election of the parent
-            parent.get_or_create_election()
-
-            # Get the winner count
-            winner_count = self["seats_contested"]
-            try:
-                (
-                    self.ballot_object,
-                    self.ballot_created,
-                ) = Ballot.objects.update_or_create(
-                    ballot_paper_id=self["election_id"],
-                    defaults={
-                        "post": self.post_object,
-                        "election": parent.election_object,
-                        "winner_count": winner_count,
-                        "cancelled": self["cancelled"],
-                    },
-                )
-            except:
-                # This is an interesting case:
-                # Sometimes by-elections are called in multi-seat wards
-                # and sometimes (or at least, sometimes in the past) we mark
-                # them asa by-election. This project has a unique constraint
-                # on (post, election) that's mostly useful, but does break
-                # in this case. As a fudge, let's just add 1 to the winner_count
-                # for the existing ballot, and ignore the `.by.` election ID
-                # from EE
-                if ".by." in self["election_id"]:
-                    try:
-                        print(self["election_id"].replace(".by.", "."))
-                        existing_ballot = Ballot.objects.get(
-                            ballot_paper_id=self["election_id"].replace(
-                                ".by.", "."
-                            )
-                        )
-                        if not existing_ballot.winner_count:
-                            # We don't always set winners, but a by election
-                            # and scheduled election means there has to be at
-                            # least 2
-                            existing_ballot.winner_count = 2
-                        else:
-                            existing_ballot.winner_count += 1
-                        existing_ballot.save()
-                        self.ballot_object = existing_ballot
-                        self.ballot_created = False
-                    except Ballot.DoesNotExist:
-                        raise
-                else:
-                    raise
-        return (self.ballot_object, self.ballot_created)
+        return slug, label, role
 
     def delete_ballot(self):
         try:
@@ -279,8 +161,40 @@ def is_mayor_or_pcc_ballot(election):
     ] in ["mayor", "pcc"]
 
 
+class RecordedResponses(object):
+    """
+    A directory of previous responses from EveryElection, so that pages that
+    haven't changed since the last import can be requested conditionally.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url):
+        name = hashlib.sha1(url.encode("utf8")).hexdigest()
+        return os.path.join(self.directory, "{}.json".format(name))
+
+    def get(self, url):
+        try:
+            with open(self.path(url)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def save(self, url, response, data):
+        recorded = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "data": data,
+        }
+        with open(self.path(url), "w") as f:
+            json.dump(recorded, f)
+
+
 class EveryElectionImporter(object):
-    def __init__(self, query_args=None):
+    def __init__(self, query_args=None, workers=1, cache_dir=None):
         self.EE_BASE_URL = getattr(
             settings, "EE_BASE_URL", "https://elections.democracyclub.org.uk/"
         )
@@ -291,6 +205,88 @@ class EveryElectionImporter(object):
                 "poll_open_date__gte": str(date.today() - timedelta(days=30))
             }
         self.query_args = query_args
+        self.workers = workers
+        self.recorded_responses = None
+        if cache_dir:
+            self.recorded_responses = RecordedResponses(cache_dir)
+
+    def get_page(self, url):
+        """
+        Return the JSON for a page of the EE API.
+
+        If there's a recorded response for `url` the request is conditional,
+        and the recorded data is used if EE says it's not been modified.
+        """
+        if not self.recorded_responses:
+            req = requests.get(url)
+            req.raise_for_status()
+            return req.json()
+
+        recorded = self.recorded_responses.get(url)
+        headers = {}
+        if recorded and recorded["etag"]:
+            headers["If-None-Match"] = recorded["etag"]
+        if recorded and recorded["last_modified"]:
+            headers["If-Modified-Since"] = recorded["last_modified"]
+
+        req = requests.get(url, headers=headers)
+        if recorded and req.status_code == 304:
+            return recorded["data"]
+        req.raise_for_status()
+        data = req.json()
+        self.recorded_responses.save(url, req, data)
+        return data
+
+    def get_page_urls(self, first_page):
+        """
+        Return the URLs of the rest of the pages after `first_page`, worked
+        out from the count and the limit and offset of the next page, so they
+        can be requested at once.
+
+        Returns None if the next URL doesn't use limit and offset.
+        """
+        next_url = first_page.get("next")
+        if not next_url:
+            return []
+
+        parts = urlsplit(next_url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        params = dict(query)
+        try:
+            limit = int(params["limit"])
+            offset = int(params["offset"])
+        except (KeyError, ValueError):
+            return None
+        if limit < 1:
+            return None
+
+        urls = []
+        for page_offset in range(offset, first_page["count"], limit):
+            page_query = [
+                (key, str(page_offset) if key == "offset" else value)
+                for key, value in query
+            ]
+            urls.append(urlunsplit(parts._replace(query=urlencode(page_query))))
+        return urls
+
+    def get_pages(self, url):
+        first_page = self.get_page(url)
+        pages = [first_page]
+
+        urls = self.get_page_urls(first_page)
+        if urls is None:
+            # Fall back to following the next links one at a time
+            url = first_page.get("next")
+            while url:
+                data = self.get_page(url)
+                pages.append(data)
+                url = data.get("next")
+        elif self.workers > 1 and len(urls) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                pages += executor.map(self.get_page, urls)
+        else:
+            pages += [self.get_page(url) for url in urls]
+        return pages
 
     def build_election_tree(self):
         """
@@ -301,14 +297,10 @@ class EveryElectionImporter(object):
         url = "{}api/elections/".format(self.EE_BASE_URL)
         prams = urlencode(OrderedDict(sorted(self.query_args.items())))
         url = "{}?{}".format(url, prams)
-        while url:
-            req = requests.get(url)
-            req.raise_for_status()
-            data = req.json()
+        for data in self.get_pages(url):
             for result in data["results"]:
                 election_id = result["election_id"]
                 self.election_tree[election_id] = EEElection(result)
-            url = data.get("next")
 
     @property
     def ballot_ids(self):
@@ -342,3 +334,299 @@ class EveryElectionImporter(object):
         if election_id[:-10] == "gla.a.":
             return child
         return self.election_tree[child.parent]
+
+
+def validate_fields(obj):
+    """
+    Validate the fields of a model that's going to be saved in bulk, which
+    skips the `pre_save` validation. Relations and unique fields are left to
+    the database, as checking them would take a query for each object.
+    """
+    obj.full_clean(
+        exclude=[f.name for f in obj._meta.fields if f.is_relation],
+        validate_unique=False,
+    )
+
+
+class EveryElectionSync(object):
+    """
+    Make the Organisations, Elections, Posts and Ballots in YNR match the
+    ballots in an `EveryElectionImporter` tree.
+
+    Rather than saving each object in turn, the objects that already exist
+    are loaded up front and compared to the tree, and only the ones that
+    are new or have changed are saved, in bulk.
+    """
+
+    def __init__(self, importer):
+        self.importer = importer
+        self.ballots = [
+            (ballot, importer.get_parent(ballot_id))
+            for ballot_id, ballot in importer.ballot_ids.items()
+        ]
+
+    def sync(self):
+        party_sets = self.sync_party_sets()
+        organisations = self.sync_organisations()
+        elections = self.sync_elections(organisations)
+        posts = self.sync_posts(organisations, party_sets)
+        self.sync_ballots(organisations, elections, posts)
+
+    def sync_party_sets(self):
+        party_sets = {}
+        for ballot, parent in self.ballots:
+            country, name = ballot.party_set_values
+            if country in party_sets:
+                continue
+            party_set, _ = PartySet.objects.get_or_create(
+                slug=country, defaults={"name": name}
+            )
+            if party_set.name != name:
+                party_set.name = name
+                party_set.save()
+            party_sets[country] = party_set
+        return party_sets
+
+    def sync_organisations(self):
+        wanted = {}
+        for ballot, parent in self.ballots:
+            for election in (parent, ballot):
+                if election["organisation"]:
+                    wanted[election.organisation_slug] = election
+
+        organisations = Organization.objects.in_bulk(
+            list(wanted.keys()), field_name="slug"
+        )
+        new_organisations = []
+        for slug, election in wanted.items():
+            if slug in organisations:
+                continue
+            organisation = Organization(
+                name=election["organisation"]["official_name"],
+                classification=election["organisation"]["organisation_type"],
+                slug=slug,
+            )
+            validate_fields(organisation)
+            new_organisations.append(organisation)
+        for organisation in Organization.objects.bulk_create(new_organisations):
+            organisations[organisation.slug] = organisation
+        return organisations
+
+    def sync_elections(self, organisations):
+        wanted = {}
+        for ballot, parent in self.ballots:
+            values = dict(
+                parent.election_values,
+                election_date=parse_date(parent["poll_open_date"]),
+                organization_id=None,
+            )
+            if parent["organisation"]:
+                organisation = organisations[parent.organisation_slug]
+                values["organization_id"] = organisation.pk
+            wanted[parent["election_id"]] = values
+
+        elections = YNRElection.objects.in_bulk(
+            list(wanted.keys()), field_name="slug"
+        )
+        new_elections = []
+        changed_elections = []
+        fields = set()
+        for slug, values in wanted.items():
+            election = elections.get(slug)
+            if not election:
+                new_elections.append(YNRElection(slug=slug, **values))
+                continue
+            changed = {
+                name
+                for name, value in values.items()
+                if getattr(election, name) != value
+            }
+            if changed:
+                for name in changed:
+                    setattr(election, name, values[name])
+                changed_elections.append(election)
+                fields |= changed
+
+        for election in YNRElection.objects.bulk_create(new_elections):
+            elections[election.slug] = election
+        if changed_elections:
+            YNRElection.objects.bulk_update(changed_elections, fields)
+
+        # Any election not in the tree is no longer current
+        no_longer_current = list(
+            YNRElection.objects.filter(current=True)
+            .exclude(pk__in=[election.pk for election in elections.values()])
+            .values_list("pk", flat=True)
+        )
+        if no_longer_current:
+            YNRElection.objects.filter(pk__in=no_longer_current).update(
+                current=False
+            )
+        changed_pks = [election.pk for election in changed_elections]
+        changed_pks += no_longer_current
+        if new_elections or changed_elections:
+            # Bulk writes don't send `post_save` either
+            election_slug_cache.invalidate()
+
+        # The `post_save` signal isn't sent for bulk updates, so update the
+        # candidate counts for the parties in elections that have changed
+        if changed_pks:
+            update_candidate_counts_on_commit(
+                Membership.objects.filter(
+                    ballot__election__in=changed_pks
+                ).values("party_id")
+            )
+        return elections
+
+    def sync_posts(self, organisations, party_sets):
+        wanted = {}
+        for ballot, parent in self.ballots:
+            slug, label, role = ballot.post_values
+            organisation = organisations[ballot.organisation_slug]
+            wanted[(slug, organisation.pk)] = {
+                "label": label,
+                "role": role,
+                "party_set": party_sets[ballot.party_set_values[0]],
+                "organization": organisation,
+            }
+
+        posts = {
+            (post.slug, post.organization_id): post
+            for post in Post.objects.filter(
+                slug__in={slug for slug, org_id in wanted},
+                organization__in={org_id for slug, org_id in wanted},
+            )
+        }
+        new_posts = []
+        changed_posts = []
+        now = timezone.now()
+        for key, values in wanted.items():
+            post = posts.get(key)
+            if not post:
+                post = Post(slug=key[0], **values)
+                validate_fields(post)
+                new_posts.append(post)
+                continue
+            if (
+                post.label != values["label"]
+                or post.role != values["role"]
+                or post.party_set_id != values["party_set"].pk
+            ):
+                post.label = values["label"]
+                post.role = values["role"]
+                post.party_set = values["party_set"]
+                post.updated_at = now
+                validate_fields(post)
+                changed_posts.append(post)
+
+        for post in Post.objects.bulk_create(new_posts):
+            posts[(post.slug, post.organization_id)] = post
+        if changed_posts:
+            Post.objects.bulk_update(
+                changed_posts, ["label", "role", "party_set", "updated_at"]
+            )
+        return posts
+
+    def sync_ballots(self, organisations, elections, posts):
+        # By-elections are handled after the other ballots, see below
+        ordered = sorted(
+            self.ballots, key=lambda pair: ".by." in pair[0]["election_id"]
+        )
+        election_pks = {
+            elections[parent["election_id"]].pk for ballot, parent in ordered
+        }
+        existing = Ballot.objects.filter(
+            Q(ballot_paper_id__in=[b["election_id"] for b, p in ordered])
+            | Q(election__in=election_pks)
+        )
+        by_id = {ballot.ballot_paper_id: ballot for ballot in existing}
+        by_post = {
+            (ballot.election_id, ballot.post_id): ballot
+            for ballot in by_id.values()
+        }
+        original = {
+            ballot_paper_id: (
+                ballot.post_id,
+                ballot.election_id,
+                ballot.winner_count,
+                ballot.cancelled,
+            )
+            for ballot_paper_id, ballot in by_id.items()
+        }
+
+        new_ballots = []
+        for ee_ballot, parent in ordered:
+            ballot_paper_id = ee_ballot["election_id"]
+            slug, label, role = ee_ballot.post_values
+            organisation = organisations[ee_ballot.organisation_slug]
+            post = posts[(slug, organisation.pk)]
+            election = elections[parent["election_id"]]
+            key = (election.pk, post.pk)
+            ballot = by_id.get(ballot_paper_id)
+
+            owner = by_post.get(key)
+            if owner and owner.ballot_paper_id != ballot_paper_id:
+                # This is an interesting case:
+                # Sometimes by-elections are called in multi-seat wards
+                # and sometimes (or at least, sometimes in the past) we mark
+                # them asa by-election. This project has a unique constraint
+                # on (post, election) that's mostly useful, but does break
+                # in this case. As a fudge, let's just add 1 to the winner_count
+                # for the existing ballot, and ignore the `.by.` election ID
+                # from EE
+                if ".by." not in ballot_paper_id:
+                    raise ValueError(
+                        "{} has the same post and election as {}".format(
+                            ballot_paper_id, owner.ballot_paper_id
+                        )
+                    )
+                existing_ballot = by_id.get(
+                    ballot_paper_id.replace(".by.", ".")
+                )
+                if not existing_ballot:
+                    raise Ballot.DoesNotExist(
+                        "No ballot for by-election {}".format(ballot_paper_id)
+                    )
+                if not existing_ballot.winner_count:
+                    # We don't always set winners, but a by election
+                    # and scheduled election means there has to be at
+                    # least 2
+                    existing_ballot.winner_count = 2
+                else:
+                    existing_ballot.winner_count += 1
+                continue
+
+            if not ballot:
+                ballot = Ballot(ballot_paper_id=ballot_paper_id)
+                new_ballots.append(ballot)
+                by_id[ballot_paper_id] = ballot
+            else:
+                by_post.pop((ballot.election_id, ballot.post_id), None)
+            ballot.post = post
+            ballot.election = election
+            ballot.winner_count = ee_ballot["seats_contested"]
+            ballot.cancelled = ee_ballot["cancelled"]
+            by_post[key] = ballot
+
+        changed_ballots = [
+            ballot
+            for ballot_paper_id, ballot in by_id.items()
+            if ballot_paper_id in original
+            and original[ballot_paper_id]
+            != (
+                ballot.post_id,
+                ballot.election_id,
+                ballot.winner_count,
+                ballot.cancelled,
+            )
+        ]
+        Ballot.objects.bulk_create(new_ballots)
+        if changed_ballots:
+            Ballot.objects.bulk_update(
+                changed_ballots,
+                ["post", "election", "winner_count", "cancelled"],
+            )
+            # The `post_save` signal isn't sent for bulk updates
+            invalidate_serializer_cache(
+                "ballot", [ballot.pk for ballot in changed_ballots]
+            )
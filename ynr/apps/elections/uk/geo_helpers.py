@@ -11,6 +11,7 @@ from django.utils.http import urlquote
 from django.utils.six.moves.urllib_parse import urljoin
 
 from candidates.models import Ballot
+from elections.uk.models import PostcodeBallot
 
 
 class BaseMapItException(Exception):
@@ -36,6 +37,12 @@ EE_BASE_URL = getattr(
 )
 
 
+def ballots_for_ids(ballot_paper_ids):
+    return Ballot.objects.current_or_future().filter(
+        ballot_paper_id__in=ballot_paper_ids
+    )
+
+
 def get_ballots(url, cache_key, exception):
     r = requests.get(url)
     if r.status_code == 200:
@@ -45,11 +52,9 @@ def get_ballots(url, cache_key, exception):
             for e in ee_result["results"]
             if not e["group_type"]
         ]
-        ballot_qs = Ballot.objects.current_or_future().filter(
-            ballot_paper_id__in=ballot_paper_ids
-        )
-        cache.set(cache_key, ballot_qs, settings.EE_CACHE_SECONDS)
-        return ballot_qs
+        # Only cache the IDs, rather than pickling a QuerySet
+        cache.set(cache_key, ballot_paper_ids, settings.EE_CACHE_SECONDS)
+        return ballots_for_ids(ballot_paper_ids)
     elif r.status_code == 400:
         ee_result = r.json()
         raise exception(ee_result["detail"])
@@ -59,18 +64,41 @@ def get_ballots(url, cache_key, exception):
         raise UnknownGeoException('Unknown error for "{0}"'.format(url))
 
 
+def normalise_postcode(postcode):
+    return re.sub(r"(?ms)\s*", "", postcode.lower())
+
+
+def get_ballot_ids_from_index(postcode):
+    """
+    Return the ballot paper IDs for `postcode` from the local index, or None
+    if the postcode isn't in the index.
+    """
+    ballot_paper_ids = list(
+        PostcodeBallot.objects.filter(postcode=postcode).values_list(
+            "ballot_paper_id", flat=True
+        )
+    )
+    if not ballot_paper_ids:
+        return None
+    return [ballot_id for ballot_id in ballot_paper_ids if ballot_id]
+
+
 def get_ballots_from_postcode(original_postcode):
-    postcode = re.sub(r"(?ms)\s*", "", original_postcode.lower())
+    postcode = normalise_postcode(original_postcode)
     if re.search(r"[^a-z0-9]", postcode):
         raise BadPostcodeException(
             'There were disallowed characters in "{0}"'.format(
                 original_postcode
             )
         )
-    cache_key = "geolookup-postcodes:" + postcode
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
+    cache_key = "geolookup-postcode-ballots:" + postcode
+    ballot_paper_ids = cache.get(cache_key)
+    if ballot_paper_ids is None:
+        ballot_paper_ids = get_ballot_ids_from_index(postcode)
+        if ballot_paper_ids is not None:
+            cache.set(cache_key, ballot_paper_ids, settings.EE_CACHE_SECONDS)
+    if ballot_paper_ids is not None:
+        return ballots_for_ids(ballot_paper_ids)
 
     url = urljoin(
         EE_BASE_URL, "/api/elections/?postcode={}".format(urlquote(postcode))
@@ -90,9 +118,9 @@ def get_ballots_from_coords(coords):
         EE_BASE_URL, "/api/elections/?coords={}".format(urlquote(coords))
     )
 
-    cache_key = "geolookup-coords:" + coords
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
+    cache_key = "geolookup-coords-ballots:" + coords
+    ballot_paper_ids = cache.get(cache_key)
+    if ballot_paper_ids is not None:
+        return ballots_for_ids(ballot_paper_ids)
 
     return get_ballots(url, cache_key, BadCoordinatesException)
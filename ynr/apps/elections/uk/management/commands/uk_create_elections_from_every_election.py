@@ -3,12 +3,22 @@ from datetime import date, timedelta
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
-from elections.models import Election
-from elections.uk.every_election import EveryElectionImporter
+from elections.uk.every_election import (
+    EveryElectionImporter,
+    EveryElectionSync,
+)
 
 
 class Command(BaseCommand):
-    help = "Create posts and elections from a EveryElection"
+    help = """
+    Create posts and elections from a EveryElection
+
+    Pages of results are requested `--workers` at a time. With `--cache-dir`
+    each response is recorded, and on the next run pages are requested
+    conditionally so that EE only sends the ones that have changed.
+
+    Only the objects that are new or have changed are saved.
+    """
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -16,29 +26,31 @@ class Command(BaseCommand):
             action="store_true",
             help="Do a full import of all elections",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="The number of pages to request from EE at once",
+        )
+        parser.add_argument(
+            "--cache-dir",
+            help="A directory to record responses from EE in between runs",
+        )
 
-    def import_approved_elections(self, full=False):
-        # Get all approved elections from EveryElection
-        query_args = None
-        if full:
-            query_args = {}
-        ee_importer = EveryElectionImporter(query_args)
-        ee_importer.build_election_tree()
-
-        for ballot_id, election_dict in ee_importer.ballot_ids.items():
-            parent = ee_importer.get_parent(ballot_id)
-            election_dict.get_or_create_ballot(parent=parent)
-
-    def delete_deleted_elections(self):
-        # Get all deleted elections from EE
+    def get_importer(self, query_args, options):
         ee_importer = EveryElectionImporter(
-            {
-                "poll_open_date__gte": str(date.today() - timedelta(days=30)),
-                "deleted": 1,
-            }
+            query_args,
+            workers=options["workers"],
+            cache_dir=options["cache_dir"],
         )
         ee_importer.build_election_tree()
+        return ee_importer
+
+    def import_approved_elections(self, ee_importer):
+        # Elections that aren't in the tree are marked as not current
+        EveryElectionSync(ee_importer).sync()
 
+    def delete_deleted_elections(self, ee_importer):
         for ballot_id, election_dict in ee_importer.ballot_ids.items():
             election_dict.delete_ballot()
 
@@ -46,11 +58,21 @@ class Command(BaseCommand):
             election_dict.delete_election()
 
     def handle(self, *args, **options):
+        # Get all approved elections from EveryElection
+        query_args = None
+        if options["full"]:
+            query_args = {}
+        approved = self.get_importer(query_args, options)
 
-        with transaction.atomic():
-            # Mark all elections as not current, any that are current will
-            # be (re)set later
-            Election.objects.update(current=False)
+        # Get all deleted elections from EE
+        deleted = self.get_importer(
+            {
+                "poll_open_date__gte": str(date.today() - timedelta(days=30)),
+                "deleted": 1,
+            },
+            options,
+        )
 
-            self.import_approved_elections(full=options["full"])
-            self.delete_deleted_elections()
+        with transaction.atomic():
+            self.import_approved_elections(approved)
+            self.delete_deleted_elections(deleted)
@@ -0,0 +1,68 @@
+import csv
+import io
+
+import requests
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from elections.uk.geo_helpers import normalise_postcode
+from elections.uk.models import PostcodeBallot
+
+
+class Command(BaseCommand):
+    help = """
+    Replace the local postcode to ballot index with the contents of a CSV
+    export from EveryElection.
+
+    The CSV needs `postcode` and `ballot_paper_id` columns, with one row for
+    each ballot in a postcode. Postcodes with no ballots should have a row
+    with a blank `ballot_paper_id`.
+
+    Postcodes are looked up in the index before asking EveryElection, so
+    this should be run again whenever ballots are added.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "source", help="The path or URL of the CSV file to import"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="The number of rows to insert at a time",
+        )
+
+    def open_source(self, source):
+        if source.startswith(("http://", "https://")):
+            response = requests.get(source, stream=True)
+            response.raise_for_status()
+            response.raw.decode_content = True
+            return io.TextIOWrapper(response.raw, encoding="utf-8")
+        return open(source, encoding="utf-8")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        count = 0
+        with self.open_source(options["source"]) as source_file:
+            with transaction.atomic():
+                PostcodeBallot.objects.all().delete()
+                batch = []
+                for row in csv.DictReader(source_file):
+                    postcode = normalise_postcode(row["postcode"])
+                    ballot_paper_id = (row["ballot_paper_id"] or "").strip()
+                    batch.append(
+                        PostcodeBallot(
+                            postcode=postcode, ballot_paper_id=ballot_paper_id
+                        )
+                    )
+                    if len(batch) >= batch_size:
+                        PostcodeBallot.objects.bulk_create(
+                            batch, ignore_conflicts=True
+                        )
+                        count += len(batch)
+                        batch = []
+                PostcodeBallot.objects.bulk_create(batch, ignore_conflicts=True)
+                count += len(batch)
+
+        self.stdout.write("Imported {} rows".format(count))
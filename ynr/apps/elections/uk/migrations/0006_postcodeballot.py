@@ -0,0 +1,31 @@
+# Generated by Django 2.2.4 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("uk", "0005_add_favourite_biscuits")]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostcodeBallot",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("postcode", models.CharField(db_index=True, max_length=10)),
+                (
+                    "ballot_paper_id",
+                    models.CharField(blank=True, max_length=255),
+                ),
+            ],
+            options={"unique_together": {("postcode", "ballot_paper_id")}},
+        )
+    ]
@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class PostcodeBallot(models.Model):
+    """
+    A local index of the ballots for each postcode, imported from an
+    EveryElection export with `uk_import_postcode_ballots`.
+
+    Postcodes are stored normalised (lower case, without spaces). A postcode
+    with no ballots is stored with a blank `ballot_paper_id`, so we know not
+    to ask EveryElection about it.
+    """
+
+    postcode = models.CharField(max_length=10, db_index=True)
+    ballot_paper_id = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        unique_together = ("postcode", "ballot_paper_id")
+
+    def __str__(self):
+        return "{}: {}".format(self.postcode, self.ballot_paper_id)
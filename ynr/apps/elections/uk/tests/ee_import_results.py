@@ -3,7 +3,7 @@ import json
 current_elections = json.loads(
     """
 {
-  "count": 518,
+  "count": 200,
   "next": "https://elections.democracyclub.org.uk/api/elections/?poll_open_date__gte=fakedate&limit=100&offset=100",
   "previous": null,
   "results": [
@@ -5322,7 +5322,7 @@ current_elections = json.loads(
 current_elections_page_2 = json.loads(
     """
 {
-  "count": 518,
+  "count": 200,
   "next": null,
   "previous": "https://elections.democracyclub.org.uk/api/elections/?limit=100&current=True",
   "results": [
@@ -1,5 +1,10 @@
+import tempfile
+
 from django.conf import settings
 from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils.six.moves.urllib_parse import urljoin
 from django_webtest import WebTest
 from freezegun import freeze_time
@@ -25,7 +30,7 @@ EE_BASE_URL = getattr(
 
 
 def create_mock_with_fixtures(fixtures):
-    def mock(url):
+    def mock(url, **kwargs):
         try:
             return Mock(
                 **{"json.return_value": fixtures[url], "status_code": 200}
@@ -65,6 +70,55 @@ fake_requests_each_type_of_election_on_one_day = create_mock_with_fixtures(
 )
 
 
+class TestEveryElectionImporterPages(TestCase):
+    def test_page_urls(self):
+        importer = every_election.EveryElectionImporter()
+        urls = importer.get_page_urls(
+            {
+                "count": 250,
+                "next": "https://example.com/api/elections/"
+                "?current=1&limit=100&offset=100",
+            }
+        )
+        self.assertEqual(
+            urls,
+            [
+                "https://example.com/api/elections/"
+                "?current=1&limit=100&offset=100",
+                "https://example.com/api/elections/"
+                "?current=1&limit=100&offset=200",
+            ],
+        )
+
+    def test_page_urls_without_offset(self):
+        importer = every_election.EveryElectionImporter()
+        self.assertIsNone(
+            importer.get_page_urls(
+                {"count": 250, "next": "https://example.com/?page=2"}
+            )
+        )
+        self.assertEqual(importer.get_page_urls(no_results), [])
+
+    @patch("elections.uk.every_election.requests")
+    def test_recorded_response_not_modified(self, mock_requests):
+        url = "https://example.com/api/elections/"
+        with tempfile.TemporaryDirectory() as cache_dir:
+            importer = every_election.EveryElectionImporter(cache_dir=cache_dir)
+            mock_requests.get.return_value = Mock(
+                status_code=200,
+                headers={"ETag": '"abc"'},
+                **{"json.return_value": local_highland}
+            )
+            self.assertEqual(importer.get_page(url), local_highland)
+            mock_requests.get.assert_called_with(url, headers={})
+
+            mock_requests.get.return_value = Mock(status_code=304)
+            self.assertEqual(importer.get_page(url), local_highland)
+            mock_requests.get.assert_called_with(
+                url, headers={"If-None-Match": '"abc"'}
+            )
+
+
 class EE_ImporterTest(WebTest):
     @patch("elections.uk.every_election.requests")
     @freeze_time("2018-02-02")
@@ -77,11 +131,6 @@ class EE_ImporterTest(WebTest):
         self.parent_id = "local.brent.2018-02-22"  # they're good elections
         self.child_id = "local.brent.alperton.2018-02-22"
 
-    def tearDown(self):
-        every_election.POST_CACHE = {}
-        every_election.ELECTION_CACHE = {}
-        every_election.PARTYSET_CACHE = {}
-
     def test_ee_importer_build_tree(self):
         self.assertEqual(len(self.ee_importer.election_tree.keys()), 200)
         self.assertEqual(len(self.ee_importer.ballot_ids.keys()), 189)
@@ -95,91 +144,49 @@ class EE_ImporterTest(WebTest):
         parent = self.ee_importer.get_parent(self.child_id)
         self.assertEqual(parent["election_id"], self.parent_id)
 
-    def test_create_election_from_election_dict(self):
-        election = self.ee_importer.election_tree[self.parent_id]
-
+    def test_sync_creates_election(self):
         # Start with no elections
         self.assertEqual(every_election.YNRElection.objects.all().count(), 0)
 
-        # Create and election from the API dict and verify it's there
-        election.get_or_create_election()
-        self.assertEqual(every_election.YNRElection.objects.all().count(), 1)
-        self.assertTrue(election.election_created)
-
-        # Create the same election again and check it's not duplicated
-        with self.assertNumQueries(0):
-            election.get_or_create_election()
-            self.assertFalse(election.election_created)
-        self.assertEqual(every_election.YNRElection.objects.all().count(), 1)
+        every_election.EveryElectionSync(self.ee_importer).sync()
+        election = every_election.YNRElection.objects.get(slug=self.parent_id)
+        self.assertEqual(election.name, "Brent local election")
+        self.assertEqual(election.party_lists_in_use, False)
+        self.assertEqual(election.organization.name, "London Borough of Brent")
 
-        # Check other info about the election
-        self.assertEqual(election.election_object.name, "Brent local election")
+        # Sync again and check nothing is duplicated
+        every_election.EveryElectionSync(self.ee_importer).sync()
+        self.assertEqual(every_election.YNRElection.objects.all().count(), 10)
 
-        self.assertEqual(election.election_object.party_lists_in_use, False)
-        self.assertEqual(
-            election.organization_object.name, "London Borough of Brent"
+    def test_sync_creates_organisation(self):
+        every_election.EveryElectionSync(self.ee_importer).sync()
+        organisation = every_election.Organization.objects.get(
+            slug="local-authority:brent"
         )
-        self.assertTrue(election.organization_created)
-
-    def test_create_organization_from_election_dict(self):
-        election = self.ee_importer.election_tree[self.parent_id]
-
-        # Create and election from the API dict and verify it's there
-        election.get_or_create_organisation()
-        self.assertTrue(election.organization_created)
+        self.assertEqual(organisation.name, "London Borough of Brent")
 
-        # Check other info about the election
+        every_election.EveryElectionSync(self.ee_importer).sync()
         self.assertEqual(
-            election.organization_object.name, "London Borough of Brent"
+            every_election.Organization.objects.filter(
+                slug="local-authority:brent"
+            ).count(),
+            1,
         )
-        self.assertEqual(
-            election.organization_object.slug, "local-authority:brent"
-        )
-        with self.assertNumQueries(0):
-            election.get_or_create_organisation()
-        self.assertFalse(election.organization_created)
-
-    def test_create_post_from_election_group_dict(self):
-        # We can't make a post from an "election"
-        election = self.ee_importer.election_tree[self.parent_id]
-        with self.assertRaises(ValueError):
-            election.get_or_create_post()
 
-    def test_create_post_from_ballot_id_dict(self):
-        self.assertEqual(every_election.Post.objects.all().count(), 0)
-        election = self.ee_importer.election_tree[self.child_id]
-        election.get_or_create_post()
-        self.assertTrue(election.post_created)
-        election.get_or_create_post()
-        self.assertFalse(election.post_created)
-        self.assertEqual(every_election.Post.objects.all().count(), 1)
-
-        self.assertEqual(election.party_set_object.name, "Great Britain")
-        self.assertEqual(election.post_object.label, "Alperton")
-
-    def test_create_post__election_from_ballot_id_dict(self):
+    def test_sync_creates_ballot_with_post_and_election(self):
         self.assertEqual(every_election.Post.objects.all().count(), 0)
         self.assertEqual(every_election.YNRElection.objects.all().count(), 0)
-        election = self.ee_importer.election_tree[self.child_id]
-
-        parent = self.ee_importer.get_parent(self.child_id)
-        election.get_or_create_ballot(parent=parent)
-
-        self.assertTrue(election.post_created)
-        with self.assertNumQueries(0):
-            election.get_or_create_ballot(parent=parent)
-            election.get_or_create_post()
-        self.assertFalse(election.post_created)
 
-        self.assertEqual(every_election.Post.objects.all().count(), 1)
-
-        self.assertEqual(election.party_set_object.name, "Great Britain")
-        self.assertEqual(election.post_object.label, "Alperton")
+        every_election.EveryElectionSync(self.ee_importer).sync()
+        ballot = every_election.Ballot.objects.get(
+            ballot_paper_id=self.child_id
+        )
+        self.assertEqual(ballot.election.slug, self.parent_id)
+        self.assertEqual(ballot.post.label, "Alperton")
+        self.assertEqual(ballot.post.party_set.name, "Great Britain")
 
     def test_create_many_elections_and_posts(self):
-        for ballot_id, election_dict in self.ee_importer.ballot_ids.items():
-            parent = self.ee_importer.get_parent(ballot_id)
-            election_dict.get_or_create_ballot(parent=parent)
+        every_election.EveryElectionSync(self.ee_importer).sync()
         self.assertEqual(every_election.Post.objects.all().count(), 189)
         self.assertEqual(every_election.YNRElection.objects.all().count(), 10)
 
@@ -190,12 +197,35 @@ class EE_ImporterTest(WebTest):
         self.ee_importer = every_election.EveryElectionImporter(query_args)
         self.ee_importer.build_election_tree()
 
-        for ballot_id, election_dict in self.ee_importer.ballot_ids.items():
-            parent = self.ee_importer.get_parent(ballot_id)
-            election_dict.get_or_create_ballot(parent=parent)
+        every_election.EveryElectionSync(self.ee_importer).sync()
         self.assertEqual(every_election.Post.objects.all().count(), 11)
         self.assertEqual(every_election.YNRElection.objects.all().count(), 10)
 
+    def test_sync_by_election_in_scheduled_ward(self):
+        ballot = self.ee_importer.ballot_ids[self.child_id]
+        by_election_id = self.child_id.replace(".alperton.", ".alperton.by.")
+        by_election = every_election.EEElection(
+            dict(ballot, election_id=by_election_id)
+        )
+        self.ee_importer.ballot_ids[by_election_id] = by_election
+        self.ee_importer.election_tree[by_election_id] = by_election
+
+        every_election.EveryElectionSync(self.ee_importer).sync()
+
+        # The by-election adds a seat to the scheduled ballot for the same
+        # post, rather than making a ballot of its own
+        self.assertFalse(
+            every_election.Ballot.objects.filter(
+                ballot_paper_id=by_election_id
+            ).exists()
+        )
+        scheduled = every_election.Ballot.objects.get(
+            ballot_paper_id=self.child_id
+        )
+        # EE doesn't give a seat count here, so both elections make it 2
+        self.assertIsNone(ballot["seats_contested"])
+        self.assertEqual(scheduled.winner_count, 2)
+
     @patch("elections.uk.every_election.requests")
     @freeze_time("2018-02-02")
     def test_import_management_command(self, mock_requests):
@@ -204,8 +234,10 @@ class EE_ImporterTest(WebTest):
         )
 
         self.assertEqual(every_election.Ballot.objects.all().count(), 0)
-        with self.assertNumQueries(258):
+        with CaptureQueriesContext(connection) as context:
             call_command("uk_create_elections_from_every_election")
+        # Objects are created in bulk, not one at a time
+        self.assertLess(len(context.captured_queries), 30)
         self.assertEqual(every_election.Ballot.objects.all().count(), 15)
         self.assertEqual(
             list(
@@ -238,6 +270,29 @@ class EE_ImporterTest(WebTest):
         )
         self.assertEqual(ballot.winner_count, 3)
 
+    @patch("elections.uk.every_election.requests")
+    @freeze_time("2018-02-02")
+    def test_import_management_command_twice(self, mock_requests):
+        mock_requests.get.side_effect = (
+            fake_requests_each_type_of_election_on_one_day
+        )
+        call_command("uk_create_elections_from_every_election")
+
+        with CaptureQueriesContext(connection) as context:
+            call_command("uk_create_elections_from_every_election")
+        # Nothing has changed, so nothing is saved
+        writes = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE", "DELETE"))
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(every_election.Ballot.objects.all().count(), 15)
+        ballot = every_election.Ballot.objects.get(
+            ballot_paper_id="local.adur.buckingham.2019-01-17"
+        )
+        self.assertEqual(ballot.winner_count, 3)
+
     @patch("elections.uk.every_election.requests")
     @freeze_time("2018-02-02")
     def test_delete_elections_no_matches(self, mock_requests):
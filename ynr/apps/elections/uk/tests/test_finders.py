@@ -11,6 +11,7 @@ from candidates.tests.factories import (
     PartySetFactory,
     PostFactory,
 )
+from elections.uk.models import PostcodeBallot
 
 from .ee_postcode_results import ee_se240ag_result, ee_sw1a1aa_result
 
@@ -117,6 +118,22 @@ class TestHomePageView(WebTest):
         self.assertEqual(len(response.context["ballots"]), 1)
         self.assertContains(response, "2015 General Election")
 
+    def test_postcode_in_local_index(self, mock_requests):
+        PostcodeBallot.objects.create(
+            postcode="se240ag",
+            ballot_paper_id="parl.dulwich-and-west-norwood.2017-03-23",
+        )
+        response = self.app.get("/postcode/SE24 0AG/")
+        self.assertFalse(mock_requests.get.called)
+        self.assertEqual(len(response.context["ballots"]), 1)
+        self.assertContains(response, "2015 General Election")
+
+    def test_postcode_with_no_ballots_in_local_index(self, mock_requests):
+        PostcodeBallot.objects.create(postcode="se240ag", ballot_paper_id="")
+        response = self.app.get("/postcode/SE24 0AG/")
+        self.assertFalse(mock_requests.get.called)
+        self.assertEqual(len(response.context["ballots"]), 0)
+
     def test_invalid_postcode(self, mock_requests):
         mock_requests.get.side_effect = fake_requests_for_every_election
         response = self.app.get("/")
@@ -1,73 +1,235 @@
-# easy_thumbnails face cropping processor
-# Much of the below taken from http://stackoverflow.com/a/13243712/669631
-
-import cv
-
-faceCascade = cv.Load(
-    "/usr/share/opencv/haarcascades/haarcascade_frontalface_alt.xml"
-)
-
-# Select one of the haarcascade files:
-#   haarcascade_frontalface_alt.xml  <-- Best one?
-#   haarcascade_frontalface_alt2.xml
-#   haarcascade_frontalface_alt_tree.xml
-#   haarcascade_frontalface_default.xml
-#   haarcascade_profileface.xml
-
-
-def detectFaces(im):
-    # This function takes a PIL image and finds the patterns defined in the
-    # haarcascade function modified from: http://www.lucaamore.com/?p=638
-
-    # Convert a PIL image to a greyscale cv image
-    # from: http://pythonpath.wordpress.com/2012/05/08/pil-to-opencv-image/
-    im = im.convert("L")
-    cv_im = cv.CreateImageHeader(im.size, cv.IPL_DEPTH_8U, 1)
-    cv.SetData(cv_im, im.tobytes(), im.size[0])
-
-    # variables
-    min_size = (20, 20)
-    haar_scale = 1.1
-    min_neighbors = 3
-    haar_flags = 0
-
-    # Equalize the histogram
-    cv.EqualizeHist(cv_im, cv_im)
-
-    # Detect the faces
-    faces = cv.HaarDetectObjects(
-        cv_im,
-        faceCascade,
-        cv.CreateMemStorage(0),
-        haar_scale,
-        min_neighbors,
-        haar_flags,
-        min_size,
-    )
-
-    return faces
-
-
-def face_crop_bounds(im):
-    source_x, source_y = [int(v) for v in im.size]
-    faces = detectFaces(im)
-    if not faces:
-        return None
-    cropBox = [0, 0, 0, 0]
-    for face, n in faces:
-        if face[2] > cropBox[2] or face[3] > cropBox[3]:
-            cropBox = face
-
-    xDelta = int(max(cropBox[2] * 0.4, 0))
-    yDelta = int(max(cropBox[3] * 0.4, 0))
-
-    # Convert cv box to PIL box [left, upper, right, lower]
-    if cropBox == [0, 0, 0, 0]:
-        return None
-
-    return [
-        max(cropBox[0] - xDelta, 0),
-        max(cropBox[1] - yDelta, 0),
-        min(cropBox[0] + cropBox[2] + xDelta, source_x - 1),
-        min(cropBox[1] + cropBox[3] + yDelta, source_y - 1),
-    ]
+"""
+Face detection for queued images, so that the crop is set to the
+candidate's face before a moderator sees the image.
+
+Each backend is a `FaceDetector` that takes the bytes of an image and
+returns the crop bounds of the face it finds. Images are downscaled before
+detection: bounds are found as a fraction of the image size, so this makes
+no difference to the crop, but is a lot quicker.
+"""
+import json
+import time
+from io import BytesIO
+from multiprocessing import Pool
+
+from django.db import connections
+from PIL import Image as PillowImage
+
+# Images are scaled to fit in a square of this size before detection
+MAX_DETECTION_SIZE = 800
+
+
+class NoFaceFound(Exception):
+    pass
+
+
+def downscaled(image_bytes, mode, max_size=MAX_DETECTION_SIZE):
+    """
+    Return the original size of the image in `image_bytes` and a copy in
+    the Pillow `mode` that fits in `max_size`
+    """
+    im = PillowImage.open(BytesIO(image_bytes))
+    original_size = im.size
+    im = im.convert(mode)
+    im.thumbnail((max_size, max_size))
+    return original_size, im
+
+
+class FaceDetector(object):
+    """
+    The base class for face detection backends.
+
+    Subclasses implement `detect(image_bytes)`, which returns the crop
+    bounds for the image as a dict of `crop_min_x`, `crop_min_y`,
+    `crop_max_x` and `crop_max_y` in pixels of the original image, along
+    with any metadata to store in `QueuedImage.detection_metadata`. It
+    raises `NoFaceFound` if there's no face in the image.
+
+    Detectors are created once in each worker process, so any expensive
+    setup belongs in `__init__`.
+    """
+
+
+class RekognitionDetector(FaceDetector):
+    """
+    Uses AWS Rekognition, which needs AWS credentials and a network
+    round-trip for each image. Images are sent in colour, as Rekognition
+    also describes the face.
+    """
+
+    # These magic values are because the AWS API crops faces quite tightly by
+    # default, meaning we literally just get the face. These values are about
+    # right or, they are more right than the default crop.
+    MIN_SCALING_FACTOR = 0.3
+    MAX_SCALING_FACTOR = 2
+
+    def __init__(self):
+        import boto3
+
+        self.rekognition = boto3.client("rekognition", "eu-west-1")
+
+    def detect(self, image_bytes):
+        (width, height), im = downscaled(image_bytes, "RGB")
+        f = BytesIO()
+        im.save(f, "JPEG")
+        detected = self.rekognition.detect_faces(
+            Image={"Bytes": f.getvalue()}, Attributes=["ALL"]
+        )
+        if not detected or not detected["FaceDetails"]:
+            raise NoFaceFound()
+
+        box = detected["FaceDetails"][0]["BoundingBox"]
+        min_scale = self.MIN_SCALING_FACTOR
+        max_scale = self.MAX_SCALING_FACTOR
+        bounds = {
+            "crop_min_x": int(box["Left"] * width * min_scale),
+            "crop_min_y": int(box["Top"] * height * min_scale),
+            "crop_max_x": int(box["Width"] * width * max_scale),
+            "crop_max_y": int(box["Height"] * height * max_scale),
+        }
+        return bounds, json.dumps(detected, indent=4)
+
+
+class OpenCVDetector(FaceDetector):
+    """
+    Uses the OpenCV Haar cascade face detector on the CPU, so doesn't need
+    any network access.
+
+    OpenCV is installed with the SOPN parsing requirements.
+    """
+
+    CASCADE = "haarcascade_frontalface_alt.xml"
+    # Add this fraction of the face's size around it
+    PADDING = 0.4
+
+    def __init__(self):
+        import cv2
+        import numpy
+
+        self.cv2 = cv2
+        self.numpy = numpy
+        self.cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + self.CASCADE
+        )
+
+    def detect(self, image_bytes):
+        (width, height), im = downscaled(image_bytes, "L")
+        cv_im = self.cv2.equalizeHist(self.numpy.asarray(im))
+        faces = self.cascade.detectMultiScale(
+            cv_im, scaleFactor=1.1, minNeighbors=3, minSize=(20, 20)
+        )
+        if len(faces) == 0:
+            raise NoFaceFound()
+
+        # Use the biggest face, scaled back to the original image
+        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+        scale_x = width / im.size[0]
+        scale_y = height / im.size[1]
+        x, w = x * scale_x, w * scale_x
+        y, h = y * scale_y, h * scale_y
+        x_delta = w * self.PADDING
+        y_delta = h * self.PADDING
+
+        bounds = {
+            "crop_min_x": int(max(x - x_delta, 0)),
+            "crop_min_y": int(max(y - y_delta, 0)),
+            "crop_max_x": int(min(x + w + x_delta, width - 1)),
+            "crop_max_y": int(min(y + h + y_delta, height - 1)),
+        }
+        metadata = {
+            "detector": "opencv",
+            "faces": [[int(v) for v in face] for face in faces],
+            "detection_size": list(im.size),
+        }
+        return bounds, json.dumps(metadata, indent=4)
+
+
+DETECTORS = {"rekognition": RekognitionDetector, "opencv": OpenCVDetector}
+
+
+# The detector for this process, see `init_detector`
+detector = None
+
+
+def init_detector(backend):
+    global detector
+    detector = DETECTORS[backend]()
+
+
+def _detect_job(job):
+    """
+    Detect the face in a `(pk, image_bytes)` job, returning the pk, the
+    bounds and metadata (or None if there's no face), the time taken and
+    any error.
+
+    Exceptions aren't raised, as that would stop the rest of the pool.
+    """
+    pk, image_bytes = job
+    start = time.time()
+    result = None
+    error = None
+    try:
+        result = detector.detect(image_bytes)
+    except NoFaceFound:
+        pass
+    except Exception as e:
+        error = str(e) or repr(e)
+    return pk, result, time.time() - start, error
+
+
+def read_image(queued_image):
+    queued_image.image.open("rb")
+    try:
+        return queued_image.image.read()
+    finally:
+        queued_image.image.close()
+
+
+def detect_faces(queued_images, backend, workers=1, chunk_size=None):
+    """
+    Detect faces in each of `queued_images` with the `backend` detector.
+
+    Images are read `chunk_size` at a time, and then detection is run over
+    all of them, in a pool of `workers` processes if `workers` is more than
+    1.
+
+    Yields each queued image with the bounds and metadata (or None if there
+    was no face), the number of seconds detection took and any error.
+    """
+    chunk_size = chunk_size or max(workers, 1) * 4
+    queued_images = list(queued_images)
+    pool = None
+    if workers > 1:
+        # Don't share database connections with the worker processes
+        connections.close_all()
+        pool = Pool(workers, initializer=init_detector, initargs=(backend,))
+    else:
+        init_detector(backend)
+
+    try:
+        for start in range(0, len(queued_images), chunk_size):
+            chunk = queued_images[start : start + chunk_size]
+            jobs = []
+            read_errors = {}
+            for queued_image in chunk:
+                try:
+                    jobs.append((queued_image.pk, read_image(queued_image)))
+                except Exception as e:
+                    read_errors[queued_image.pk] = str(e) or repr(e)
+
+            if pool:
+                results = pool.map(_detect_job, jobs)
+            else:
+                results = [_detect_job(job) for job in jobs]
+            results = {pk: rest for pk, *rest in results}
+
+            for queued_image in chunk:
+                if queued_image.pk in read_errors:
+                    yield queued_image, None, 0, read_errors[queued_image.pk]
+                    continue
+                result, seconds, error = results[queued_image.pk]
+                yield queued_image, result, seconds, error
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
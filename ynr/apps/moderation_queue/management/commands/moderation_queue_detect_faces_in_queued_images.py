@@ -1,61 +1,105 @@
-import json
+import time
 
-import boto3
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 
+from moderation_queue.faces import DETECTORS, detect_faces
 from moderation_queue.models import QueuedImage
 
-# These magic values are because the AWS API crops faces quite tightly by
-# default, meaning we literally just get the face. These values are about
-# right or, they are more right than the default crop.
-MIN_SCALING_FACTOR = 0.3
-MAX_SCALING_FACTOR = 2
+UPDATE_FIELDS = [
+    "crop_min_x",
+    "crop_min_y",
+    "crop_max_x",
+    "crop_max_y",
+    "detection_metadata",
+    "face_detection_tried",
+    "updated",
+]
 
 
 class Command(BaseCommand):
-    def handle(self, **options):
+    help = """
+    Set the crop bounds of undecided queued images to the face in them.
 
-        rekognition = boto3.client("rekognition", "eu-west-1")
-        attributes = ["ALL"]
+    `--backend rekognition` uses AWS Rekognition. `--backend opencv` runs
+    locally on the CPU, and is best run with `--workers` set to the number
+    of cores. The default is the FACE_DETECTION_BACKEND setting.
+    """
 
-        any_failed = False
-        qs = QueuedImage.objects.filter(decision="undecided").exclude(
-            face_detection_tried=True
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            choices=sorted(DETECTORS.keys()),
+            default=getattr(settings, "FACE_DETECTION_BACKEND", "rekognition"),
+            help="The face detector to use",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="The number of processes to detect faces with",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="The number of images to save at a time",
         )
 
-        for qi in qs:
+    def save(self, queued_images):
+        now = timezone.now()
+        for qi in queued_images:
+            qi.updated = now
+        QueuedImage.objects.bulk_update(queued_images, UPDATE_FIELDS)
 
-            try:
-                detected = rekognition.detect_faces(
-                    Image={"Bytes": qi.image.file.read()}, Attributes=attributes
-                )
-                self.set_x_y_from_response(qi, detected, options["verbosity"])
-            except Exception as e:
+    def handle(self, **options):
+        verbosity = int(options["verbosity"])
+        any_failed = False
+        qs = (
+            QueuedImage.objects.filter(decision="undecided")
+            .exclude(face_detection_tried=True)
+            .select_related("person", "user")
+        )
+
+        start = time.time()
+        count = 0
+        detection_time = 0
+        to_save = []
+        for qi, result, seconds, error in detect_faces(
+            qs, options["backend"], workers=options["workers"]
+        ):
+            count += 1
+            detection_time += seconds
+            if error:
                 msg = "Skipping QueuedImage{id}: {error}"
-                self.stdout.write(msg.format(id=qi.id, error=e))
+                self.stdout.write(msg.format(id=qi.id, error=error))
                 any_failed = True
+            elif result:
+                bounds, metadata = result
+                for name, value in bounds.items():
+                    setattr(qi, name, value)
+                qi.detection_metadata = metadata
+                if verbosity > 1:
+                    self.stdout.write(
+                        "Set bounds of {} in {:.2f}s".format(qi, seconds)
+                    )
+            else:
+                self.stdout.write("Couldn't find a face in {}".format(qi))
 
             qi.face_detection_tried = True
-            qi.save()
-        if any_failed:
-            raise CommandError("Broken images found (see above)")
+            to_save.append(qi)
+            if len(to_save) >= options["batch_size"]:
+                self.save(to_save)
+                to_save = []
+        self.save(to_save)
 
-    def set_x_y_from_response(self, qi, detected, verbosity=0):
-        if detected and detected["FaceDetails"]:
-            im_width = qi.image.width
-            im_height = qi.image.height
-            bounding_box = detected["FaceDetails"][0]["BoundingBox"]
-            qi.crop_min_x = bounding_box["Left"] * im_width * MIN_SCALING_FACTOR
-            qi.crop_min_y = bounding_box["Top"] * im_height * MIN_SCALING_FACTOR
-            qi.crop_max_x = (
-                bounding_box["Width"] * im_width * MAX_SCALING_FACTOR
-            )
-            qi.crop_max_y = (
-                bounding_box["Height"] * im_height * MAX_SCALING_FACTOR
+        if count:
+            self.stdout.write(
+                "Processed {} images in {:.1f}s, {:.2f}s detecting per "
+                "image".format(
+                    count, time.time() - start, detection_time / count
+                )
             )
-            qi.detection_metadata = json.dumps(detected, indent=4)
-
-            if int(verbosity) > 1:
-                self.stdout.write("Set bounds of {}".format(qi))
-        else:
-            self.stdout.write("Couldn't find a face in {}".format(qi))
+        if any_failed:
+            raise CommandError("Broken images found (see above)")
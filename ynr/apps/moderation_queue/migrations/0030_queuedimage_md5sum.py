@@ -0,0 +1,22 @@
+# Generated by Django 2.2.4 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("moderation_queue", "0029_update_image_upload_to")]
+
+    operations = [
+        migrations.AddField(
+            model_name="queuedimage",
+            name="md5sum",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Set for images added by bots, so the same image "
+                "isn't queued twice",
+                max_length=32,
+            ),
+        )
+    ]
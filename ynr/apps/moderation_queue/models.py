@@ -87,6 +87,13 @@ class QueuedImage(models.Model):
     crop_max_y = models.PositiveIntegerField(blank=True, null=True)
 
     detection_metadata = models.TextField(blank=True)
+    md5sum = models.CharField(
+        max_length=32,
+        blank=True,
+        db_index=True,
+        help_text="Set for images added by bots, so the same image isn't "
+        "queued twice",
+    )
 
     face_detection_tried = models.BooleanField(default=False)
 
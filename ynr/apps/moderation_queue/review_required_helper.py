@@ -39,6 +39,19 @@ class BaseReviewRequiredDecider(metaclass=abc.ABCMeta):
         """
         return False
 
+    def get_person_version_diff(self):
+        """
+        Returns the diff operations of the person version created by this
+        action against its first parent, or an empty list if there isn't one.
+
+        Only this version's diff is looked up, and the result is shared by
+        all deciders that run over the same LoggedAction.
+        """
+        version_diff = self.logged_action.person_version_diff
+        if not version_diff:
+            return []
+        return version_diff["diffs"][0]["parent_diff"]
+
 
 class FirstByUserEditsDecider(BaseReviewRequiredDecider):
     """
@@ -102,14 +115,10 @@ class CandidateStatementEditDecider(BaseReviewRequiredDecider):
 
     def needs_review(self):
         if self.logged_action.person:
-            la = self.logged_action
-            for version_diff in la.person.version_diffs:
-                if version_diff["version_id"] == la.popit_person_new_version:
-                    this_diff = version_diff["diffs"][0]["parent_diff"]
-                    for op in this_diff:
-                        if op["path"] == "biography":
-                            # this is an edit to a biography / statement
-                            return self.Status.NEEDS_REVIEW
+            for op in self.get_person_version_diff():
+                if op["path"] == "biography":
+                    # this is an edit to a biography / statement
+                    return self.Status.NEEDS_REVIEW
         return self.Status.UNDECIDED
 
 
@@ -152,17 +161,10 @@ class CandidateCurrentNameDecider(BaseReviewRequiredDecider):
             )
             if qs.exists():
                 # This person is standing in a current election
-                for version_diff in la.person.version_diffs:
-                    if (
-                        version_diff["version_id"]
-                        == la.popit_person_new_version
-                    ):
-                        this_diff = version_diff["diffs"][0]["parent_diff"]
-                        for op in this_diff:
-
-                            if op["path"] == "name" and op["op"] == "replace":
-                                # this is an edit to a name
-                                return self.Status.NEEDS_REVIEW
+                for op in self.get_person_version_diff():
+                    if op["path"] == "name" and op["op"] == "replace":
+                        # this is an edit to a name
+                        return self.Status.NEEDS_REVIEW
             return self.Status.UNDECIDED
 
 
@@ -103,9 +103,8 @@ with the source: \n> {source}
         message_added_fields = []
         message_removed_fields = []
         message_replaced_fields = []
-        for diff in self.logged_action.person.version_diffs[0]["diffs"][0][
-            "parent_diff"
-        ]:
+        latest_version = self.logged_action.person.get_version_diff()
+        for diff in latest_version["diffs"][0]["parent_diff"]:
 
             fields_category = None
             section_category = None
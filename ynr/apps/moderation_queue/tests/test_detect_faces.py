@@ -0,0 +1,240 @@
+import json
+import sys
+from io import BytesIO
+from os.path import dirname, join, realpath
+from shutil import rmtree
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.test.utils import override_settings
+from mock import Mock, patch
+from PIL import Image as PillowImage
+
+from candidates.tests.output import capture_output
+from moderation_queue.faces import (
+    DETECTORS,
+    FaceDetector,
+    NoFaceFound,
+    OpenCVDetector,
+    RekognitionDetector,
+)
+from moderation_queue.models import QueuedImage
+from moderation_queue.tests.paths import EXAMPLE_IMAGE_FILENAME
+from people.tests.factories import PersonFactory
+from ynr.helpers import mkdir_p
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+TEST_MEDIA_ROOT = realpath(join(dirname(__file__), "media"))
+
+
+def image_data(size):
+    f = BytesIO()
+    PillowImage.new("RGB", size, "red").save(f, "PNG")
+    return f.getvalue()
+
+
+class FakeDetector(FaceDetector):
+    """
+    Finds a face in everything except "no face", and fails on empty files
+    """
+
+    def detect(self, image_bytes):
+        if not image_bytes:
+            raise ValueError("No image")
+        if image_bytes == b"no face":
+            raise NoFaceFound()
+        return (
+            {
+                "crop_min_x": 1,
+                "crop_min_y": 2,
+                "crop_max_x": 30,
+                "crop_max_y": 40,
+            },
+            '{"detector": "fake"}',
+        )
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+@patch.dict(DETECTORS, {"fake": FakeDetector})
+class TestDetectFacesCommand(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        mkdir_p(TEST_MEDIA_ROOT)
+
+    @classmethod
+    def tearDownClass(cls):
+        rmtree(TEST_MEDIA_ROOT)
+        super().tearDownClass()
+
+    def create_queued_image(self, name, content=None, **kwargs):
+        if content is None:
+            with open(EXAMPLE_IMAGE_FILENAME, "rb") as f:
+                content = f.read()
+        path = join(TEST_MEDIA_ROOT, "queued-images", name)
+        mkdir_p(dirname(path))
+        with open(path, "wb") as f:
+            f.write(content)
+        return QueuedImage.objects.create(
+            image=join("queued-images", name), person=PersonFactory(), **kwargs
+        )
+
+    def test_sets_bounds(self):
+        face = self.create_queued_image("face.jpg")
+        no_face = self.create_queued_image("no-face.jpg", content=b"no face")
+        decided = self.create_queued_image("decided.jpg", decision="approved")
+
+        with capture_output():
+            call_command(
+                "moderation_queue_detect_faces_in_queued_images",
+                backend="fake",
+            )
+
+        face.refresh_from_db()
+        self.assertTrue(face.face_detection_tried)
+        self.assertEqual(
+            [
+                face.crop_min_x,
+                face.crop_min_y,
+                face.crop_max_x,
+                face.crop_max_y,
+            ],
+            [1, 2, 30, 40],
+        )
+        self.assertEqual(face.detection_metadata, '{"detector": "fake"}')
+
+        no_face.refresh_from_db()
+        self.assertTrue(no_face.face_detection_tried)
+        self.assertFalse(no_face.has_crop_bounds)
+
+        decided.refresh_from_db()
+        self.assertFalse(decided.face_detection_tried)
+
+    def test_broken_image(self):
+        broken = self.create_queued_image("broken.jpg", content=b"")
+        face = self.create_queued_image("face.jpg")
+
+        with capture_output():
+            with self.assertRaises(CommandError):
+                call_command(
+                    "moderation_queue_detect_faces_in_queued_images",
+                    backend="fake",
+                )
+
+        # Both images are tried, and aren't tried again
+        broken.refresh_from_db()
+        self.assertTrue(broken.face_detection_tried)
+        face.refresh_from_db()
+        self.assertTrue(face.has_crop_bounds)
+
+
+@skipIf(cv2 is None, "OpenCV isn't installed")
+class TestOpenCVDetector(TestCase):
+    def setUp(self):
+        self.detector = OpenCVDetector()
+        self.detector.cascade = Mock()
+
+    def test_bounds(self):
+        # Detection is done on a greyscale copy half the size of the image
+        self.detector.cascade.detectMultiScale.return_value = [
+            (100, 100, 5, 5),
+            (10, 20, 30, 40),
+        ]
+        bounds, metadata = self.detector.detect(image_data((1600, 1200)))
+        detected_image = self.detector.cascade.detectMultiScale.call_args[0][0]
+        self.assertEqual(detected_image.shape, (600, 800))
+
+        # The biggest face is scaled back to the original image, and padded
+        # by 40% of its size, without going past the edge
+        self.assertEqual(
+            bounds,
+            {
+                "crop_min_x": 0,
+                "crop_min_y": 8,
+                "crop_max_x": 104,
+                "crop_max_y": 152,
+            },
+        )
+        self.assertEqual(
+            json.loads(metadata),
+            {
+                "detector": "opencv",
+                "faces": [[100, 100, 5, 5], [10, 20, 30, 40]],
+                "detection_size": [800, 600],
+            },
+        )
+
+    def test_bounds_at_far_edge(self):
+        self.detector.cascade.detectMultiScale.return_value = [
+            (700, 500, 100, 100)
+        ]
+        bounds, metadata = self.detector.detect(image_data((1600, 1200)))
+        self.assertEqual(
+            bounds,
+            {
+                "crop_min_x": 1320,
+                "crop_min_y": 920,
+                "crop_max_x": 1599,
+                "crop_max_y": 1199,
+            },
+        )
+
+    def test_no_face(self):
+        self.detector.cascade.detectMultiScale.return_value = ()
+        with self.assertRaises(NoFaceFound):
+            self.detector.detect(image_data((100, 100)))
+
+
+class TestRekognitionDetector(TestCase):
+    def setUp(self):
+        boto3 = Mock()
+        with patch.dict(sys.modules, {"boto3": boto3}):
+            self.detector = RekognitionDetector()
+        self.rekognition = boto3.client.return_value
+
+    def test_bounds(self):
+        detected = {
+            "FaceDetails": [
+                {
+                    "BoundingBox": {
+                        "Left": 0.5,
+                        "Top": 0.25,
+                        "Width": 0.2,
+                        "Height": 0.4,
+                    }
+                }
+            ]
+        }
+        self.rekognition.detect_faces.return_value = detected
+
+        bounds, metadata = self.detector.detect(image_data((2000, 1000)))
+
+        # A downscaled colour copy of the image is sent
+        sent = self.rekognition.detect_faces.call_args[1]
+        self.assertEqual(sent["Attributes"], ["ALL"])
+        sent_image = PillowImage.open(BytesIO(sent["Image"]["Bytes"]))
+        self.assertEqual(sent_image.mode, "RGB")
+        self.assertEqual(sent_image.size, (800, 400))
+
+        # Bounds are scaled to the original image
+        self.assertEqual(
+            bounds,
+            {
+                "crop_min_x": 300,
+                "crop_min_y": 75,
+                "crop_max_x": 800,
+                "crop_max_y": 800,
+            },
+        )
+        self.assertEqual(json.loads(metadata), detected)
+
+    def test_no_face(self):
+        self.rekognition.detect_faces.return_value = {"FaceDetails": []}
+        with self.assertRaises(NoFaceFound):
+            self.detector.detect(image_data((100, 100)))
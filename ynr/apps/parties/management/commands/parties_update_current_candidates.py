@@ -6,15 +6,10 @@ from parties.models import Party
 class Command(BaseCommand):
     help = """
     Update the current and total candidates field on the `Party` model
-    
-    Designed to be run on a cron daily.
+
+    These are kept up to date as memberships and elections change, so this is
+    only needed to correct them after changes made outside of the ORM.
     """
 
     def handle(self, *args, **options):
-        parties_qs = Party.objects.all()
-        for party in parties_qs:
-            party.total_candidates = party.membership_set.count()
-            party.current_candidates = party.membership_set.filter(
-                ballot__election__current=True
-            ).count()
-            party.save()
+        Party.objects.all().update_candidate_counts()
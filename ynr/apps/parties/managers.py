@@ -1,6 +1,7 @@
 import re
 
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from .constants import JOINT_DESCRIPTION_REGEX
@@ -26,6 +27,35 @@ class PartyQuerySet(models.QuerySet):
             models.Q(register=register) | models.Q(register=None)
         )
 
+    def update_candidate_counts(self):
+        """
+        Recalculate `total_candidates` and `current_candidates` for every
+        party in this queryset, in a single UPDATE.
+        """
+        from popolo.models import Membership
+
+        memberships = (
+            Membership.objects.filter(party=models.OuterRef("pk"))
+            .order_by()
+            .values("party")
+        )
+
+        def count(qs):
+            return Coalesce(
+                models.Subquery(
+                    qs.annotate(count=models.Count("pk")).values("count"),
+                    output_field=models.IntegerField(),
+                ),
+                0,
+            )
+
+        return self.update(
+            total_candidates=count(memberships),
+            current_candidates=count(
+                memberships.filter(ballot__election__current=True)
+            ),
+        )
+
     def order_by_memberships(self, date=None, nocounts=False):
         qs = self
         if date:
@@ -1,7 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from django_extensions.db.models import TimeStampedModel
 
+from elections.models import Election
+from popolo.models import Membership
+
 from .managers import PartyQuerySet
 
 
@@ -192,3 +197,38 @@ class PartyEmblem(TimeStampedModel):
 
     def __str__(self):
         return '{} ("{}")'.format(self.pk, self.description)
+
+
+def update_candidate_counts_on_commit(party_ids):
+    """
+    Update the candidate counts of the parties in `party_ids` after the
+    current transaction commits, so the party rows aren't locked for the rest
+    of it.
+
+    `party_ids` can be a queryset, which isn't evaluated until then.
+    """
+
+    def update():
+        Party.objects.filter(pk__in=party_ids).update_candidate_counts()
+
+    transaction.on_commit(update)
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def update_membership_party_counts(sender, instance, **kwargs):
+    party_ids = {instance.party_id, instance.loaded_party_id} - {None}
+    if party_ids:
+        update_candidate_counts_on_commit(party_ids)
+
+
+@receiver(post_save, sender=Election)
+def update_election_party_counts(sender, instance, created, **kwargs):
+    # Changing `current` changes the counts of everyone standing
+    if not created and instance.current != instance.loaded_current:
+        update_candidate_counts_on_commit(
+            Membership.objects.filter(ballot__election=instance).values(
+                "party_id"
+            )
+        )
+    instance.loaded_current = instance.current
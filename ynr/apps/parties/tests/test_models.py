@@ -4,8 +4,15 @@ Test some of the basic model use cases
 """
 from django.core.files.storage import DefaultStorage
 from django.test import TestCase
+from mock import patch
 
+from candidates.tests.factories import MembershipFactory
 from candidates.tests.helpers import TmpMediaRootMixin
+from candidates.tests.uk_examples import UK2015ExamplesMixin
+from elections.models import Election
+from parties.models import Party
+from people.tests.factories import PersonFactory
+from popolo.models import Membership
 
 from .factories import PartyEmblemFactory, PartyFactory
 
@@ -36,3 +43,77 @@ class TestPartyModels(TmpMediaRootMixin, TestCase):
                 "/media/emblems/PP0/99_example"
             )
         )
+
+
+class TestPartyCandidateCounts(UK2015ExamplesMixin, TestCase):
+    def test_update_candidate_counts(self):
+        person = PersonFactory()
+        MembershipFactory(
+            person=person,
+            party=self.green_party,
+            post=self.dulwich_post,
+            ballot=self.dulwich_post_ballot,
+        )
+        MembershipFactory(
+            person=person,
+            party=self.green_party,
+            post=self.dulwich_post,
+            ballot=self.dulwich_post_ballot_earlier,
+        )
+
+        with self.assertNumQueries(1):
+            Party.objects.all().update_candidate_counts()
+        self.green_party.refresh_from_db()
+        self.assertEqual(self.green_party.total_candidates, 2)
+        self.assertEqual(self.green_party.current_candidates, 1)
+        self.labour_party.refresh_from_db()
+        self.assertEqual(self.labour_party.total_candidates, 0)
+
+    @patch("parties.models.transaction.on_commit", side_effect=lambda f: f())
+    def test_counts_kept_up_to_date(self, mock_on_commit):
+        membership = MembershipFactory(
+            person=PersonFactory(),
+            party=self.green_party,
+            post=self.dulwich_post,
+            ballot=self.dulwich_post_ballot,
+        )
+        self.green_party.refresh_from_db()
+        self.assertEqual(self.green_party.current_candidates, 1)
+
+        # Moving the membership to another party updates both parties
+        membership = Membership.objects.get(pk=membership.pk)
+        membership.party = self.labour_party
+        membership.save()
+        self.green_party.refresh_from_db()
+        self.labour_party.refresh_from_db()
+        self.assertEqual(self.green_party.current_candidates, 0)
+        self.assertEqual(self.labour_party.current_candidates, 1)
+
+        # As does the election no longer being current
+        election = Election.objects.get(pk=self.election.pk)
+        election.current = False
+        election.save()
+        self.labour_party.refresh_from_db()
+        self.assertEqual(self.labour_party.current_candidates, 0)
+        self.assertEqual(self.labour_party.total_candidates, 1)
+
+        membership.delete()
+        self.labour_party.refresh_from_db()
+        self.assertEqual(self.labour_party.total_candidates, 0)
+
+    @patch("parties.models.update_candidate_counts_on_commit")
+    def test_counts_only_updated_when_election_current_changes(
+        self, mock_update
+    ):
+        election = Election.objects.get(pk=self.election.pk)
+        election.name = "A new name"
+        election.save()
+        self.assertFalse(mock_update.called)
+
+        election.current = not election.current
+        election.save()
+        self.assertEqual(mock_update.call_count, 1)
+
+        # Saving again doesn't change it
+        election.save()
+        self.assertEqual(mock_update.call_count, 1)
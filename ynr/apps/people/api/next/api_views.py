@@ -1,22 +1,34 @@
-import json
-
 from dateutil import parser
-from django.db.models import Prefetch, Q
+from django.db.models import Prefetch
 from django.http import Http404, HttpResponsePermanentRedirect
+from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 from rest_framework import viewsets
 from rest_framework.reverse import reverse
 from rest_framework.response import Response
 
 import people.api.next.serializers
-from api.next.views import ResultsSetPagination
+from api.next.cache import SerializerCacheMixin
+from api.next.views import CursorPaginationMixin, ResultsSetPagination
 from candidates import models as extra_models
 from candidates.api.next.serializers import LoggedActionSerializer
 from people.models import Person, PersonImage
 from popolo.models import Membership
 
 
-class PersonViewSet(viewsets.ReadOnlyModelViewSet):
+class PersonViewSet(
+    CursorPaginationMixin, SerializerCacheMixin, viewsets.ReadOnlyModelViewSet
+):
+    serializer_cache_kind = "person"
+
+    def get_cursor_ordering(self):
+        # Incremental syncs want the people that changed least recently first
+        if self.action == "list" and self.request.query_params.get(
+            "updated_gte"
+        ):
+            return ("last_touched", "id")
+        return super().get_cursor_ordering()
+
     def get_queryset(self):
         queryset = Person.objects.prefetch_related(
             Prefetch(
@@ -38,8 +50,8 @@ class PersonViewSet(viewsets.ReadOnlyModelViewSet):
         date_qs = self.request.query_params.get("updated_gte", None)
         if date_qs:
             date = parser.parse(date_qs)
-            queryset = queryset.filter(
-                Q(updated_at__gte=date) | Q(memberships__updated_at__gte=date)
+            queryset = queryset.filter(last_touched__gte=date).order_by(
+                "last_touched", "id"
             )
         return queryset
 
@@ -49,14 +61,14 @@ class PersonViewSet(viewsets.ReadOnlyModelViewSet):
         except Http404 as e:
             try:
                 lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
-                instance = extra_models.PersonRedirect.objects.get(
-                    old_person_id=self.kwargs[lookup_url_kwarg]
+                new_person_id = extra_models.PersonRedirect.get_new_person_id(
+                    self.kwargs[lookup_url_kwarg]
                 )
                 return HttpResponsePermanentRedirect(
                     reverse(
                         "person-detail",
                         kwargs={
-                            "pk": instance.new_person_id,
+                            "pk": new_person_id,
                             "version": kwargs["version"],
                         },
                     )
@@ -84,7 +96,16 @@ class PersonViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=True, methods=["get"], name="Versions")
     def versions(self, request, pk=None, **kwargs):
-        return Response(json.loads(self.get_object().versions))
+        person = get_object_or_404(Person.objects.only("pk"), pk=pk)
+        qs = person.version_set.newest_first()
+
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(
+                [version.as_version_dict() for version in page]
+            )
+
+        return Response([version.as_version_dict() for version in qs])
 
     serializer_class = people.api.next.serializers.PersonSerializer
     pagination_class = ResultsSetPagination
@@ -7,7 +7,7 @@ from django_date_extensions.fields import ApproximateDate
 
 from candidates.models import (
     PartySet,
-    raise_if_unsafe_to_delete,
+    raise_if_any_unsafe_to_delete,
     UnsafeToDelete,
 )
 from candidates.twitter_api import TwitterAPITokenMissing, get_twitter_user_id
@@ -157,27 +157,33 @@ def mark_as_standing(person, election_data, post, party, party_list_position):
     membership.party = party
     membership.save()
     # Now remove any memberships that shouldn't now be there:
-    for membership_to_remove in Membership.objects.filter(
-        pk__in=membership_ids_to_remove
-    ):
-        try:
-            raise_if_unsafe_to_delete(membership_to_remove)
-        except UnsafeToDelete as e:
-            raise ValidationError(e)
+    memberships_to_remove = list(
+        Membership.objects.filter(
+            pk__in=membership_ids_to_remove
+        ).select_related("ballot")
+    )
+    try:
+        raise_if_any_unsafe_to_delete(memberships_to_remove)
+    except UnsafeToDelete as e:
+        raise ValidationError(e)
+    for membership_to_remove in memberships_to_remove:
         membership_to_remove.delete()
 
 
 def mark_as_not_standing(person, election_data, post):
     # Remove any existing candidacy:
-    for membership in Membership.objects.filter(
-        ballot__election=election_data,
-        person=person,
-        # n.b. we are planning to make "not standing" post
-        # specific in the future, in which case we would also want
-        # this line:
-        # post__slug=post_slug,
-    ):
-        raise_if_unsafe_to_delete(membership)
+    memberships = list(
+        Membership.objects.filter(
+            ballot__election=election_data,
+            person=person,
+            # n.b. we are planning to make "not standing" post
+            # specific in the future, in which case we would also want
+            # this line:
+            # post__slug=post_slug,
+        ).select_related("ballot")
+    )
+    raise_if_any_unsafe_to_delete(memberships)
+    for membership in memberships:
         membership.delete()
     from candidates.models.constraints import check_no_candidancy_for_election
 
@@ -187,10 +193,13 @@ def mark_as_not_standing(person, election_data, post):
 
 def mark_as_unsure_if_standing(person, election_data, post):
     # Remove any existing candidacy:
-    for membership in Membership.objects.filter(
-        ballot__election=election_data, person=person
-    ):
-        raise_if_unsafe_to_delete(membership)
+    memberships = list(
+        Membership.objects.filter(
+            ballot__election=election_data, person=person
+        ).select_related("ballot")
+    )
+    raise_if_any_unsafe_to_delete(memberships)
+    for membership in memberships:
         membership.delete()
     # Now remove any entry that indicates that they're standing in
     # this election:
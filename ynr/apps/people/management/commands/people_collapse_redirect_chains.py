@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from candidates.models import PersonRedirect
+
+
+class Command(BaseCommand):
+    help = """
+    Point every PersonRedirect that leads to another redirect at the person
+    at the end of the chain.
+
+    Redirects are collapsed like this when people are merged, so this only
+    needs running once for redirects created before that.
+    """
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = PersonRedirect.collapse_chains()
+        if options["verbosity"] > 0:
+            self.stdout.write("Updated {} redirects".format(len(changed)))
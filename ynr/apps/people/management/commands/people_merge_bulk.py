@@ -0,0 +1,107 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from candidates.models import UnsafeToDelete
+from people.merging import BulkPersonMerger, InvalidMergeError, get_dest_ids
+
+
+class Command(BaseCommand):
+    help = """
+    Merge the pairs of people in a CSV file, for clearing up duplicates in
+    bulk.
+
+    Each row of the CSV should have the IDs of two people to merge (a header
+    row is skipped). As with merging on the site, the higher ID is merged in
+    to the lower ID, and pairs that share a person are all merged in to the
+    lowest ID.
+
+    Pairs are merged in batches, each in its own transaction. If a batch
+    can't be merged, each group of people in it is tried on its own, so one
+    bad pair doesn't stop the rest being merged.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "filename", help="The CSV file of (dest, source) person IDs"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="The number of people to merge away in each transaction",
+        )
+
+    def read_pairs(self, filename):
+        pairs = []
+        with open(filename) as csv_file:
+            for i, row in enumerate(csv.reader(csv_file)):
+                row = [value.strip() for value in row if value.strip()]
+                if not row:
+                    continue
+                if len(row) != 2 or not all(v.isdigit() for v in row):
+                    if i == 0:
+                        # A header row
+                        continue
+                    raise CommandError(
+                        "Line {} isn't a pair of person IDs: {}".format(
+                            i + 1, ",".join(row)
+                        )
+                    )
+                pairs.append((int(row[0]), int(row[1])))
+        return pairs
+
+    def get_batches(self, pairs, batch_size):
+        """
+        Split `pairs` in to batches of groups of people to merge, keeping
+        each group in one batch so that chains of pairs are merged together.
+        """
+        try:
+            dest_ids = get_dest_ids(pairs)
+        except InvalidMergeError as e:
+            raise CommandError(str(e))
+        groups = {}
+        for source_id, dest_id in sorted(dest_ids.items()):
+            groups.setdefault(dest_id, []).append((dest_id, source_id))
+
+        batch = []
+        for group in groups.values():
+            batch.append(group)
+            if sum(len(g) for g in batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def merge(self, groups):
+        pairs = [pair for group in groups for pair in group]
+        BulkPersonMerger(pairs).merge()
+        return len(pairs)
+
+    def handle(self, *args, **options):
+        pairs = self.read_pairs(options["filename"])
+        merged = 0
+        failed = 0
+        for batch in self.get_batches(pairs, options["batch_size"]):
+            try:
+                merged += self.merge(batch)
+                continue
+            except (InvalidMergeError, UnsafeToDelete):
+                pass
+            for group in batch:
+                try:
+                    merged += self.merge([group])
+                except (InvalidMergeError, UnsafeToDelete) as e:
+                    failed += len(group)
+                    self.stderr.write(
+                        "Couldn't merge {} in to {}: {}".format(
+                            ", ".join(str(pair[1]) for pair in group),
+                            group[0][0],
+                            e,
+                        )
+                    )
+
+        if options["verbosity"] > 0:
+            self.stdout.write(
+                "Merged {} people, {} couldn't be merged".format(merged, failed)
+            )
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from people.models import PersonVersion
+
+
+class Command(BaseCommand):
+    help = """
+    Calculate and store the diffs for person versions that were recorded
+    before diffs were stored on each version.
+
+    Diffs are calculated when versions are viewed anyway, so this only needs
+    running once to stop the first view of each person being slow.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="The number of people to process at a time",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        person_ids = (
+            PersonVersion.objects.filter(diffs=None)
+            .order_by("person_id")
+            .values_list("person_id", flat=True)
+            .distinct()
+        )
+        batch = []
+        total = 0
+        for person_id in person_ids.iterator():
+            batch.append(person_id)
+            if len(batch) >= batch_size:
+                total += self.store_diffs_for_people(batch)
+                batch = []
+        if batch:
+            total += self.store_diffs_for_people(batch)
+        if options["verbosity"] > 0:
+            self.stdout.write("Stored diffs for {} versions".format(total))
+
+    def store_diffs_for_people(self, person_ids):
+        # Load the whole history of each person, so that all parents are
+        # available without any more queries
+        versions = list(
+            PersonVersion.objects.filter(person_id__in=person_ids).only(
+                "person_id", "version_id", "parent_version_ids", "data", "diffs"
+            )
+        )
+        return len(PersonVersion.objects.store_missing_diffs(versions))
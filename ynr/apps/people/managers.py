@@ -1,7 +1,9 @@
 from os.path import join
 
+from django.contrib.postgres.fields.jsonb import KeyTextTransform
 from django.core.files.storage import DefaultStorage
 from django.db import models
+from django.db.models.functions import Cast
 
 from candidates.models import PersonRedirect
 from ynr_refactoring.settings import PersonIdentifierFields
@@ -57,6 +59,151 @@ class PersonIdentifierQuerySet(models.query.QuerySet):
         )
 
 
+class PersonVersionQuerySet(models.query.QuerySet):
+    def newest_first(self):
+        return self.order_by("-timestamp", "-pk")
+
+    def replace_history(self, person, versions, delete_existing=True):
+        """
+        Replace the whole history of `person` with `versions`, a list of
+        version dicts ordered most recent first.
+        """
+        from candidates.models.versions import get_versions_parent_map
+
+        if delete_existing:
+            self.filter(person=person).delete()
+        if not versions:
+            return []
+
+        try:
+            id_to_parent_ids = get_versions_parent_map(versions)
+        except Exception:
+            # The history contains a merge we can't make sense of, so fall
+            # back to treating it as a simple list
+            id_to_parent_ids = {}
+            older_versions = versions[1:] + [None]
+            for version, parent in zip(versions, older_versions):
+                id_to_parent_ids[version["version_id"]] = (
+                    [parent["version_id"]] if parent else []
+                )
+
+        id_to_data = {v["version_id"]: v["data"] for v in versions}
+        new_versions = []
+        # Insert oldest first, so that versions with the same timestamp are
+        # ordered by primary key
+        for version in reversed(versions):
+            new_version = self.model.from_version_dict(
+                person.pk,
+                version,
+                id_to_parent_ids.get(version["version_id"], []),
+            )
+            new_version.calculate_diffs(id_to_data)
+            new_versions.append(new_version)
+        return self.bulk_create(new_versions)
+
+    def append_version(self, person, version, parent_versions=None):
+        """
+        Add a new version to the end of `person`'s history, linking it to
+        the version(s) it was made from and storing the diff against them.
+
+        If the caller already has the parents of this version (as version
+        dicts) it can pass them in `parent_versions` to save looking them up.
+        """
+        from candidates.models.versions import is_a_merge
+
+        if parent_versions is None:
+            history = self.filter(person=person).newest_first()
+            parent_ids = [person.pk]
+            merged_from = is_a_merge(version)
+            if merged_from:
+                parent_ids.append(merged_from)
+            parent_versions = []
+            for parent_id in parent_ids:
+                parent = history.filter(data__id=str(parent_id)).first()
+                if parent:
+                    parent_versions.append(parent.as_version_dict())
+
+        new_version = self.build_version(person, version, parent_versions)
+        new_version.save()
+        return new_version
+
+    def build_version(self, person, version, parent_versions):
+        new_version = self.model.from_version_dict(
+            person.pk, version, [p["version_id"] for p in parent_versions]
+        )
+        new_version.calculate_diffs(
+            {p["version_id"]: p["data"] for p in parent_versions}
+        )
+        return new_version
+
+    def latest_versions(self, person_ids):
+        """
+        Return a dict of the most recent version recorded against each
+        person's own ID, for passing to `Person.record_version` when
+        recording versions for a lot of people.
+        """
+        versions = (
+            self.filter(person_id__in=person_ids)
+            .annotate(data_id=KeyTextTransform("id", "data"))
+            .filter(data_id=Cast("person_id", models.CharField()))
+            .order_by("person_id", "-timestamp", "-pk")
+            .distinct("person_id")
+        )
+        return {
+            version.person_id: version.as_version_dict() for version in versions
+        }
+
+    def save_unsaved_versions(self, people):
+        """
+        Write the versions recorded on each of `people` since they were
+        loaded in one query, rather than a query per version.
+
+        This only appends versions, so can't be used after a history has
+        been replaced.
+        """
+        new_versions = []
+        for person in people:
+            for version, parent_versions in person._unsaved_versions:
+                if parent_versions is None:
+                    # A merge, which needs to look its parents up
+                    self.append_version(person, version)
+                    continue
+                new_versions.append(
+                    self.build_version(person, version, parent_versions)
+                )
+            person._unsaved_versions = ()
+        return self.bulk_create(new_versions)
+
+    def store_missing_diffs(self, versions):
+        """
+        Calculate and save the diffs for any of `versions` that were
+        recorded before diffs were stored. Parents are looked up in
+        `versions` first, so passing a person's whole history needs no
+        extra queries to find them.
+        """
+        missing = [v for v in versions if v.diffs is None]
+        if not missing:
+            return []
+        id_to_data = {v.version_id: v.data for v in versions}
+        parent_ids = {
+            parent_id
+            for v in missing
+            for parent_id in v.parent_version_ids
+            if parent_id not in id_to_data
+        }
+        if parent_ids:
+            id_to_data.update(
+                self.filter(
+                    person_id__in={v.person_id for v in missing},
+                    version_id__in=parent_ids,
+                ).values_list("version_id", "data")
+            )
+        for version in missing:
+            version.calculate_diffs(id_to_data)
+        self.bulk_update(missing, ["diffs"])
+        return missing
+
+
 class PersonQuerySet(models.query.QuerySet):
     def alive_now(self):
         return self.filter(death_date="")
@@ -77,13 +224,10 @@ class PersonQuerySet(models.query.QuerySet):
 
     def get_by_id_with_redirects(self, person_id):
         try:
-            person = self.get(id=person_id)
+            return self.get(id=person_id)
         except self.model.DoesNotExist:
             try:
-                person_id = PersonRedirect.objects.get(
-                    old_person_id=person_id
-                ).new_person_id
-                return self.get_by_id_with_redirects(person_id)
+                person_id = PersonRedirect.get_new_person_id(person_id)
             except PersonRedirect.DoesNotExist:
                 raise self.model.DoesNotExist
-        return person
+        return self.get(id=person_id)
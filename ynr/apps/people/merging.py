@@ -1,18 +1,33 @@
-import json
+from collections import defaultdict
 
 from django.conf import settings
-from django.contrib.admin.utils import NestedObjects
-from django.db import connection, transaction
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
 
+from api.next.cache import invalidate_serializer_cache
 from candidates.models import (
     LoggedAction,
     PersonRedirect,
     UnsafeToDelete,
     merge_popit_people,
 )
+from candidates.models.popolo_extra import model_has_related_objects
 from candidates.models.versions import get_person_as_version_data
 from candidates.views.version_data import get_change_metadata, get_client_ip
+from moderation_queue.models import QueuedImage
+from people.models import (
+    GenderGuess,
+    Person,
+    PersonIdentifier,
+    PersonImage,
+    PersonVersion,
+)
+from popolo.models import Membership, OtherName
 from results.models import ResultEvent
+from uk_results.models import CandidateResult
+from utils.db import get_related_object_labels
 
 
 class InvalidMergeError(ValueError):
@@ -71,15 +86,11 @@ class PersonMerger:
         self.request = request
 
     def safe_delete(self, model):
-        collector = NestedObjects(using=connection.cursor().db.alias)
-        collector.collect([model])
-        if len(collector.nested()) > 1:
-            related_objects = "\n\t".join(
-                [repr(m) for m in collector.nested()[1:]]
-            )
+        related_objects = model_has_related_objects(model)
+        if related_objects:
             raise UnsafeToDelete(
-                "Can't delete '{}' with related objects: \n {}".format(
-                    model, related_objects
+                "Can't delete '{}' with related objects: {}".format(
+                    model, ", ".join(related_objects)
                 )
             )
 
@@ -96,11 +107,9 @@ class PersonMerger:
             get_person_as_version_data(self.source_person),
         )
 
-        # Make sure the secondary person's version history is appended, so it
-        # isn't lost.
-        dest_person_versions = json.loads(self.dest_person.versions)
-        dest_person_versions += json.loads(self.source_person.versions)
-        self.dest_person.versions = json.dumps(dest_person_versions)
+        # Make sure the secondary person's version history is moved to the
+        # dest person, so it isn't lost.
+        self.source_person.version_set.update(person=self.dest_person)
 
     def merge_person_attrs(self):
         """
@@ -268,9 +277,8 @@ class PersonMerger:
 
     def setup_redirect(self):
         # Create a redirect from the old person to the new person:
-        PersonRedirect.objects.create(
-            old_person_id=self.source_person.pk,
-            new_person_id=self.dest_person.pk,
+        PersonRedirect.add_redirects(
+            {self.source_person.pk: self.dest_person.pk}
         )
 
     def merge(self, delete=True):
@@ -323,3 +331,431 @@ class PersonMerger:
                 # Delete the old person
                 self.safe_delete(self.source_person)
         return self.dest_person
+
+
+def get_dest_ids(pairs):
+    """
+    Group the people in `pairs` of person IDs that should be merged, and
+    return a dict of the ID of each person to be merged away to the ID of
+    the person they'll be merged in to, which is the lowest ID in their
+    group.
+    """
+    parents = {}
+
+    def find(pk):
+        parents.setdefault(pk, pk)
+        while parents[pk] != pk:
+            parents[pk] = parents[parents[pk]]
+            pk = parents[pk]
+        return pk
+
+    for person_a, person_b in pairs:
+        person_a, person_b = int(person_a), int(person_b)
+        if person_a == person_b:
+            raise InvalidMergeError(
+                "You can't merge a person ({}) with themself".format(person_a)
+            )
+        root_a, root_b = find(person_a), find(person_b)
+        if root_a != root_b:
+            parents[max(root_a, root_b)] = min(root_a, root_b)
+    dest_ids = {pk: find(pk) for pk in parents}
+    return {pk: dest_id for pk, dest_id in dest_ids.items() if pk != dest_id}
+
+
+def join_labels(related):
+    """
+    Join the labels from `get_related_object_labels` for an error message
+    """
+    labels = {label for pk_labels in related.values() for label in pk_labels}
+    return ", ".join(sorted(labels))
+
+
+class BulkPersonMerger:
+    """
+    Merges a lot of pairs of people in one transaction.
+
+    This does the same as using `PersonMerger` on each pair, but each step
+    is done for all the pairs at once with a few UPDATE and DELETE queries,
+    rather than queries for each related object. The only queries made for
+    each person are for recording their version history.
+
+    As with `PersonMerger`, the higher ID of each pair is merged in to the
+    lower ID. Pairs that share a person are merged in to the lowest ID in
+    the group, in ID order, so merging (1, 2) and (2, 3) leaves person 1.
+
+    There are a few differences from `PersonMerger`:
+
+    1. Other names are moved with their notes and dates, rather than being
+       created again with just the name.
+
+    2. A merge version is recorded for each person merged in, but they all
+       have the data from after the whole group is merged.
+
+    3. If one person is standing in an election that another is marked as
+       not standing in, the membership is kept and the not standing status
+       is removed, rather than raising an error.
+    """
+
+    def __init__(self, pairs, request=None):
+        """
+        `pairs` is a list of pairs of person IDs to merge, in either order.
+        """
+        self.dest_ids = get_dest_ids(pairs)
+        self.source_ids = sorted(self.dest_ids)
+        self.sources_by_dest = defaultdict(list)
+        for source_id in self.source_ids:
+            self.sources_by_dest[self.dest_ids[source_id]].append(source_id)
+        self.request = request
+
+    @property
+    def person_ids(self):
+        return list(self.sources_by_dest) + self.source_ids
+
+    def dest_id_case(self, field):
+        """
+        An expression for the ID of the dest person of the source person in
+        `field`, for moving objects to the dest people in one UPDATE
+        """
+        return Case(
+            *[
+                When(**{field: source_id}, then=Value(dest_id))
+                for source_id, dest_id in self.dest_ids.items()
+            ],
+            output_field=models.IntegerField()
+        )
+
+    def move_to_dests(self, queryset, field="person"):
+        return queryset.filter(
+            **{"{}__in".format(field): self.source_ids}
+        ).update(**{field: self.dest_id_case(field)})
+
+    def load_people(self):
+        self.people = Person.objects.in_bulk(self.person_ids)
+        missing = set(self.person_ids) - set(self.people)
+        if missing:
+            raise InvalidMergeError(
+                "Can't find people with IDs {}".format(
+                    ", ".join(str(pk) for pk in sorted(missing))
+                )
+            )
+        self.dest_people = [
+            self.people[pk] for pk in sorted(self.sources_by_dest)
+        ]
+
+    def merge_person_attrs(self):
+        """
+        Keep the value of each field from the highest ID that has one, and
+        work out which names need adding as other names.
+        """
+        self.new_other_names = set()
+        for dest_person in self.dest_people:
+            for source_id in self.sources_by_dest[dest_person.pk]:
+                source_person = self.people[source_id]
+                if source_person.name != dest_person.name:
+                    self.new_other_names.add(
+                        (dest_person.pk, source_person.name)
+                    )
+                for field in settings.SIMPLE_POPOLO_FIELDS:
+                    source_value = getattr(source_person, field.name, None)
+                    if source_value:
+                        setattr(dest_person, field.name, source_value)
+
+    def merge_other_names(self):
+        content_type = ContentType.objects.get_for_model(Person)
+        other_names = OtherName.objects.filter(
+            content_type=content_type, object_id__in=self.person_ids
+        )
+        names = defaultdict(set)
+        source_other_names = []
+        for pk, person_id, name in other_names.values_list(
+            "pk", "object_id", "name"
+        ).order_by("object_id", "pk"):
+            if person_id in self.dest_ids:
+                source_other_names.append((pk, person_id, name))
+            else:
+                names[person_id].add(name)
+
+        # Other names are unique for each person, so only move the first
+        # with each name
+        moving = []
+        duplicates = []
+        for pk, source_id, name in source_other_names:
+            dest_id = self.dest_ids[source_id]
+            if name in names[dest_id]:
+                duplicates.append(pk)
+            else:
+                names[dest_id].add(name)
+                moving.append(pk)
+        OtherName.objects.filter(pk__in=duplicates).delete()
+        self.move_to_dests(
+            OtherName.objects.filter(content_type=content_type, pk__in=moving),
+            field="object_id",
+        )
+        OtherName.objects.bulk_create(
+            [
+                OtherName(
+                    content_type=content_type, object_id=dest_id, name=name
+                )
+                for dest_id, name in sorted(self.new_other_names)
+                if name not in names[dest_id]
+            ]
+        )
+
+    def merge_versions(self):
+        self.move_to_dests(PersonVersion.objects)
+
+    def merge_person_identifiers(self):
+        """
+        Keep the most recently modified identifier of each value type and
+        value for each dest person.
+        """
+        identifiers = defaultdict(list)
+        for pk, person_id, value, value_type, modified in (
+            PersonIdentifier.objects.filter(person_id__in=self.person_ids)
+            .order_by("-modified", "pk")
+            .values_list("pk", "person_id", "value", "value_type", "modified")
+        ):
+            dest_id = self.dest_ids.get(person_id, person_id)
+            identifiers[dest_id].append((pk, value, value_type))
+
+        duplicates = []
+        for dest_id, dest_identifiers in identifiers.items():
+            values = set()
+            value_types = set()
+            for pk, value, value_type in dest_identifiers:
+                if value in values or value_type in value_types:
+                    duplicates.append(pk)
+                else:
+                    values.add(value)
+                    value_types.add(value_type)
+        PersonIdentifier.objects.filter(pk__in=duplicates).delete()
+        self.move_to_dests(PersonIdentifier.objects)
+        for person in self.people.values():
+            person.invalidate_identifier_cache()
+
+    def merge_images(self):
+        """
+        Keep the primary image of the highest source ID with one, or the
+        dest person's primary image if no source person has one.
+        """
+        primary_source_ids = set(
+            PersonImage.objects.filter(
+                person_id__in=self.source_ids, is_primary=True
+            ).values_list("person_id", flat=True)
+        )
+        kept_source_ids = set()
+        for dest_id, source_ids in self.sources_by_dest.items():
+            with_primary = [pk for pk in source_ids if pk in primary_source_ids]
+            if with_primary:
+                kept_source_ids.add(with_primary[-1])
+        replaced_ids = primary_source_ids - kept_source_ids
+        replaced_ids |= {self.dest_ids[pk] for pk in kept_source_ids}
+        PersonImage.objects.filter(
+            person_id__in=replaced_ids, is_primary=True
+        ).update(is_primary=False)
+        self.move_to_dests(PersonImage.objects)
+
+    def merge_logged_actions(self):
+        self.move_to_dests(LoggedAction.objects)
+
+    def merge_memberships(self):
+        """
+        Move memberships to the dest people, merging the results of any
+        memberships of the same ballot.
+        """
+        memberships = list(
+            Membership.objects.filter(person_id__in=self.person_ids)
+            .order_by("pk")
+            .values_list("pk", "person_id", "ballot_id", "ballot__election_id")
+        )
+        with_results = set(
+            CandidateResult.objects.filter(
+                membership_id__in=[m[0] for m in memberships]
+            ).values_list("membership_id", flat=True)
+        )
+
+        # Keep the dest person's membership of each ballot, or the one from
+        # the lowest source ID
+        def membership_order(membership):
+            pk, person_id, ballot_id, election_id = membership
+            return (person_id in self.dest_ids, person_id, pk)
+
+        kept = {}
+        duplicates = {}
+        for pk, person_id, ballot_id, election_id in sorted(
+            memberships, key=membership_order
+        ):
+            key = (self.dest_ids.get(person_id, person_id), ballot_id)
+            if key not in kept:
+                kept[key] = pk
+                continue
+            duplicates[pk] = kept[key]
+            if pk in with_results:
+                if kept[key] in with_results:
+                    raise InvalidMergeError(
+                        "Trying to merge two Memberships with results"
+                    )
+                with_results.add(kept[key])
+
+        # Check that we've not caused duplicate (membership, election)
+        # pairs. We need to do this manually because we can't add a DB
+        # constraint spanning the three tables (Membership->Ballot->Election)
+        elections = defaultdict(set)
+        for pk, person_id, ballot_id, election_id in memberships:
+            if pk in duplicates:
+                continue
+            dest_id = self.dest_ids.get(person_id, person_id)
+            if election_id in elections[dest_id]:
+                raise InvalidMergeError(
+                    "Merging would cause this person to be standing more than "
+                    "once in the same election"
+                )
+            elections[dest_id].add(election_id)
+        self.dest_elections = elections
+
+        if duplicates:
+            CandidateResult.objects.filter(
+                membership_id__in=list(duplicates)
+            ).update(
+                membership_id=Case(
+                    *[
+                        When(membership_id=pk, then=Value(kept_pk))
+                        for pk, kept_pk in duplicates.items()
+                    ],
+                    output_field=models.IntegerField()
+                )
+            )
+            related = get_related_object_labels(Membership, duplicates)
+            if related:
+                raise UnsafeToDelete(
+                    "Can't delete duplicate memberships with related "
+                    "objects: {}".format(join_labels(related))
+                )
+            Membership.objects.filter(pk__in=list(duplicates)).delete()
+        self.move_to_dests(Membership.objects)
+
+    def merge_queued_images(self):
+        self.move_to_dests(QueuedImage.objects)
+
+    def merge_not_standing(self):
+        """
+        Give each dest person the not standing elections of all the people
+        merged in to them, except where they are now standing.
+        """
+        through = Person.not_standing.through
+        rows = through.objects.filter(person_id__in=self.person_ids)
+        existing = set()
+        wanted = set()
+        for person_id, election_id in rows.values_list(
+            "person_id", "election_id"
+        ):
+            dest_id = self.dest_ids.get(person_id, person_id)
+            if person_id == dest_id:
+                existing.add((dest_id, election_id))
+            if election_id not in self.dest_elections[dest_id]:
+                wanted.add((dest_id, election_id))
+
+        rows.filter(person_id__in=self.source_ids).delete()
+        for dest_id, election_id in existing - wanted:
+            rows.filter(person_id=dest_id, election_id=election_id).delete()
+        through.objects.bulk_create(
+            [
+                through(person_id=dest_id, election_id=election_id)
+                for dest_id, election_id in sorted(wanted - existing)
+            ]
+        )
+
+    def merge_result_events(self):
+        self.move_to_dests(ResultEvent.objects, field="winner")
+
+    def merge_gender_guesses(self):
+        """
+        Just delete the source guesses – this is data we generate from the
+        name so it's not important
+        """
+        GenderGuess.objects.filter(person_id__in=self.source_ids).delete()
+
+    def save_dest_people(self):
+        latest_versions = PersonVersion.objects.latest_versions(
+            [person.pk for person in self.dest_people]
+        )
+        logged_actions = []
+        now = timezone.now()
+        for dest_person in self.dest_people:
+            for source_id in self.sources_by_dest[dest_person.pk]:
+                change_metadata = get_change_metadata(
+                    self.request, "After merging person {}".format(source_id)
+                )
+                dest_person.record_version(
+                    change_metadata,
+                    latest_version=latest_versions.get(dest_person.pk),
+                )
+                if self.request:
+                    logged_actions.append(
+                        LoggedAction(
+                            user=self.request.user,
+                            action_type="person-merge",
+                            ip_address=get_client_ip(self.request),
+                            popit_person_new_version=change_metadata[
+                                "version_id"
+                            ],
+                            person=dest_person,
+                            source=change_metadata["information_source"],
+                        )
+                    )
+            dest_person.last_touched = now
+            dest_person.updated_at = now
+
+        fields = [field.name for field in settings.SIMPLE_POPOLO_FIELDS]
+        Person.objects.bulk_update(
+            self.dest_people, fields + ["last_touched", "updated_at"]
+        )
+        PersonVersion.objects.save_unsaved_versions(self.dest_people)
+        LoggedAction.objects.bulk_create(logged_actions)
+
+        # The `post_save` signal isn't sent for bulk updates
+        dest_ids = [person.pk for person in self.dest_people]
+        invalidate_serializer_cache("person", dest_ids)
+        invalidate_serializer_cache(
+            "ballot",
+            Membership.objects.filter(person_id__in=dest_ids).values_list(
+                "ballot_id", flat=True
+            ),
+        )
+
+    def setup_redirects(self):
+        PersonRedirect.add_redirects(self.dest_ids)
+
+    def delete_source_people(self):
+        related = get_related_object_labels(Person, self.source_ids)
+        if related:
+            raise UnsafeToDelete(
+                "Can't delete merged people with related objects: {}".format(
+                    join_labels(related)
+                )
+            )
+        Person.objects.filter(pk__in=self.source_ids).delete()
+
+    def merge(self):
+        """
+        Merge all the pairs, returning the people that are left.
+
+        If any pair can't be merged, nothing is merged.
+        """
+        with transaction.atomic():
+            self.load_people()
+            self.merge_person_attrs()
+            self.merge_other_names()
+            self.merge_versions()
+            self.merge_person_identifiers()
+            self.merge_images()
+            self.merge_logged_actions()
+            self.merge_memberships()
+            self.merge_queued_images()
+            self.merge_not_standing()
+            self.merge_result_events()
+            self.merge_gender_guesses()
+            self.save_dest_people()
+            self.setup_redirects()
+            self.delete_source_people()
+        return self.dest_people
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.4 on 2026-10-18 09:12
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("people", "0018_gender_guess")]
+
+    operations = [
+        migrations.CreateModel(
+            name="PersonVersion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version_id", models.CharField(db_index=True, max_length=100)),
+                (
+                    "parent_version_ids",
+                    django.contrib.postgres.fields.jsonb.JSONField(
+                        default=list
+                    ),
+                ),
+                ("timestamp", models.CharField(max_length=32)),
+                ("username", models.CharField(max_length=150, null=True)),
+                ("information_source", models.TextField(blank=True)),
+                ("data", django.contrib.postgres.fields.jsonb.JSONField()),
+                (
+                    "extra_metadata",
+                    django.contrib.postgres.fields.jsonb.JSONField(
+                        default=dict,
+                        help_text="Any other keys that were stored with this version",
+                    ),
+                ),
+                (
+                    "person",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="version_set",
+                        to="people.Person",
+                    ),
+                ),
+            ],
+            options={"ordering": ("-timestamp", "-id")},
+        ),
+        migrations.AddIndex(
+            model_name="personversion",
+            index=models.Index(
+                fields=["person", "timestamp"], name="people_vers_person_ts_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 2.2.4 on 2026-10-18 09:14
+
+import json
+
+from django.db import migrations
+
+# How many people to read, and how many versions to write, at a time. The
+# histories are read with a server side cursor so the whole table is never in
+# memory at once.
+PEOPLE_CHUNK_SIZE = 500
+VERSIONS_BATCH_SIZE = 2000
+
+METADATA_FIELDS = ("version_id", "timestamp", "username", "information_source")
+
+
+def get_parent_map(versions):
+    from candidates.models.versions import get_versions_parent_map
+
+    try:
+        return get_versions_parent_map(versions)
+    except Exception:
+        # Some old histories contain merges that can't be followed. Treat
+        # them as a simple list, each version being the parent of the next.
+        parent_map = {}
+        for version, parent in zip(versions, versions[1:] + [None]):
+            parent_map[version["version_id"]] = (
+                [parent["version_id"]] if parent else []
+            )
+        return parent_map
+
+
+def build_versions(PersonVersion, person_id, versions):
+    parent_map = get_parent_map(versions)
+    for version in reversed(versions):
+        yield PersonVersion(
+            person_id=person_id,
+            version_id=version["version_id"],
+            parent_version_ids=parent_map.get(version["version_id"], []),
+            timestamp=version["timestamp"],
+            username=version.get("username"),
+            information_source=version.get("information_source", ""),
+            data=version["data"],
+            extra_metadata={
+                key: value
+                for key, value in version.items()
+                if key not in METADATA_FIELDS
+                and key not in ("data", "parent_version_ids")
+            },
+        )
+
+
+def split_versions(apps, schema_editor):
+    Person = apps.get_model("people", "Person")
+    PersonVersion = apps.get_model("people", "PersonVersion")
+
+    qs = (
+        Person.objects.exclude(versions="")
+        .exclude(versions="[]")
+        .order_by("pk")
+        .values_list("pk", "versions")
+    )
+    batch = []
+    for person_id, versions in qs.iterator(chunk_size=PEOPLE_CHUNK_SIZE):
+        batch.extend(
+            build_versions(PersonVersion, person_id, json.loads(versions))
+        )
+        if len(batch) >= VERSIONS_BATCH_SIZE:
+            PersonVersion.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        PersonVersion.objects.bulk_create(batch)
+
+
+def join_versions(apps, schema_editor):
+    Person = apps.get_model("people", "Person")
+    PersonVersion = apps.get_model("people", "PersonVersion")
+
+    person_ids = (
+        PersonVersion.objects.order_by("person_id")
+        .values_list("person_id", flat=True)
+        .distinct()
+    )
+    for person_id in person_ids.iterator(chunk_size=PEOPLE_CHUNK_SIZE):
+        versions = []
+        qs = PersonVersion.objects.filter(person_id=person_id).order_by(
+            "-timestamp", "-pk"
+        )
+        for version in qs:
+            version_dict = dict(version.extra_metadata)
+            version_dict.update(
+                {
+                    "version_id": version.version_id,
+                    "timestamp": version.timestamp,
+                    "information_source": version.information_source,
+                    "data": version.data,
+                }
+            )
+            if version.username is not None:
+                version_dict["username"] = version.username
+            versions.append(version_dict)
+        Person.objects.filter(pk=person_id).update(
+            versions=json.dumps(versions)
+        )
+    PersonVersion.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("people", "0019_personversion")]
+
+    operations = [migrations.RunPython(split_versions, join_versions)]
@@ -0,0 +1,14 @@
+# Generated by Django 2.2.4 on 2026-10-18 09:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("people", "0020_split_person_versions"),
+        # This migration edits the old versions field
+        ("ynr_refactoring", "0003_move_person_identifiers"),
+    ]
+
+    operations = [migrations.RemoveField(model_name="person", name="versions")]
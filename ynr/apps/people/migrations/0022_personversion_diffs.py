@@ -0,0 +1,20 @@
+# Generated by Django 2.2.4 on 2026-10-18 11:02
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("people", "0021_remove_person_versions")]
+
+    operations = [
+        migrations.AddField(
+            model_name="personversion",
+            name="diffs",
+            field=django.contrib.postgres.fields.jsonb.JSONField(
+                help_text="The raw diff against each parent version, calculated when the version is recorded",
+                null=True,
+            ),
+        )
+    ]
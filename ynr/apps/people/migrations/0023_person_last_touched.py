@@ -0,0 +1,37 @@
+# Generated by Django 2.2.4 on 2026-10-18 14:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("people", "0022_personversion_diffs")]
+
+    operations = [
+        migrations.AddField(
+            model_name="person",
+            name="last_touched",
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                help_text="When this person, or any of their memberships, identifiers or images, last changed",
+            ),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE people_person SET last_touched = GREATEST(
+                people_person.updated_at,
+                (
+                    SELECT MAX(updated_at) FROM popolo_membership
+                    WHERE popolo_membership.person_id = people_person.id
+                ),
+                (
+                    SELECT MAX(modified) FROM people_personidentifier
+                    WHERE people_personidentifier.person_id = people_person.id
+                )
+            );
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -8,6 +8,8 @@ from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.template import loader
 from django.templatetags.static import static
 from django.urls import reverse
@@ -19,12 +21,18 @@ from django_extensions.db.models import TimeStampedModel
 from slugify import slugify
 from sorl.thumbnail import get_thumbnail
 
-from candidates.diffs import get_version_diffs
+from candidates.diffs import (
+    clean_version_data,
+    explain_diffs_against_parents,
+    get_raw_diffs_against_parents,
+    get_version_diffs,
+)
 from candidates.models import Ballot
 from people.managers import (
     PersonIdentifierQuerySet,
     PersonImageManager,
     PersonQuerySet,
+    PersonVersionQuerySet,
 )
 from popolo.behaviors.models import Timestampable
 from popolo.models import Membership, VersionNotFound
@@ -271,9 +279,6 @@ class Person(Timestampable, models.Model):
     )
 
     # Former 'extra' fields
-    # This field stores JSON data with previous version information
-    # (as it did in PopIt).
-    versions = models.TextField(blank=True)
     not_standing = models.ManyToManyField(
         "elections.Election", related_name="persons_not_standing_tmp"
     )
@@ -291,6 +296,15 @@ class Person(Timestampable, models.Model):
         ],
     )
 
+    last_touched = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        help_text=(
+            "When this person, or any of their memberships, identifiers or "
+            "images, last changed"
+        ),
+    )
+
     class Meta:
         verbose_name_plural = "People"
 
@@ -304,20 +318,103 @@ class Person(Timestampable, models.Model):
         ).select_related("person", "party", "post")
         return list(result)
 
-    def record_version(self, change_metadata, new_person=False):
+    # Version history is stored in `PersonVersion`. These hold changes that
+    # haven't been written yet, and are saved along with the person. New
+    # versions are stored as (version, parent_versions) pairs.
+    _replaced_versions = None
+    _unsaved_versions = ()
+
+    @property
+    def versions(self):
+        """
+        The full version history of this person as a JSON array, most recent
+        version first.
+
+        This is kept for compatibility with the time when the history was
+        stored in a single text field. Setting it replaces the whole history
+        when the person is next saved.
+        """
+        return json.dumps(self.get_versions())
+
+    @versions.setter
+    def versions(self, value):
+        self._replaced_versions = json.loads(value or "[]")
+        self._unsaved_versions = ()
+
+    def get_versions(self):
+        """
+        Return the version history as a list of dicts, most recent first.
+
+        If `version_set` has been prefetched it's used as it is, so the
+        prefetch should be ordered with `newest_first`.
+        """
+        if self._replaced_versions is not None:
+            versions = list(self._replaced_versions)
+        elif "version_set" in getattr(self, "_prefetched_objects_cache", {}):
+            versions = [
+                version.as_version_dict() for version in self.version_set.all()
+            ]
+        elif self.pk:
+            versions = [
+                version.as_version_dict()
+                for version in self.version_set.newest_first()
+            ]
+        else:
+            versions = []
+        new_versions = [version for version, _ in self._unsaved_versions]
+        return list(reversed(new_versions)) + versions
+
+    def get_latest_version(self):
+        """
+        Return the most recent version recorded against this person's own ID,
+        without loading the rest of the history.
+        """
+        if self._unsaved_versions:
+            return self._unsaved_versions[-1][0]
+        if self._replaced_versions is not None:
+            for version in self._replaced_versions:
+                if version["data"].get("id") == str(self.pk):
+                    return version
+            return None
+        if not self.pk:
+            return None
+        version = (
+            self.version_set.filter(data__id=str(self.pk))
+            .newest_first()
+            .first()
+        )
+        if version:
+            return version.as_version_dict()
+        return None
+
+    def record_version(
+        self, change_metadata, new_person=False, latest_version=None
+    ):
+        """
+        Add a version with the current state of this person, to be written
+        when the person is saved.
+
+        If the caller has already looked up the latest version (for example
+        with `PersonVersion.objects.latest_versions`) it can pass it in
+        `latest_version` to save a query.
+        """
         # Needed because of a circular import
-        from candidates.models.versions import get_person_as_version_data
+        from candidates.models.versions import (
+            get_person_as_version_data,
+            is_a_merge,
+        )
 
-        versions = []
-        if self.versions:
-            versions = json.loads(self.versions)
         new_version = change_metadata.copy()
         new_version["data"] = get_person_as_version_data(
             self, new_person=new_person
         )
         should_insert = True
 
-        if versions and new_version["data"] == versions[0]["data"]:
+        if new_person:
+            latest_version = None
+        elif latest_version is None or self._unsaved_versions:
+            latest_version = self.get_latest_version()
+        if latest_version and new_version["data"] == latest_version["data"]:
             # Don't create empty versions
             should_insert = False
 
@@ -326,9 +423,38 @@ class Person(Timestampable, models.Model):
             should_insert = True
 
         if should_insert:
-            versions.insert(0, new_version)
+            if is_a_merge(new_version):
+                # Let the merge version find its parents in both histories
+                parent_versions = None
+            elif latest_version:
+                parent_versions = [latest_version]
+            else:
+                parent_versions = []
+            self._unsaved_versions = list(self._unsaved_versions) + [
+                (new_version, parent_versions)
+            ]
 
-        self.versions = json.dumps(versions)
+    def save_versions(self, created=False):
+        """
+        Write any version history changes made since this person was loaded.
+        New versions are appended, so this doesn't touch existing history.
+        """
+        if self._replaced_versions is not None:
+            PersonVersion.objects.replace_history(
+                self, self._replaced_versions, delete_existing=not created
+            )
+            self._replaced_versions = None
+        for version, parent_versions in self._unsaved_versions:
+            PersonVersion.objects.append_version(self, version, parent_versions)
+        self._unsaved_versions = ()
+        # Any prefetched history is now out of date
+        getattr(self, "_prefetched_objects_cache", {}).pop("version_set", None)
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        self.last_touched = timezone.now()
+        super().save(*args, **kwargs)
+        self.save_versions(created=created)
 
     def get_slug(self):
         return slugify(self.name)
@@ -507,21 +633,43 @@ class Person(Timestampable, models.Model):
             ballot__election=election, elected=True
         ).exists()
 
+    @property
+    def has_unsaved_versions(self):
+        return bool(
+            self._replaced_versions is not None or self._unsaved_versions
+        )
+
     @property
     def version_diffs(self):
-        versions = self.versions
-        if not versions:
-            versions = "[]"
-        return get_version_diffs(json.loads(versions))
+        if self.has_unsaved_versions or not self.pk:
+            return get_version_diffs(self.get_versions())
+        versions = list(self.version_set.newest_first())
+        PersonVersion.objects.store_missing_diffs(versions)
+        return [version.as_version_diff() for version in versions]
+
+    def get_version_diff(self, version_id=None):
+        """
+        Return a single version with its diffs against its parents, in the
+        same form as the items in `version_diffs`. If `version_id` is None
+        the most recent version is used.
+
+        Returns None if the version doesn't exist.
+        """
+        if self.has_unsaved_versions or not self.pk:
+            for version_diff in self.version_diffs:
+                if version_id in (None, version_diff["version_id"]):
+                    return version_diff
+            return None
+        qs = self.version_set.newest_first()
+        if version_id is not None:
+            qs = qs.filter(version_id=version_id)
+        version = qs.first()
+        if version:
+            return version.as_version_diff()
+        return None
 
     def diff_for_version(self, version_id, inline_style=False):
-        versions = self.versions or []
-        all_version_diffs = get_version_diffs(json.loads(versions))
-        right_version_diff = None
-        for version_diff in all_version_diffs:
-            if version_diff["version_id"] == version_id:
-                right_version_diff = version_diff
-                break
+        right_version_diff = self.get_version_diff(version_id)
         if not right_version_diff:
             msg = "Couldn't find version {0} for person with ID {1}"
             raise VersionNotFound(msg.format(version_id, self.id))
@@ -701,6 +849,11 @@ class Person(Timestampable, models.Model):
 
     @property
     def primary_image_model(self):
+        if "images" in getattr(self, "_prefetched_objects_cache", {}):
+            images = [image for image in self.images.all() if image.is_primary]
+            if images:
+                return min(images, key=lambda image: image.pk)
+            return None
         images = self.images.filter(is_primary=True)
         if images.exists():
             return images.first()
@@ -764,6 +917,160 @@ class Person(Timestampable, models.Model):
         return standing_down_elections
 
 
+class PersonVersion(models.Model):
+    """
+    A single version in a person's history.
+
+    A row is appended every time a person is edited, rather than rewriting
+    the whole history, so the cost of an edit doesn't grow with the number of
+    previous edits. Each version links to the version(s) it was made from in
+    `parent_version_ids`; merges have one parent from each person.
+    """
+
+    person = models.ForeignKey(
+        "people.Person", related_name="version_set", on_delete=models.CASCADE
+    )
+    version_id = models.CharField(max_length=100, db_index=True)
+    parent_version_ids = JSONField(default=list)
+    timestamp = models.CharField(max_length=32)
+    username = models.CharField(max_length=150, null=True)
+    information_source = models.TextField(blank=True)
+    data = JSONField()
+    extra_metadata = JSONField(
+        default=dict,
+        help_text="Any other keys that were stored with this version",
+    )
+    diffs = JSONField(
+        null=True,
+        help_text="The raw diff against each parent version, calculated "
+        "when the version is recorded",
+    )
+
+    objects = PersonVersionQuerySet.as_manager()
+
+    METADATA_FIELDS = (
+        "version_id",
+        "timestamp",
+        "username",
+        "information_source",
+    )
+
+    class Meta:
+        ordering = ("-timestamp", "-id")
+        indexes = [
+            models.Index(
+                fields=["person", "timestamp"], name="people_vers_person_ts_idx"
+            )
+        ]
+
+    def __str__(self):
+        return "{}: {} ({})".format(
+            self.person_id, self.version_id, self.timestamp
+        )
+
+    @classmethod
+    def from_version_dict(
+        cls, person_id, version, parent_version_ids=None, diffs=None
+    ):
+        extra_metadata = {
+            key: value
+            for key, value in version.items()
+            if key not in cls.METADATA_FIELDS
+            and key not in ("data", "parent_version_ids")
+        }
+        return cls(
+            person_id=person_id,
+            version_id=version["version_id"],
+            parent_version_ids=parent_version_ids or [],
+            timestamp=version["timestamp"],
+            username=version.get("username"),
+            information_source=version.get("information_source", ""),
+            data=version["data"],
+            extra_metadata=extra_metadata,
+            diffs=diffs,
+        )
+
+    def as_version_dict(self):
+        """
+        Return this version in the same form as it was passed to
+        `Person.record_version`
+        """
+        version = dict(self.extra_metadata)
+        version.update(
+            {
+                "version_id": self.version_id,
+                "timestamp": self.timestamp,
+                "information_source": self.information_source,
+                "data": self.data,
+            }
+        )
+        if self.username is not None:
+            version["username"] = self.username
+        return version
+
+    def calculate_diffs(self, id_to_data=None):
+        """
+        Set the raw diffs of this version against its parents.
+
+        `id_to_data` maps version IDs to version data, and saves querying for
+        the parents when the caller already has them.
+        """
+        if id_to_data is None:
+            id_to_data = dict(
+                PersonVersion.objects.filter(
+                    person_id=self.person_id,
+                    version_id__in=self.parent_version_ids,
+                ).values_list("version_id", "data")
+            )
+        parents_with_data = [
+            (parent_id, id_to_data[parent_id])
+            for parent_id in self.parent_version_ids
+            if parent_id in id_to_data
+        ]
+        self.diffs = get_raw_diffs_against_parents(
+            self.data, parents_with_data or [(None, {})]
+        )
+        return self.diffs
+
+    def get_diffs(self):
+        """
+        Return the human readable diffs against each parent, calculating and
+        storing them first if this version was recorded before diffs were
+        stored.
+        """
+        if self.diffs is None:
+            self.calculate_diffs()
+            self.save(update_fields=["diffs"])
+        return explain_diffs_against_parents(self.diffs)
+
+    def as_version_diff(self):
+        """
+        Return this version in the form produced by
+        `candidates.diffs.get_version_diffs`
+        """
+        version = self.as_version_dict()
+        version["data"] = clean_version_data(self.data)
+        version["parent_version_ids"] = self.parent_version_ids
+        version["diffs"] = self.get_diffs()
+        return version
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+@receiver(post_save, sender=PersonIdentifier)
+@receiver(post_delete, sender=PersonIdentifier)
+@receiver(post_save, sender=PersonImage)
+@receiver(post_delete, sender=PersonImage)
+def touch_person(sender, instance, **kwargs):
+    """
+    Keep `Person.last_touched` up to date when something shown alongside a
+    person changes, so they appear in the `updated_gte` API feed.
+    """
+    Person.objects.filter(pk=instance.person_id).update(
+        last_touched=timezone.now()
+    )
+
+
 class GenderGuess(models.Model):
     """
     In many, many ways, this is a really bad idea.
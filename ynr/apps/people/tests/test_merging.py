@@ -1,15 +1,26 @@
 import json
 from datetime import date, timedelta
+from io import StringIO
+from tempfile import NamedTemporaryFile
 
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
 from django_webtest import WebTest
 
-from candidates.models import LoggedAction
+from candidates.models import LoggedAction, PersonRedirect
 from candidates.tests.auth import TestUserMixin
 from candidates.tests.factories import PostFactory
 from candidates.tests.uk_examples import UK2015ExamplesMixin
 from moderation_queue.tests.paths import EXAMPLE_IMAGE_FILENAME
-from people.merging import InvalidMergeError, PersonMerger, UnsafeToDelete
-from people.models import Person, PersonImage, GenderGuess
+from people.merging import (
+    BulkPersonMerger,
+    InvalidMergeError,
+    PersonMerger,
+    UnsafeToDelete,
+    get_dest_ids,
+)
+from people.models import GenderGuess, Person, PersonIdentifier, PersonImage
 from people.tests.factories import PersonFactory
 from results.models import ResultEvent
 from uk_results.models import CandidateResult, ResultSet
@@ -626,8 +637,211 @@ class TestMerging(TestUserMixin, UK2015ExamplesMixin, WebTest):
             ).exists()
         )
 
+    def test_merge_collapses_redirect_chains(self):
+        PersonRedirect.objects.create(old_person_id=3, new_person_id=2)
+        merger = PersonMerger(self.dest_person, self.source_person)
+        merger.merge()
+        self.assertEqual(
+            sorted(
+                PersonRedirect.objects.values_list(
+                    "old_person_id", "new_person_id"
+                )
+            ),
+            [(2, 1), (3, 1)],
+        )
+        self.assertEqual(
+            Person.objects.get_by_id_with_redirects(3), self.dest_person
+        )
+
     def test_merging_with_gender_guess(self):
 
         GenderGuess.objects.create(gender="M", person=self.source_person)
         merger = PersonMerger(self.dest_person, self.source_person)
         merger.merge()
+
+
+class TestBulkMerging(TestUserMixin, UK2015ExamplesMixin, WebTest):
+    def setUp(self):
+        super().setUp()
+        self.people = {
+            pk: PersonFactory(pk=pk, name="Person {}".format(pk))
+            for pk in range(1, 6)
+        }
+
+    def test_get_dest_ids(self):
+        self.assertEqual(
+            get_dest_ids([(2, 1), (2, 3), (5, 4), (3, 1)]), {2: 1, 3: 1, 5: 4},
+        )
+        with self.assertRaises(InvalidMergeError):
+            get_dest_ids([(1, 1)])
+
+    def test_bulk_merge(self):
+        self.people[2].memberships.create(ballot=self.local_ballot)
+        self.people[3].not_standing.add(self.election)
+        self.people[3].other_names.create(name="Nom de plume", note="Pen")
+        self.people[1].other_names.create(name="Nom de plume")
+        self.people[2].tmp_person_identifiers.create(
+            value_type="email", value="old@example.com"
+        )
+        self.people[3].tmp_person_identifiers.create(
+            value_type="email", value="new@example.com"
+        )
+        LoggedAction.objects.create(person=self.people[5], user=self.user)
+        GenderGuess.objects.create(gender="M", person=self.people[5])
+
+        merged = BulkPersonMerger([(2, 1), (3, 2), (4, 5)]).merge()
+
+        self.assertEqual([person.pk for person in merged], [1, 4])
+        self.assertEqual(
+            sorted(Person.objects.values_list("pk", flat=True)), [1, 4]
+        )
+        self.assertEqual(
+            sorted(
+                PersonRedirect.objects.values_list(
+                    "old_person_id", "new_person_id"
+                )
+            ),
+            [(2, 1), (3, 1), (5, 4)],
+        )
+        person = Person.objects.get(pk=1)
+        self.assertEqual(person.name, "Person 3")
+        self.assertEqual(
+            sorted(person.other_names.values_list("name", "note")),
+            [("Nom de plume", ""), ("Person 2", ""), ("Person 3", "")],
+        )
+        self.assertEqual(person.memberships.get().ballot, self.local_ballot)
+        self.assertEqual(list(person.not_standing.all()), [self.election])
+        self.assertEqual(
+            list(person.tmp_person_identifiers.values_list("value", flat=True)),
+            ["new@example.com"],
+        )
+        self.assertEqual(
+            [
+                version["information_source"]
+                for version in person.get_versions()[:2]
+            ],
+            ["After merging person 3", "After merging person 2"],
+        )
+        self.assertEqual(LoggedAction.objects.get().person_id, 4)
+
+    def test_bulk_merge_newest_identifier_wins(self):
+        old_email = self.people[1].tmp_person_identifiers.create(
+            value_type="email", value="old@example.com"
+        )
+        PersonIdentifier.objects.filter(pk=old_email.pk).update(
+            modified=timezone.now() - timedelta(days=1)
+        )
+        self.people[2].tmp_person_identifiers.create(
+            value_type="email", value="new@example.com"
+        )
+
+        BulkPersonMerger([(1, 2)]).merge()
+
+        # The source's email is newer, so it replaces the dest's
+        self.assertEqual(
+            list(
+                self.people[1].tmp_person_identifiers.values_list(
+                    "value", flat=True
+                )
+            ),
+            ["new@example.com"],
+        )
+
+    def test_bulk_merge_invalid(self):
+        other_local_post = PostFactory.create(
+            elections=(self.local_election,),
+            slug="DIW:E05005005",
+            label="Shepway North Ward",
+            party_set=self.gb_parties,
+            organization=self.local_council,
+        )
+        self.people[1].memberships.create(ballot=self.local_ballot)
+        self.people[3].memberships.create(
+            ballot=other_local_post.ballot_set.get()
+        )
+
+        with self.assertRaises(InvalidMergeError):
+            BulkPersonMerger([(1, 2), (4, 5), (1, 3)]).merge()
+        # Nothing is merged if any pair can't be
+        self.assertEqual(Person.objects.count(), 5)
+        self.assertFalse(PersonRedirect.objects.exists())
+
+    def test_people_merge_bulk_command(self):
+        self.people[1].memberships.create(ballot=self.local_ballot)
+        self.people[2].memberships.create(ballot=self.local_ballot)
+        CandidateResult.objects.create(
+            result_set=ResultSet.objects.create(
+                ballot=self.local_ballot,
+                num_turnout_reported=10000,
+                num_spoilt_ballots=30,
+                user=self.user,
+                ip_address="127.0.0.1",
+                source="Example ResultSet for testing",
+            ),
+            membership=self.people[2].memberships.get(),
+            num_ballots=3,
+            is_winner=True,
+        )
+        with NamedTemporaryFile("w", suffix=".csv") as csv_file:
+            csv_file.write("dest,source\n1,2\n3,4\n5,6\n")
+            csv_file.flush()
+            stdout = StringIO()
+            stderr = StringIO()
+            call_command(
+                "people_merge_bulk",
+                csv_file.name,
+                batch_size=10,
+                stdout=stdout,
+                stderr=stderr,
+            )
+
+        self.assertEqual(
+            stdout.getvalue(), "Merged 2 people, 1 couldn't be merged\n"
+        )
+        self.assertEqual(
+            stderr.getvalue(),
+            "Couldn't merge 6 in to 5: Can't find people with IDs 6\n",
+        )
+        self.assertEqual(
+            sorted(Person.objects.values_list("pk", flat=True)), [1, 3, 5]
+        )
+        self.assertEqual(self.people[1].memberships.get().result.num_ballots, 3)
+
+
+class TestPersonRedirects(TestCase):
+    def setUp(self):
+        for old_person_id, new_person_id in [
+            (10, 11),
+            (11, 12),
+            (13, 11),
+            (20, 21),
+            (21, 20),
+        ]:
+            PersonRedirect.objects.create(
+                old_person_id=old_person_id, new_person_id=new_person_id
+            )
+
+    def test_get_new_person_id(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(PersonRedirect.get_new_person_id(10), 12)
+        self.assertEqual(PersonRedirect.get_new_person_id(11), 12)
+        self.assertIn(PersonRedirect.get_new_person_id(20), [20, 21])
+        with self.assertRaises(PersonRedirect.DoesNotExist):
+            PersonRedirect.get_new_person_id(12)
+
+    def test_collapse_redirect_chains_command(self):
+        stdout = StringIO()
+        call_command("people_collapse_redirect_chains", stdout=stdout)
+        self.assertEqual(stdout.getvalue(), "Updated 2 redirects\n")
+        self.assertEqual(
+            sorted(
+                PersonRedirect.objects.values_list(
+                    "old_person_id", "new_person_id"
+                )
+            ),
+            [(10, 12), (11, 12), (13, 12), (20, 21), (21, 20)],
+        )
+        self.assertEqual(
+            PersonRedirect.all_redirects_dict(),
+            {12: [10, 11, 13], 20: [21], 21: [20]},
+        )
@@ -56,3 +56,28 @@ class TestPersonModels(UK2015ExamplesMixin, TmpMediaRootMixin, WebTest):
         self.assertEqual(
             person.current_elections_standing_down(), [self.election]
         )
+
+    def test_last_touched(self):
+        person = PersonFactory(name=faker_factory.name())
+        last_touched = person.last_touched
+
+        person.tmp_person_identifiers.create(
+            value_type="email", value="person@example.com"
+        )
+        person.refresh_from_db()
+        self.assertGreater(person.last_touched, last_touched)
+        last_touched = person.last_touched
+
+        membership = Membership.objects.create(
+            person=person,
+            post=self.dulwich_post,
+            ballot=self.dulwich_post_ballot,
+            party=self.labour_party,
+        )
+        person.refresh_from_db()
+        self.assertGreater(person.last_touched, last_touched)
+        last_touched = person.last_touched
+
+        membership.delete()
+        person.refresh_from_db()
+        self.assertGreater(person.last_touched, last_touched)
@@ -0,0 +1,149 @@
+import json
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from candidates.diffs import get_version_diffs
+from candidates.views.version_data import get_change_metadata
+from people.merging import PersonMerger
+from people.models import Person, PersonVersion
+from people.tests.factories import PersonFactory
+
+
+class TestPersonVersions(TestCase):
+    def setUp(self):
+        self.person = PersonFactory(name="Tessa Jowell")
+
+    def test_record_version_appends_row(self):
+        self.person.record_version(get_change_metadata(None, "First"))
+        self.person.save()
+        self.assertEqual(self.person.version_set.count(), 1)
+
+        self.person.name = "Tessa Palmer"
+        self.person.record_version(get_change_metadata(None, "Second"))
+        self.person.save()
+        self.assertEqual(self.person.version_set.count(), 2)
+
+        versions = json.loads(Person.objects.get(pk=self.person.pk).versions)
+        self.assertEqual(
+            [v["information_source"] for v in versions], ["Second", "First"]
+        )
+        self.assertEqual(versions[0]["data"]["name"], "Tessa Palmer")
+
+    def test_versions_not_saved_until_person_saved(self):
+        self.person.record_version(get_change_metadata(None, "First"))
+        self.assertEqual(len(json.loads(self.person.versions)), 1)
+        self.assertFalse(self.person.version_set.exists())
+        self.person.save()
+        self.assertTrue(self.person.version_set.exists())
+
+    def test_parent_links(self):
+        first = get_change_metadata(None, "First")
+        self.person.record_version(first)
+        self.person.save()
+        self.person.name = "Tessa Palmer"
+        second = get_change_metadata(None, "Second")
+        self.person.record_version(second)
+        self.person.save()
+
+        self.assertEqual(
+            self.person.version_set.get(
+                version_id=first["version_id"]
+            ).parent_version_ids,
+            [],
+        )
+        self.assertEqual(
+            self.person.version_set.get(
+                version_id=second["version_id"]
+            ).parent_version_ids,
+            [first["version_id"]],
+        )
+
+    def test_setting_versions_replaces_history(self):
+        self.person.record_version(get_change_metadata(None, "First"))
+        self.person.save()
+        self.person.versions = json.dumps(
+            [
+                {
+                    "version_id": "abc",
+                    "timestamp": "2019-01-01T00:00:00.000000",
+                    "information_source": "Imported",
+                    "username": "bob",
+                    "ip": "127.0.0.1",
+                    "data": {"id": str(self.person.pk), "name": "Tessa"},
+                }
+            ]
+        )
+        self.person.save()
+        version = self.person.version_set.get()
+        self.assertEqual(version.version_id, "abc")
+        self.assertEqual(version.extra_metadata, {"ip": "127.0.0.1"})
+        self.assertEqual(version.as_version_dict()["ip"], "127.0.0.1")
+
+    def test_merge_moves_versions(self):
+        dest = self.person
+        dest.record_version(get_change_metadata(None, "Dest"))
+        dest.save()
+        source = PersonFactory(name="Tessa Jowel")
+        source.record_version(get_change_metadata(None, "Source"))
+        source.save()
+
+        merged = PersonMerger(dest, source).merge()
+
+        self.assertEqual(PersonVersion.objects.count(), 3)
+        merge_version = merged.version_set.newest_first().first()
+        self.assertEqual(
+            merge_version.information_source,
+            "After merging person {}".format(source.pk),
+        )
+        self.assertEqual(len(merge_version.parent_version_ids), 2)
+
+
+class TestStoredVersionDiffs(TestCase):
+    def setUp(self):
+        self.person = PersonFactory(name="Tessa Jowell")
+        self.person.record_version(get_change_metadata(None, "First"))
+        self.person.save()
+        self.person.name = "Tessa Palmer"
+        self.metadata = get_change_metadata(None, "Second")
+        self.person.record_version(self.metadata)
+        self.person.save()
+
+    def test_diff_stored_when_version_recorded(self):
+        version = self.person.version_set.get(
+            version_id=self.metadata["version_id"]
+        )
+        self.assertIsNotNone(version.diffs)
+        self.assertEqual(
+            version.get_diffs()[0]["parent_diff"],
+            [
+                {
+                    "op": "replace",
+                    "path": "name",
+                    "previous_value": "Tessa Jowell",
+                    "value": "Tessa Palmer",
+                }
+            ],
+        )
+
+    def test_stored_diffs_match_calculated_diffs(self):
+        person = Person.objects.get(pk=self.person.pk)
+        self.assertEqual(
+            person.version_diffs,
+            get_version_diffs(json.loads(person.versions)),
+        )
+
+    def test_get_version_diff(self):
+        version_diff = self.person.get_version_diff(self.metadata["version_id"])
+        self.assertEqual(version_diff["information_source"], "Second")
+        self.assertEqual(self.person.get_version_diff(), version_diff)
+        self.assertIsNone(self.person.get_version_diff("missing"))
+
+    def test_backfill_command(self):
+        PersonVersion.objects.update(diffs=None)
+        call_command("people_store_version_diffs", verbosity=0)
+        self.assertFalse(PersonVersion.objects.filter(diffs=None).exists())
+        self.assertEqual(
+            Person.objects.get(pk=self.person.pk).version_diffs,
+            get_version_diffs(json.loads(self.person.versions)),
+        )
@@ -1,9 +1,15 @@
+import copy
 import re
 
+import jsonpatch
 from django.test import TestCase
 
 import people.tests.factories
-from candidates.diffs import get_version_diff, get_version_diffs
+from candidates.diffs import (
+    get_raw_version_diff,
+    get_version_diff,
+    get_version_diffs,
+)
 from candidates.tests.uk_examples import UK2015ExamplesMixin
 
 
@@ -1259,6 +1265,73 @@ class TestVersionDiffs(UK2015ExamplesMixin, TestCase):
             ],
         )
 
+    def test_raw_diff_matches_jsonpatch(self):
+        from_v = {
+            "id": "24680",
+            "name": "Jane Doe",
+            "email": "",
+            "identifiers": [
+                {"identifier": "jane", "scheme": "twitter"},
+                {"identifier": "123", "scheme": "uk.org.publicwhip"},
+            ],
+            "other_names": [{"name": "Jane Smith", "note": "Maiden name"}],
+            "standing_in": {
+                "parl.2010-05-06": None,
+                "parl.2015-05-07": {"name": "Leeds West", "post_id": "1"},
+            },
+            "party_memberships": {
+                "parl.2015-05-07": {"id": "party:53", "name": "Labour"}
+            },
+        }
+        to_v = {
+            "id": "24680",
+            "name": "Jane Smith",
+            "homepage_url": "http://example.com",
+            "identifiers": [{"identifier": "janesmith", "scheme": "twitter"}],
+            "other_names": [
+                {"name": "Jane Smith", "note": "Maiden name"},
+                {"name": "J Smith", "note": ""},
+            ],
+            "standing_in": {
+                "parl.2015-05-07": {"name": "Leeds West", "post_id": "1"},
+                "parl.2017-06-08": None,
+            },
+            "party_memberships": {
+                "parl.2015-05-07": {"id": "party:90", "name": "Labour"}
+            },
+        }
+        raw_diff = get_raw_version_diff(copy.deepcopy(from_v), to_v)
+
+        expected = sorted(
+            jsonpatch.make_patch(from_v, to_v),
+            key=lambda o: (o["op"], o["path"]),
+        )
+        self.assertEqual(
+            [
+                {k: v for k, v in o.items() if k != "previous_value"}
+                for o in raw_diff
+            ],
+            expected,
+        )
+        self.assertEqual(
+            [(o["path"], o.get("previous_value")) for o in raw_diff],
+            [
+                ("/homepage_url", None),
+                ("/other_names/1", None),
+                ("/standing_in/parl.2017-06-08", None),
+                ("/email", ""),
+                (
+                    "/identifiers/1",
+                    {"identifier": "123", "scheme": "uk.org.publicwhip"},
+                ),
+                ("/identifiers/0/identifier", "jane"),
+                ("/name", "Jane Doe"),
+                ("/party_memberships/parl.2015-05-07/id", "party:53"),
+            ],
+        )
+        self.assertEqual(raw_diff[2]["from"], "/standing_in/parl.2010-05-06")
+        self.assertEqual(jsonpatch.apply_patch(from_v, raw_diff), to_v)
+
 
 class TestSingleVersionRendering(UK2015ExamplesMixin, TestCase):
 
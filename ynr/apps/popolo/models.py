@@ -333,6 +333,16 @@ class Membership(Dateframeable, Timestampable, models.Model):
     except:
         objects = MembershipQuerySet.as_manager()
 
+    # The party this membership had when it was loaded, so that the old
+    # party's candidate counts can be updated if it changes
+    loaded_party_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_party_id = instance.__dict__.get("party_id")
+        return instance
+
     def __str__(self):
         return self.label
 
@@ -342,9 +352,9 @@ class Membership(Dateframeable, Timestampable, models.Model):
 
     def dict_for_csv(self, redirects=None):
         identifier_dict = {}
-        id_values = [f.value for f in PersonIdentifierFields]
+        id_value_types = [f.name for f in PersonIdentifierFields]
         for identifier in self.person.tmp_person_identifiers.all():
-            if identifier not in id_values:
+            if identifier.value_type not in id_value_types:
                 continue
             identifier_dict[identifier.value_type] = identifier.value
 
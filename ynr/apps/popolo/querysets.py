@@ -65,17 +65,32 @@ class PostQuerySet(DateframeableQuerySet):
 
 
 class MembershipQuerySet(DateframeableQuerySet):
+    @staticmethod
+    def csv_prefetch_lookups():
+        """
+        The related objects `Membership.dict_for_csv` needs. Only primary
+        images are used in the CSV, so only they are fetched, along with the
+        user that uploaded them.
+        """
+        from people.models import PersonImage
+
+        return (
+            "person__tmp_person_identifiers",
+            models.Prefetch(
+                "person__images",
+                queryset=PersonImage.objects.filter(is_primary=True)
+                .select_related("uploading_user")
+                .order_by("pk"),
+            ),
+        )
+
     def for_csv(self):
 
         return (
             self.select_related(
                 "ballot", "ballot__election", "ballot__post", "person", "party"
             )
-            .prefetch_related(
-                "person__tmp_person_identifiers",
-                "person__images",
-                "person__images__uploading_user",
-            )
+            .prefetch_related(*self.csv_prefetch_lookups())
             .order_by(
                 "ballot__election__election_date",
                 "-ballot__election__slug",
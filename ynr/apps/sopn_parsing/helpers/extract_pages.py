@@ -1,6 +1,15 @@
+import hashlib
+import json
+from collections import OrderedDict
+from io import BytesIO
+from multiprocessing import Pool
+
+from django.db import connections
+
 from official_documents.models import OfficialDocument
-from sopn_parsing.helpers.pdf_helpers import SOPNDocument
+from sopn_parsing.helpers.pdf_helpers import SOPNDocument, extract_page_texts
 from sopn_parsing.helpers.text_helpers import NoTextInDocumentError
+from sopn_parsing.models import PDFTextCache
 
 
 def extract_pages_for_ballot(ballot):
@@ -19,20 +28,69 @@ def extract_pages_for_ballot(ballot):
     save_page_numbers_for_single_document(sopn)
 
 
-def extract_pages_for_single_document(document):
+def read_document(document):
+    """
+    Return the contents of the uploaded file for `document`, and a hash of
+    them to use as a key in `PDFTextCache`.
+    """
+    document.uploaded_file.open("rb")
+    try:
+        content = document.uploaded_file.read()
+    finally:
+        document.uploaded_file.close()
+    return hashlib.sha256(content).hexdigest(), content
+
+
+def parse_pdf_content(content):
+    """
+    Extract the page texts from the contents of a PDF. This doesn't touch the
+    database, so can be run in a worker process.
+    """
+    return extract_page_texts(BytesIO(content))
+
+
+def cache_page_texts(content_hash, page_texts):
+    PDFTextCache.objects.get_or_create(
+        content_hash=content_hash,
+        defaults={"page_texts": json.dumps(page_texts)},
+    )
+
+
+def get_page_texts(document):
+    """
+    Return the text of each page of the file for `document`, from the cache
+    if a file with the same contents has been parsed before.
+    """
+    content_hash, content = read_document(document)
+    cached = PDFTextCache.objects.filter(content_hash=content_hash).first()
+    if cached:
+        return cached.pages
+    page_texts = parse_pdf_content(content)
+    cache_page_texts(content_hash, page_texts)
+    return page_texts
+
+
+def extract_pages_for_single_document(document, page_texts=None):
+    """
+    Yield each document with the same `source_url` as `document`, and the
+    pages in the file that relate to its ballot.
+
+    `page_texts` can be passed in if the file has already been parsed.
+    """
     other_doc_models = OfficialDocument.objects.filter(
         source_url=document.source_url
     ).select_related("ballot", "ballot__post")
 
-    doc_file = document.uploaded_file.file
-    if not doc_file:
+    if not document.uploaded_file:
         return
 
     if other_doc_models.count() == 1:
         yield document, "all"
         return
     try:
-        sopn = SOPNDocument(doc_file)
+        if page_texts is None:
+            page_texts = get_page_texts(document)
+        sopn = SOPNDocument(page_texts=page_texts)
     except (NoTextInDocumentError):
         raise NoTextInDocumentError(
             "No text in {}, skipping".format(document.uploaded_file.url)
@@ -45,7 +103,77 @@ def extract_pages_for_single_document(document):
         yield other_doc, page_numbers
 
 
-def save_page_numbers_for_single_document(document):
-    for other_doc, pages in extract_pages_for_single_document(document):
+def save_page_numbers_for_single_document(document, page_texts=None):
+    for other_doc, pages in extract_pages_for_single_document(
+        document, page_texts=page_texts
+    ):
         other_doc.relevant_pages = pages
         other_doc.save()
+
+
+def group_documents_by_source_url(documents):
+    """
+    Return one document for each distinct `source_url` in `documents`.
+
+    Page extraction always covers every document with the same source URL,
+    so only one of them needs processing.
+    """
+    by_source_url = OrderedDict()
+    for document in documents:
+        by_source_url.setdefault(document.source_url, document)
+    return list(by_source_url.values())
+
+
+def page_texts_for_documents(documents, workers=1, chunk_size=None):
+    """
+    Yield each of `documents` with its page texts, parsing each distinct file
+    at most once and using the cache where possible.
+
+    Files that need parsing are parsed `chunk_size` at a time, in a pool of
+    `workers` processes if `workers` is more than 1. Only one chunk of files
+    is held in memory at a time.
+    """
+    chunk_size = chunk_size or max(workers, 1) * 4
+    pool = None
+    if workers > 1:
+        # Don't share database connections with the worker processes
+        connections.close_all()
+        pool = Pool(workers)
+
+    def parse_chunk(chunk):
+        # Documents with different source URLs can still be the same file
+        contents = OrderedDict()
+        for _, content_hash, content in chunk:
+            contents.setdefault(content_hash, content)
+        if pool:
+            parsed = pool.map(parse_pdf_content, contents.values())
+        else:
+            parsed = [parse_pdf_content(c) for c in contents.values()]
+        parsed = dict(zip(contents.keys(), parsed))
+        for content_hash, page_texts in parsed.items():
+            cache_page_texts(content_hash, page_texts)
+        for document, content_hash, _ in chunk:
+            yield document, parsed[content_hash]
+
+    try:
+        chunk = []
+        for document in documents:
+            if not document.uploaded_file:
+                continue
+            content_hash, content = read_document(document)
+            cached = PDFTextCache.objects.filter(
+                content_hash=content_hash
+            ).first()
+            if cached:
+                yield document, cached.pages
+                continue
+            chunk.append((document, content_hash, content))
+            if len(chunk) >= chunk_size:
+                yield from parse_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from parse_chunk(chunk)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
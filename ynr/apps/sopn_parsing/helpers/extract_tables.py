@@ -1,11 +1,101 @@
 import json
+import shutil
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from multiprocessing import Pool
 
 import camelot
+import pandas
+from django.db import connections
 
 from sopn_parsing.helpers.text_helpers import NoTextInDocumentError, clean_text
 from sopn_parsing.models import ParsedSOPN
 
 
+@contextmanager
+def local_copy(document):
+    """
+    Yield a path to a local copy of the uploaded file for `document`.
+
+    Files in local storage are used in place, anything else is copied to a
+    temporary file once, rather than camelot fetching it by URL.
+    """
+    try:
+        path = document.uploaded_file.path
+    except NotImplementedError:
+        # Storage without local paths, e.g. S3
+        path = None
+    if path:
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        document.uploaded_file.open("rb")
+        try:
+            shutil.copyfileobj(document.uploaded_file, tmp)
+        finally:
+            document.uploaded_file.close()
+        tmp.flush()
+        yield tmp.name
+
+
+def tables_to_dataframe(tables):
+    """
+    Tables can span pages, camelot assumes they're different tables, so we
+    need to join them back together.
+
+    Returns None if there are no tables.
+    """
+    table_list = sorted(tables, key=lambda t: (t.page, t.order))
+    if not table_list:
+        return None
+
+    frames = [table_list[0].df]
+    for table in table_list[1:]:
+        # It's possible to have the "situation of poll" document on the SOPN
+        # Ignore any table that contains "polling station" (SOPNs tables don't)
+        first_row = table.df.iloc[0].to_string()
+        if "polling station" in clean_text(first_row):
+            break
+        frames.append(table.df)
+
+    # ignore_index is needed so the e.g table 2 row 1 doesn't replace
+    # table 1 row 1
+    return pandas.concat(frames, ignore_index=True)
+
+
+def extract_table_data(path, pages, parse_flavor="lattice"):
+    """
+    Return the table in the PDF at `path` as a JSON string, or None if there
+    isn't one.
+
+    This doesn't touch the database, so can be run in a worker process.
+    """
+    try:
+        tables = camelot.read_pdf(path, pages=pages, flavor=parse_flavor)
+    except (NotImplementedError, AttributeError):
+        # * NotImplementedError is thrown if the PDF is an image or generally
+        #   unreadable.
+        # * AttributeError is thrown on some PDFs saying they need a password.
+        #   Assume this is a bug in camelot, and ignore these PDFs
+        raise NoTextInDocumentError()
+
+    table_data = tables_to_dataframe(tables)
+    if table_data is None or table_data.empty:
+        return None
+    return json.dumps(table_data.to_dict())
+
+
+def save_table_data(document, raw_data):
+    if raw_data is None:
+        return None
+    parsed, _ = ParsedSOPN.objects.update_or_create(
+        sopn=document, defaults={"raw_data": raw_data}
+    )
+    return parsed
+
+
 def extract_ballot_table(ballot, parse_flavor="lattice"):
     """
     Given a OfficialDocument model, update or create a ParsedSOPN model with the
@@ -20,44 +110,82 @@ def extract_ballot_table(ballot, parse_flavor="lattice"):
             "Pages for table not known for document, extract page numbers first"
         )
 
-    try:
-        tables = camelot.read_pdf(
-            document.uploaded_file.url,
-            pages=document.relevant_pages,
-            flavor=parse_flavor,
+    with local_copy(document) as path:
+        raw_data = extract_table_data(
+            path, document.relevant_pages, parse_flavor=parse_flavor
         )
-    except (NotImplementedError, AttributeError):
-        # * NotImplementedError is thrown if the PDF is an image or generally
-        #   unreadable.
-        # * AttributeError is thrown on some PDFs saying they need a password.
-        #   Assume this is a bug in camelot, and ignore these PDFs
-        raise NoTextInDocumentError()
+    return save_table_data(document, raw_data)
 
-    # Tables can span pages, camelot assumes they're different tables, so we
-    # need to join them back together
-    table_list = []
-    for table in tables:
-        table_list.append(table)
-    table_list.sort(key=lambda t: (t.page, t.order))
 
-    if not table_list:
-        return
+def _extract_table_job(job):
+    """
+    Run `extract_table_data` for a `(path, pages, parse_flavor)` job, returning
+    the data, the time taken and any parse error.
 
-    table_data = table_list.pop(0).df
-    for table in table_list:
-        # It's possible to have the "situation of poll" document on the SOPN
-        # Ignore any table that contains "polling station" (SOPNs tables don't)
-        first_row = table.df.iloc[0].to_string()
-        if "polling station" in clean_text(first_row):
-            break
-        # Append the continuation table to the first one in the document.
-        # ignore_index is needed so the e.g table 2 row 1 doesn't replace
-        # table 1 row 1
-        table_data = table_data.append(table.df, ignore_index=True)
-
-    if not table_data.empty:
-        parsed, _ = ParsedSOPN.objects.update_or_create(
-            sopn=document,
-            defaults={"raw_data": json.dumps(table_data.to_dict())},
-        )
-        return parsed
+    Parse errors aren't raised, as that would stop the rest of the pool.
+    """
+    path, pages, parse_flavor = job
+    start = time.time()
+    raw_data = None
+    error = None
+    try:
+        raw_data = extract_table_data(path, pages, parse_flavor=parse_flavor)
+    except (ValueError, NoTextInDocumentError) as e:
+        error = str(e) or repr(e)
+    return raw_data, time.time() - start, error
+
+
+def extract_tables_for_documents(
+    documents, workers=1, parse_flavor="lattice", chunk_size=None
+):
+    """
+    Extract and save the tables for each of `documents`, which must have
+    `relevant_pages` set.
+
+    Documents are handled `chunk_size` at a time: each file is copied locally
+    if needed, and then camelot is run over all of them, in a pool of
+    `workers` processes if `workers` is more than 1.
+
+    Yields each document with the `ParsedSOPN` (or None if no table was
+    found), the number of seconds extraction took and the parse error, if
+    the file couldn't be read, the document had no text or camelot couldn't
+    parse it.
+    """
+    chunk_size = chunk_size or max(workers, 1) * 4
+    documents = list(documents)
+    pool = None
+    if workers > 1:
+        # Don't share database connections with the worker processes
+        connections.close_all()
+        pool = Pool(workers)
+
+    try:
+        for start in range(0, len(documents), chunk_size):
+            chunk = documents[start : start + chunk_size]
+            with ExitStack() as stack:
+                jobs = []
+                read_errors = {}
+                for document in chunk:
+                    try:
+                        path = stack.enter_context(local_copy(document))
+                    except (ValueError, OSError) as e:
+                        read_errors[document.pk] = str(e) or repr(e)
+                        continue
+                    jobs.append((path, document.relevant_pages, parse_flavor))
+                if pool:
+                    results = pool.map(_extract_table_job, jobs)
+                else:
+                    results = [_extract_table_job(job) for job in jobs]
+
+            results = iter(results)
+            for document in chunk:
+                if document.pk in read_errors:
+                    yield document, None, 0, read_errors[document.pk]
+                    continue
+                raw_data, seconds, error = next(results)
+                parsed = save_table_data(document, raw_data)
+                yield document, parsed, seconds, error
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
@@ -1,5 +1,6 @@
 import json
 import re
+from bisect import bisect_left
 from os.path import join
 
 from django.core.files.base import ContentFile
@@ -7,7 +8,7 @@ from django.core.files.storage import DefaultStorage
 
 from bulk_adding.models import RawPeople
 from parties.models import Party, PartyDescription
-from sopn_parsing.helpers.text_helpers import clean_text
+from sopn_parsing.helpers.text_helpers import clean_text, clean_text_series
 
 NAME_FIELDS = (
     "name of candidate",
@@ -21,38 +22,37 @@ NAME_FIELDS = (
 INDEPENDENT_VALUES = ("Independent", "")
 
 
-def iter_rows(data):
-    counter = 0
-    more = True
-    while more:
-        try:
-            yield data.iloc[counter]
-            counter += 1
-        except IndexError:
-            more = False
-
-
-def merge_row_cells(row):
-    return [c for c in row if c]
-
-
 def clean_row(row):
     return [clean_text(c) for c in row]
 
 
-def contains_header_like_strings(row):
-    row_string = clean_text(row.to_string())
-    if any(s in row_string for s in NAME_FIELDS):
-        return True
-    return False
+def find_header_row(data):
+    """
+    Return the position of the first row in `data` that looks like the
+    table header, or None if there isn't one.
+
+    A header has to contain one of the `NAME_FIELDS`, and not have many
+    fewer cells filled in than an average row.
+    """
+    if data.empty:
+        return None
+
+    # Count the cells that would be truthy in Python, so "" and None are
+    # empty but NaN isn't
+    cell_counts = data.astype(bool).sum(axis=1)
+    wide_enough = cell_counts >= cell_counts.mean() - 3
 
+    name_fields_pattern = "|".join(re.escape(f) for f in NAME_FIELDS)
+    header_like = data.apply(
+        lambda column: clean_text_series(column).str.contains(
+            name_fields_pattern, regex=True
+        )
+    ).any(axis=1)
 
-def looks_like_header(row, avg_row):
-    avg_row = avg_row - 3
-    if len(merge_row_cells(row)) >= avg_row:
-        if contains_header_like_strings(row):
-            return True
-    return False
+    positions = (wide_enough & header_like).values.nonzero()[0]
+    if not len(positions):
+        return None
+    return positions[0]
 
 
 def guess_name_field(row):
@@ -71,9 +71,15 @@ def guess_description_field(row):
     raise ValueError("No description guess for {}".format(row))
 
 
-def clean_name(name):
-    name = name.replace("\n", "")
-    return re.sub(r"([A-Z\-]+)\s([A-Za-z\-\s]+)", "\g<2> \g<1>", name).title()
+def clean_name_series(names):
+    """
+    Clean up each of a pandas Series of names from a SOPN, moving upper
+    cased surnames to the end, e.g. "SMITH John" becomes "John Smith".
+    """
+    names = names.fillna("").astype(str).str.replace("\n", "", regex=False)
+    return names.str.replace(
+        r"([A-Z\-]+)\s([A-Za-z\-\s]+)", r"\g<2> \g<1>", regex=True
+    ).str.title()
 
 
 def clean_description(description):
@@ -84,57 +90,126 @@ def clean_description(description):
     return description
 
 
-def get_description(description, sopn):
-    description = clean_description(description)
+def clean_description_series(descriptions):
+    """
+    `clean_description` for every value in a pandas Series
+    """
+    descriptions = descriptions.astype(str)
+    descriptions = descriptions.str.replace("\\n", "", regex=False)
+    descriptions = descriptions.str.replace("\n", "", regex=False)
+    return descriptions.str.replace(r"\s+", " ", regex=True)
 
-    if not description:
-        return None
-    if description in INDEPENDENT_VALUES:
+
+class PartyMatcher:
+    """
+    Matches descriptions from a SOPN to the parties and party descriptions
+    on a single register.
+
+    All the descriptions and party names for the register are loaded once,
+    and held in indexes for each kind of match, so matching a row doesn't
+    need any database queries.
+    """
+
+    def __init__(self, register):
+        self.register = register.upper()
+
+        descriptions = (
+            PartyDescription.objects.filter(party__register=self.register)
+            .select_related("party")
+            .order_by("pk")
+        )
+        self.exact_descriptions = {}
+        self.welsh_descriptions = {}
+        prefix_index = []
+        for description in descriptions:
+            text = description.description
+            self.exact_descriptions.setdefault(text, description)
+            prefix_index.append((text.upper(), description.pk, description))
+            # Welsh versions of descriptions are after a "|"
+            position = text.find("| ")
+            while position != -1:
+                self.welsh_descriptions.setdefault(
+                    text[position + 2 :], description
+                )
+                position = text.find("| ", position + 1)
+
+        # Sorted on the upper cased description, so everything starting
+        # with a given string is together
+        prefix_index.sort(key=lambda entry: entry[:2])
+        self.prefix_keys = [entry[0] for entry in prefix_index]
+        self.prefix_descriptions = [entry[1:] for entry in prefix_index]
+
+        self.parties = {}
+        for party in Party.objects.register(self.register).order_by("pk"):
+            self.parties.setdefault(party.name, party)
+        self._independent = None
+
+    @property
+    def independent(self):
+        if not self._independent:
+            self._independent = Party.objects.get(ec_id="ynmp-party:2")
+        return self._independent
+
+    def description_starting_with(self, description):
+        """
+        Return the description with the lowest ID that starts with
+        `description`, ignoring case.
+        """
+        prefix = description.upper()
+        start = bisect_left(self.prefix_keys, prefix)
+        matches = []
+        for key, match in zip(
+            self.prefix_keys[start:], self.prefix_descriptions[start:]
+        ):
+            if not key.startswith(prefix):
+                break
+            matches.append(match)
+        if matches:
+            return min(matches, key=lambda match: match[0])[1]
         return None
 
-    register = sopn.sopn.ballot.post.party_set.slug.upper()
-    try:
-        description_model = PartyDescription.objects.get(
-            description=description, party__register=register
+    def get_description(self, description):
+        description = clean_description(description)
+
+        if not description:
+            return None
+        if description in INDEPENDENT_VALUES:
+            return None
+
+        return (
+            self.exact_descriptions.get(description)
+            or self.description_starting_with(description)
+            or self.welsh_descriptions.get(description)
         )
-    except PartyDescription.DoesNotExist:
-        try:
-            return PartyDescription.objects.filter(
-                description__istartswith=description, party__register=register
-            ).first()
-        except PartyDescription.DoesNotExist:
-            try:
-                # If this is a Welsh version of a description, it will be at
-                # the end of the description
-                return PartyDescription.objects.filter(
-                    description__endswith="| {}".format(description),
-                    party__register=register,
-                ).first()
-            except PartyDescription.DoesNotExist:
-                return None
-    return description_model
-
-
-def get_party(description_model, description, sopn):
-    if description_model:
-        return description_model.party
-
-    party_name = clean_description(description)
-    qs = Party.objects.register(sopn.sopn.ballot.post.party_set.slug.upper())
-    if not party_name or party_name in INDEPENDENT_VALUES:
-        return Party.objects.get(ec_id="ynmp-party:2")
 
-    try:
-        party_obj = qs.get(name=party_name)
-    except Party.DoesNotExist:
-        party_obj = None
+    def get_party(self, description_model, description):
+        if description_model:
+            return description_model.party
+
+        party_name = clean_description(description)
+        if not party_name or party_name in INDEPENDENT_VALUES:
+            return self.independent
+
+        party_obj = self.parties.get(party_name)
+        if not party_obj:
+            raise ValueError("Unknown party")
+        return party_obj
+
+
+class PartyMatcherCache(dict):
+    """
+    A `PartyMatcher` for each register, created the first time it's used.
+
+    Share one of these between calls to `parse_raw_data_for_ballot` to only
+    load the parties once for a run.
+    """
 
-    if not party_obj:
-        raise ValueError("Unknown party")
-    return party_obj
+    def __missing__(self, register):
+        self[register] = PartyMatcher(register)
+        return self[register]
 
 
-def parse_table(sopn, data):
+def parse_table(sopn, data, party_matcher=None):
     data.columns = clean_row(data.columns)
     try:
         name_field = guess_name_field(data.columns)
@@ -145,60 +220,80 @@ def parse_table(sopn, data):
     except ValueError:
         return None
 
+    if party_matcher is None:
+        party_matcher = PartyMatcher(sopn.sopn.ballot.post.party_set.slug)
+
+    columns = list(data.columns)
+    names = clean_name_series(data.iloc[:, columns.index(name_field)])
+    descriptions = clean_description_series(
+        data.iloc[:, columns.index(description_field)]
+    )
+
+    # Candidates often share a description, so only match each one once
+    matches = {}
+    for description in descriptions.unique():
+        description_model = party_matcher.get_description(description)
+        party = party_matcher.get_party(description_model, description)
+        matches[description] = (description_model, party)
+
     ballot_data = []
-    for row in iter_rows(data):
-        name = clean_name(row[name_field])
-        description = get_description(row[description_field], sopn)
-        party = get_party(description, row[description_field], sopn)
-        data = {"name": name, "party_id": party.ec_id}
-        if description:
-            data["description_id"] = description.pk
-        ballot_data.append(data)
+    for name, description in zip(names, descriptions):
+        description_model, party = matches[description]
+        row_data = {"name": name, "party_id": party.ec_id}
+        if description_model:
+            row_data["description_id"] = description_model.pk
+        ballot_data.append(row_data)
     return ballot_data
 
 
-def parse_raw_data_for_ballot(ballot):
+def parse_dataframe(sopn, data, party_matcher=None):
     """
+    Find the header in `data`, a table extracted from `sopn`, and parse the
+    rows under it in to a list of candidates.
 
-    :type ballot: candidates.models.Ballot
+    Returns None if the table can't be parsed.
     """
-
-    if ballot.candidates_locked:
-        raise ValueError("Can't parse a locked ballot")
-
-    if ballot.suggestedpostlock_set.exists():
-        raise ValueError("Can't parse a ballot with lock suggestions")
-
-    parsed_sopn_model = ballot.sopn.parsedsopn
-    data = parsed_sopn_model.as_pandas
-
-    cell_counts = [len(merge_row_cells(c)) for c in iter_rows(data)]
-
-    header_found = False
-    avg_row = sum(cell_counts) / float(len(cell_counts))
-    for i, row in enumerate(iter_rows(data)):
-        if not header_found:
-            if looks_like_header(row, avg_row):
-                data.columns = row
-                data = data.drop(data.index[i])
-                header_found = True
-            else:
-                try:
-                    data = data.drop(data.index[i])
-                except IndexError:
-                    break
-    if not header_found:
+    header_position = find_header_row(data)
+    if header_position is None:
         # Don't try to parse if we don't think we know the header
         return None
+
+    # Use the header for the column names, and drop it and anything above it
+    data.columns = data.iloc[header_position]
+    data = data.iloc[header_position + 1 :]
+
     # We're now in a position where we think we have the table we want
     # with the columns set and other header rows removed.
     # Time to parse it in to names and parties
     try:
-        ballot_data = parse_table(parsed_sopn_model, data)
+        return parse_table(sopn, data, party_matcher)
     except ValueError:
         # Something went wrong. This will happen a lot. let's move on
         return None
 
+
+def parse_raw_data_for_ballot(ballot, party_matchers=None):
+    """
+
+    :type ballot: candidates.models.Ballot
+    :type party_matchers: PartyMatcherCache
+    """
+
+    if ballot.candidates_locked:
+        raise ValueError("Can't parse a locked ballot")
+
+    if ballot.suggestedpostlock_set.exists():
+        raise ValueError("Can't parse a ballot with lock suggestions")
+
+    parsed_sopn_model = ballot.sopn.parsedsopn
+    if party_matchers is None:
+        party_matchers = PartyMatcherCache()
+    ballot_data = parse_dataframe(
+        parsed_sopn_model,
+        parsed_sopn_model.as_pandas,
+        party_matchers[ballot.post.party_set.slug.upper()],
+    )
+
     if ballot_data:
         # Check there isn't a rawpeople object from another (better) source
         rawpeople_qs = RawPeople.objects.filter(
@@ -14,11 +14,47 @@ HEADING_SIZE = 0.3
 CONTINUATION_THRESHOLD = 0.4
 
 
+def extract_page_texts(fp):
+    """
+    Return a list of the text on each page of the PDF in the file-like
+    object `fp`.
+
+    A single converter and interpreter are used for every page, rather than
+    setting new ones up for each page.
+    """
+    rsrcmgr = PDFResourceManager()
+    retstr = StringIO()
+    device = TextConverter(rsrcmgr, retstr, codec="utf-8", laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+
+    page_texts = []
+    for page in PDFPage.get_pages(fp, check_extractable=True):
+        interpreter.process_page(page)
+        page_texts.append(retstr.getvalue())
+        retstr.seek(0)
+        retstr.truncate(0)
+    device.close()
+    retstr.close()
+    return page_texts
+
+
 class SOPNDocument:
-    def __init__(self, file):
+    def __init__(self, file=None, page_texts=None):
+        """
+        Pass either a PDF `file`, or the `page_texts` already extracted from
+        one with `extract_page_texts`.
+        """
         self.file = file
         self.pages = []
-        self.parse_pages()
+        if page_texts is None:
+            self.parse_pages()
+        else:
+            self.pages = [
+                SOPNPageText(page_no, text)
+                for page_no, text in enumerate(page_texts, start=1)
+            ]
+        if not self.pages:
+            raise NoTextInDocumentError()
         self.document_heading = self.pages[0].get_page_heading_set()
         if len(self.document_heading) < 10:
             raise NoTextInDocumentError()
@@ -29,25 +65,9 @@ class SOPNDocument:
         ]
 
     def parse_pages(self):
-        rsrcmgr = PDFResourceManager()
-
-        codec = "utf-8"
-        laparams = LAParams()
-
         fp = self.file
-
-        for page_no, page in enumerate(
-            PDFPage.get_pages(fp, check_extractable=True), start=1
-        ):
-            retstr = StringIO()
-            device = TextConverter(
-                rsrcmgr, retstr, codec=codec, laparams=laparams
-            )
-            interpreter = PDFPageInterpreter(rsrcmgr, device)
-            interpreter.process_page(page)
-            self.pages.append(SOPNPageText(page_no, retstr.getvalue()))
-            device.close()
-            retstr.close()
+        for page_no, text in enumerate(extract_page_texts(fp), start=1):
+            self.pages.append(SOPNPageText(page_no, text))
         fp.close()
 
     def get_pages_by_ward_name(self, ward):
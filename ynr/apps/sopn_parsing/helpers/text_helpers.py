@@ -30,3 +30,36 @@ def clean_text(text, recheck=True):
 
 class NoTextInDocumentError(ValueError):
     pass
+
+
+def clean_text_series(series, recheck=True):
+    """
+    `clean_text` for every value in a pandas Series, using the vectorised
+    string methods rather than calling `clean_text` on each value.
+    """
+    text = series.astype(str).str.lower()
+    text = text.str.replace("\xa0", " ", regex=False)
+    text = (
+        text.str.normalize("NFD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+    )
+    for old, new in (
+        ("'", ""),
+        ("`", ""),
+        (" & ", " and "),
+        (".", ""),
+        (",", ""),
+        ("-y-", " y "),
+        ("\n", " "),
+        ("\\n", " "),
+    ):
+        text = text.str.replace(old, new, regex=False)
+    text = text.str.replace(r"[\s]+", " ", regex=True)
+    text = text.str.replace(r"(^[a-z])\s([a-z][a-z]+)", r"\1\2", regex=True)
+    text = text.str.replace(r"(^[0-9])\s", r"", regex=True)
+    text = text.str.replace("*", "", regex=False)
+    text = text.str.split("(", n=1).str[0].str.strip()
+    if recheck:
+        return clean_text_series(text, recheck=False)
+    return text.str.strip()
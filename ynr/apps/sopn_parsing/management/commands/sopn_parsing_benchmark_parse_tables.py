@@ -0,0 +1,90 @@
+import glob
+import json
+import os
+import time
+
+import pandas
+from django.core.management.base import BaseCommand, CommandError
+
+from sopn_parsing.helpers.parse_tables import PartyMatcherCache, parse_dataframe
+from sopn_parsing.models import ParsedSOPN
+
+
+class Command(BaseCommand):
+    help = """
+    Time parsing extracted tables in to candidates, without saving anything.
+
+    By default this uses the tables in ParsedSOPN models. Use `--pdf-dir` to
+    extract the tables from a directory of SOPN PDFs instead, such as the
+    examples in sopn_parsing/tests/data.
+
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pdf-dir",
+            metavar="DIRECTORY",
+            help="Extract the tables from the PDFs in this directory",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="The number of times to parse each table",
+        )
+
+    def pdf_tables(self, pdf_dir):
+        from sopn_parsing.helpers.extract_tables import extract_table_data
+
+        for path in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf"))):
+            raw_data = extract_table_data(path, "all")
+            if raw_data:
+                yield os.path.basename(path), None, raw_data
+
+    def parsed_sopn_tables(self):
+        qs = ParsedSOPN.objects.select_related("sopn__ballot__post__party_set")
+        for parsed_sopn in qs:
+            ballot_paper_id = parsed_sopn.sopn.ballot.ballot_paper_id
+            yield ballot_paper_id, parsed_sopn, parsed_sopn.raw_data
+
+    def handle(self, *args, **options):
+        if options["pdf_dir"]:
+            if not os.path.isdir(options["pdf_dir"]):
+                raise CommandError(
+                    "{} isn't a directory".format(options["pdf_dir"])
+                )
+            tables = self.pdf_tables(options["pdf_dir"])
+        else:
+            tables = self.parsed_sopn_tables()
+
+        party_matchers = PartyMatcherCache()
+        total = 0
+        count = 0
+        for name, parsed_sopn, raw_data in tables:
+            data = pandas.DataFrame.from_dict(json.loads(raw_data))
+            if parsed_sopn:
+                register = parsed_sopn.sopn.ballot.post.party_set.slug
+            else:
+                register = "GB"
+            # Load the parties before timing
+            party_matcher = party_matchers[register.upper()]
+
+            start = time.time()
+            for i in range(options["repeat"]):
+                parse_dataframe(parsed_sopn, data.copy(), party_matcher)
+            elapsed = (time.time() - start) / options["repeat"]
+
+            total += elapsed
+            count += 1
+            self.stdout.write(
+                "{}: {} rows in {:.2f}ms".format(
+                    name, len(data), elapsed * 1000
+                )
+            )
+
+        if count:
+            self.stdout.write(
+                "Parsed {} tables in {:.2f}ms, {:.2f}ms per table".format(
+                    count, total * 1000, total * 1000 / count
+                )
+            )
@@ -1,19 +1,47 @@
+from django.db.models import Count
+
+from official_documents.models import OfficialDocument
 from sopn_parsing.helpers.command_helpers import BaseSOPNParsingCommand
-from sopn_parsing.helpers.extract_pages import extract_pages_for_ballot
+from sopn_parsing.helpers.extract_pages import (
+    group_documents_by_source_url,
+    page_texts_for_documents,
+    save_page_numbers_for_single_document,
+)
 from sopn_parsing.helpers.text_helpers import NoTextInDocumentError
 
 
 class Command(BaseSOPNParsingCommand):
     help = """
-    
+
     Parse documents to extract and set relevant pages from documents that have
     more than one ballot paper
-    
-    Default is to only parse documents for current electons that haven't 
+
+    Default is to only parse documents for current electons that haven't
     already been parsed. Use `all-documents` and `reparse` to change this.
-    
+
+    Ballots are grouped by the source URL of their document, and each
+    distinct file is only parsed once. The text of each file is cached, so
+    reparsing is quick.
+
     """
 
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="The number of processes to parse PDFs with",
+        )
+
+    def save_page_numbers(self, document, page_texts=None):
+        try:
+            save_page_numbers_for_single_document(
+                document, page_texts=page_texts
+            )
+        except (ValueError, NoTextInDocumentError) as e:
+            self.stderr.write(e.args[0])
+
     def handle(self, *args, **options):
         qs = self.get_queryset(options)
         filter_kwargs = {}
@@ -21,8 +49,31 @@ class Command(BaseSOPNParsingCommand):
             if not options["reparse"]:
                 filter_kwargs["officialdocument__relevant_pages"] = None
             qs = qs.filter(**filter_kwargs)
-        for ballot in qs:
-            try:
-                extract_pages_for_ballot(ballot)
-            except (ValueError, NoTextInDocumentError) as e:
-                self.stderr.write(e.args[0])
+
+        documents = group_documents_by_source_url(
+            ballot.sopn for ballot in qs.distinct()
+        )
+
+        # Documents that are the only one with their source URL apply to
+        # the whole file, so don't need parsing
+        shared_source_urls = set(
+            OfficialDocument.objects.filter(
+                source_url__in=[d.source_url for d in documents]
+            )
+            .order_by()
+            .values("source_url")
+            .annotate(count=Count("pk"))
+            .filter(count__gt=1)
+            .values_list("source_url", flat=True)
+        )
+        to_parse = []
+        for document in documents:
+            if document.source_url in shared_source_urls:
+                to_parse.append(document)
+            else:
+                self.save_page_numbers(document)
+
+        for document, page_texts in page_texts_for_documents(
+            to_parse, workers=options["workers"]
+        ):
+            self.save_page_numbers(document, page_texts=page_texts)
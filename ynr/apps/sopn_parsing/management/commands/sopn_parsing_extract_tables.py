@@ -1,14 +1,27 @@
+import time
+
 from sopn_parsing.helpers.command_helpers import BaseSOPNParsingCommand
-from sopn_parsing.helpers.extract_tables import extract_ballot_table
-from sopn_parsing.helpers.text_helpers import NoTextInDocumentError
+from sopn_parsing.helpers.extract_tables import extract_tables_for_documents
 
 
 class Command(BaseSOPNParsingCommand):
     help = """
     Parse tables out of PDFs in to ParsedSOPN models for later parsing.
-    
+
+    Documents are parsed in parallel with `--workers`, and the time taken for
+    each document is reported.
+
     """
 
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="The number of processes to extract tables with",
+        )
+
     def handle(self, *args, **options):
         qs = self.get_queryset(options)
         filter_kwargs = {}
@@ -20,10 +33,35 @@ class Command(BaseSOPNParsingCommand):
 
         # We can't extract tables when we don't know about the pages
         qs = qs.exclude(officialdocument__relevant_pages="")
-        for ballot in qs:
-            try:
-                extract_ballot_table(ballot)
-            except (ValueError, NoTextInDocumentError):
+
+        documents = []
+        for ballot in qs.distinct():
+            document = ballot.sopn
+            if not document.relevant_pages:
                 self.stdout.write(
                     "Skipping {} due to parse error".format(ballot)
                 )
+                continue
+            documents.append(document)
+
+        start = time.time()
+        for document, parsed, seconds, error in extract_tables_for_documents(
+            documents, workers=options["workers"]
+        ):
+            if error:
+                self.stdout.write(
+                    "Skipping {} due to parse error".format(document.ballot)
+                )
+                continue
+            self.stdout.write(
+                "{}: {} in {:.1f}s".format(
+                    document.ballot,
+                    "extracted table" if parsed else "no table found",
+                    seconds,
+                )
+            )
+        self.stdout.write(
+            "Processed {} documents in {:.1f}s".format(
+                len(documents), time.time() - start
+            )
+        )
@@ -1,6 +1,9 @@
 from bulk_adding.models import RawPeople
 from sopn_parsing.helpers.command_helpers import BaseSOPNParsingCommand
-from sopn_parsing.helpers.parse_tables import parse_raw_data_for_ballot
+from sopn_parsing.helpers.parse_tables import (
+    PartyMatcherCache,
+    parse_raw_data_for_ballot,
+)
 
 
 class Command(BaseSOPNParsingCommand):
@@ -49,5 +52,8 @@ class Command(BaseSOPNParsingCommand):
 
             self.stderr.write("\n".join(msg))
 
-        for ballot in qs:
-            parse_raw_data_for_ballot(ballot)
+        # Parties are loaded once for each register, and shared between
+        # ballots
+        party_matchers = PartyMatcherCache()
+        for ballot in qs.select_related("post__party_set"):
+            parse_raw_data_for_ballot(ballot, party_matchers=party_matchers)
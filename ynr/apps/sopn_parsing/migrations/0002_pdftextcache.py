@@ -0,0 +1,46 @@
+# Generated by Django 2.2.4 on 2026-10-18 10:12
+
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("sopn_parsing", "0001_initial")]
+
+    operations = [
+        migrations.CreateModel(
+            name="PDFTextCache",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="created",
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="modified",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64, unique=True),),
+                ("page_texts", models.TextField()),
+            ],
+            options={"abstract": False},
+        )
+    ]
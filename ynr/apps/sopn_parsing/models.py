@@ -35,3 +35,20 @@ class ParsedSOPN(TimeStampedModel):
             return data.to_html(index=False, escape=False).replace(
                 "\\n", "<br>"
             )
+
+
+class PDFTextCache(TimeStampedModel):
+    """
+    The text of each page of a PDF, keyed on a hash of the file's contents.
+
+    Extracting text from a PDF is slow, and one SOPN often covers many
+    ballots, so the text is stored the first time the file is seen and
+    shared between every document with the same contents.
+    """
+
+    content_hash = models.CharField(max_length=64, unique=True)
+    page_texts = models.TextField()
+
+    @property
+    def pages(self):
+        return json.loads(self.page_texts)
@@ -4,9 +4,12 @@ from unittest import skipIf
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
 from django.test import TestCase
+from mock import patch
 
 from candidates.tests.uk_examples import UK2015ExamplesMixin
 from official_documents.models import OfficialDocument
+from sopn_parsing.helpers.extract_pages import parse_pdf_content
+from sopn_parsing.models import PDFTextCache
 from sopn_parsing.tests import should_skip_pdf_tests
 
 
@@ -32,3 +35,32 @@ class TestSOPNHelpers(UK2015ExamplesMixin, TestCase):
         call_command("sopn_parsing_extract_page_numbers")
         doc.refresh_from_db()
         self.assertEqual(doc.relevant_pages, "all")
+
+    @skipIf(should_skip_pdf_tests(), "Required PDF libs not installed")
+    def test_extract_pages_parses_shared_file_once(self):
+        example_doc_path = abspath(
+            join(
+                dirname(__file__),
+                "data/parl.dulwich-and-west-norwood.2015-05-07.pdf",
+            )
+        )
+        content = open(example_doc_path, "rb").read()
+        for ballot in [self.dulwich_post_ballot, self.camberwell_post_ballot]:
+            OfficialDocument.objects.create(
+                ballot=ballot,
+                document_type=OfficialDocument.NOMINATION_PAPER,
+                uploaded_file=SimpleUploadedFile("sopn.pdf", content),
+                source_url="example.com/shared",
+            )
+
+        with patch(
+            "sopn_parsing.helpers.extract_pages.parse_pdf_content",
+            wraps=parse_pdf_content,
+        ) as mock_parse:
+            call_command("sopn_parsing_extract_page_numbers")
+            self.assertEqual(mock_parse.call_count, 1)
+            self.assertEqual(PDFTextCache.objects.count(), 1)
+
+            # The cached text is used when reparsing
+            call_command("sopn_parsing_extract_page_numbers", reparse=True)
+            self.assertEqual(mock_parse.call_count, 1)
@@ -1,5 +1,6 @@
+from collections import namedtuple
 from os.path import abspath, dirname, join
-from unittest import skip, skipIf
+from unittest import mock, skip, skipIf
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
@@ -7,10 +8,91 @@ from django.test import TestCase
 
 from candidates.tests.uk_examples import UK2015ExamplesMixin
 from official_documents.models import OfficialDocument
-from sopn_parsing.helpers.extract_tables import extract_ballot_table
+from sopn_parsing.helpers.extract_tables import (
+    _extract_table_job,
+    extract_ballot_table,
+    extract_tables_for_documents,
+    tables_to_dataframe,
+)
 from sopn_parsing.models import ParsedSOPN
 from sopn_parsing.tests import should_skip_pdf_tests
 
+FakeTable = namedtuple("FakeTable", ["page", "order", "df"])
+
+
+@skipIf(should_skip_pdf_tests(), "Required PDF libs not installed")
+class TestTablesToDataFrame(TestCase):
+    def test_tables_joined_in_page_order(self):
+        import pandas
+
+        tables = [
+            FakeTable(2, 1, pandas.DataFrame([["Jane", "Green"]])),
+            FakeTable(1, 1, pandas.DataFrame([["Name", "Party"]])),
+            FakeTable(
+                3, 1, pandas.DataFrame([["Polling Station", "Ballot numbers"]])
+            ),
+            FakeTable(1, 2, pandas.DataFrame([["John", "Red"]])),
+        ]
+        self.assertEqual(
+            tables_to_dataframe(tables).values.tolist(),
+            [["Name", "Party"], ["John", "Red"], ["Jane", "Green"]],
+        )
+
+    def test_no_tables(self):
+        self.assertIsNone(tables_to_dataframe([]))
+
+
+class TestExtractTableJob(TestCase):
+    @mock.patch(
+        "sopn_parsing.helpers.extract_tables.extract_table_data",
+        side_effect=ValueError("bad table"),
+    )
+    def test_parse_errors_are_returned(self, mock_extract):
+        raw_data, seconds, error = _extract_table_job(
+            ("sopn.pdf", "1", "lattice")
+        )
+        self.assertIsNone(raw_data)
+        self.assertEqual(error, "bad table")
+
+
+class FakeFile:
+    def __init__(self, path):
+        self._path = path
+
+    @property
+    def path(self):
+        if self._path is None:
+            raise ValueError("No file")
+        return self._path
+
+
+class TestExtractTablesForDocuments(TestCase):
+    @mock.patch(
+        "sopn_parsing.helpers.extract_tables.save_table_data",
+        return_value="parsed",
+    )
+    @mock.patch(
+        "sopn_parsing.helpers.extract_tables.extract_table_data",
+        return_value="{}",
+    )
+    def test_unreadable_files_are_skipped(self, mock_extract, mock_save):
+        documents = [
+            mock.Mock(pk=1, relevant_pages="1", uploaded_file=FakeFile(None)),
+            mock.Mock(
+                pk=2, relevant_pages="1", uploaded_file=FakeFile("sopn.pdf")
+            ),
+        ]
+        results = [
+            (document.pk, parsed, error)
+            for document, parsed, seconds, error in (
+                extract_tables_for_documents(documents)
+            )
+        ]
+        self.assertEqual(results, [(1, None, "No file"), (2, "parsed", None)])
+        mock_extract.assert_called_once_with(
+            "sopn.pdf", "1", parse_flavor="lattice"
+        )
+
 
 @skip("Fix backend storage in tests")
 class TestSOPNHelpers(UK2015ExamplesMixin, TestCase):
@@ -6,7 +6,13 @@ from django.test import TestCase
 from bulk_adding.models import RawPeople
 from candidates.tests.uk_examples import UK2015ExamplesMixin
 from official_documents.models import OfficialDocument
-from parties.tests.factories import PartyFactory
+from parties.tests.factories import PartyDescriptionFactory, PartyFactory
+from sopn_parsing.helpers.parse_tables import (
+    PartyMatcher,
+    PartyMatcherCache,
+    find_header_row,
+    parse_dataframe,
+)
 from sopn_parsing.models import ParsedSOPN
 
 
@@ -76,3 +82,77 @@ class TestSOPNHelpers(UK2015ExamplesMixin, TestCase):
                 {"name": "Melanie Jenner", "party_id": "PP53"},
             ],
         )
+
+    def test_header_after_other_rows(self):
+        import pandas
+
+        data = pandas.DataFrame(
+            [
+                ["Statement of Persons Nominated", "", ""],
+                ["Name of \nCandidate", "Home Address", "Description"],
+                ["BRADBURY \nAndrew John", "10 Fowey Close", "Green Party"],
+                ["COLLINS \nDave", "51 Old Fort Road", ""],
+            ]
+        )
+        self.assertEqual(find_header_row(data), 1)
+        self.assertEqual(
+            parse_dataframe(None, data, PartyMatcher("GB")),
+            [
+                {"name": "Andrew John Bradbury", "party_id": "PP63"},
+                {"name": "Dave Collins", "party_id": "ynmp-party:2"},
+            ],
+        )
+
+    def test_no_header(self):
+        import pandas
+
+        data = pandas.DataFrame([["BRADBURY \nAndrew John", "Green Party"]])
+        self.assertIsNone(find_header_row(data))
+        self.assertIsNone(parse_dataframe(None, data, PartyMatcher("GB")))
+
+
+class TestPartyMatcher(UK2015ExamplesMixin, TestCase):
+    def setUp(self):
+        self.party = PartyFactory(ec_id="PP1000", name="Green Tea Party")
+        self.welsh = PartyDescriptionFactory(
+            party=self.party, description="Tea Party | Plaid Te"
+        )
+        self.english = PartyDescriptionFactory(
+            party=self.party, description="Green Tea Party Candidate"
+        )
+        PartyDescriptionFactory(
+            party=PartyFactory(register="NI"), description="Plaid Te"
+        )
+
+    def test_matches_descriptions_without_queries(self):
+        matcher = PartyMatcher("gb")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                matcher.get_description("Tea Party | Plaid Te"), self.welsh
+            )
+            self.assertEqual(
+                matcher.get_description("green tea \nparty"), self.english
+            )
+            self.assertEqual(matcher.get_description("Plaid Te"), self.welsh)
+            self.assertIsNone(matcher.get_description("Coffee Party"))
+            self.assertIsNone(matcher.get_description("Independent"))
+
+    def test_get_party(self):
+        matcher = PartyMatcher("GB")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                matcher.get_party(self.english, "Green Tea Party Candidate"),
+                self.party,
+            )
+            self.assertEqual(
+                matcher.get_party(None, "Green Tea \nParty"), self.party
+            )
+            with self.assertRaises(ValueError):
+                matcher.get_party(None, "Coffee Party")
+        self.assertEqual(matcher.get_party(None, "").ec_id, "ynmp-party:2")
+
+    def test_matcher_cache(self):
+        party_matchers = PartyMatcherCache()
+        with self.assertNumQueries(2):
+            matcher = party_matchers["GB"]
+            self.assertIs(party_matchers["GB"], matcher)
@@ -1,9 +1,13 @@
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.utils import timezone
 
+from api.next.cache import invalidate_serializer_cache
 from candidates.models import LoggedAction
 from candidates.models.db import EditType
 from candidates.views.version_data import get_change_metadata
+from people.models import Person, PersonVersion
+from popolo.models import Membership
 
 
 class TwitterBot(object):
@@ -24,6 +28,17 @@ class TwitterBot(object):
         metadata["username"] = self.user.username
         return metadata
 
+    def logged_action(self, person, metadata):
+        return LoggedAction(
+            user=self.user,
+            person=person,
+            action_type="person-update",
+            ip_address=None,
+            popit_person_new_version=metadata["version_id"],
+            source=metadata["information_source"],
+            edit_type=EditType.BOT.name,
+        )
+
     def save(self, person, msg=None):
         if msg is None:
             msg = "Updated by TwitterBot"
@@ -32,12 +47,51 @@ class TwitterBot(object):
         person.record_version(metadata)
         person.save()
 
-        LoggedAction.objects.create(
-            user=self.user,
-            person=person,
-            action_type="person-update",
-            ip_address=None,
-            popit_person_new_version=metadata["version_id"],
-            source=metadata["information_source"],
-            edit_type=EditType.BOT.name,
+        self.logged_action(person, metadata).save()
+
+    def save_many(self, person_messages):
+        """
+        The same as calling `save` for each `(person_id, [msg, ...])` in
+        `person_messages`, but the people are loaded and the versions and
+        LoggedActions are written in bulk.
+
+        Only the version history of each person is changed, so this should
+        be called after any changes to their related objects are saved.
+        """
+        person_messages = dict(person_messages)
+        if not person_messages:
+            return
+        person_ids = list(person_messages.keys())
+        people = Person.objects.filter(pk__in=person_ids).prefetch_related(
+            "tmp_person_identifiers"
+        )
+        latest_versions = PersonVersion.objects.latest_versions(person_ids)
+
+        logged_actions = []
+        for person in people:
+            for msg in person_messages[person.pk]:
+                metadata = self.get_change_metadata_for_bot(
+                    msg or "Updated by TwitterBot"
+                )
+                person.record_version(
+                    metadata, latest_version=latest_versions.get(person.pk)
+                )
+                logged_actions.append(self.logged_action(person, metadata))
+
+        PersonVersion.objects.save_unsaved_versions(people)
+        # `save` would set `updated_at` too, which the API and CSV exports
+        # use to find changed people
+        now = timezone.now()
+        Person.objects.filter(pk__in=person_ids).update(
+            last_touched=now, updated_at=now
+        )
+        LoggedAction.objects.bulk_create(logged_actions)
+
+        # The `post_save` signal isn't sent for bulk updates
+        invalidate_serializer_cache("person", person_ids)
+        invalidate_serializer_cache(
+            "ballot",
+            Membership.objects.filter(person_id__in=person_ids).values_list(
+                "ballot_id", flat=True
+            ),
         )
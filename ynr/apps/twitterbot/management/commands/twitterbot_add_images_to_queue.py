@@ -1,11 +1,16 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
 import requests
 from django.core.files.base import ContentFile
-from django.core.files.temp import NamedTemporaryFile
 from django.core.management.base import BaseCommand
+from PIL import Image as PillowImage
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from candidates.management.images import get_image_extension
 from moderation_queue.models import CopyrightOptions, QueuedImage
-from people.models import Person
+from people.models import PersonIdentifier, PersonImage
 
 from ..twitter import TwitterAPIData
 
@@ -17,63 +22,93 @@ def verbose(*args, **kwargs):
         print(*args, **kwargs)
 
 
+def is_image(content):
+    try:
+        PillowImage.open(BytesIO(content))
+    except IOError:
+        return False
+    return True
+
+
 class Command(BaseCommand):
 
     help = "Add Twitter avatars for candidates without images to the moderation queue"
 
-    def add_twitter_image_to_queue(self, person, image_url, user_id):
-        if person.queuedimage_set.exists():
-            # Don't add an image to the queue if there is one already
-            # in the queue. It doesn't matter if that queued image has
-            # been moderated or not, or whether it's been rejected or
-            # not. At the moment we just want to be really careful not
-            # to make people check the same Twitter avatar twice.
-            verbose(
-                "  That person already had an image in the queue, so skipping."
-            )
-            return
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="The number of avatars to download at once",
+        )
 
-        verbose("  Adding that person's Twitter avatar to the moderation queue")
-        # Add a new queued image
-        image_url = image_url.replace("_normal.", ".")
-        img_temp = NamedTemporaryFile(delete=True)
-        r = requests.get(image_url)
+    def get_session(self, workers):
+        """
+        A session with a connection for each worker, that retries failed
+        connections and server errors with a backoff
+        """
+        session = requests.Session()
+        retry = Retry(
+            total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504]
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=workers, max_retries=retry
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def download(self, image_url):
+        """
+        Return the content of the image at `image_url` and its md5sum, or
+        `(None, None)` if it couldn't be downloaded or isn't an image.
+
+        This is run in a worker thread, so doesn't touch the database.
+        """
+        try:
+            r = self.session.get(image_url, timeout=30)
+        except requests.RequestException as e:
+            msg = "  Failed to download {url}: {e}"
+            verbose(msg.format(url=image_url, e=e))
+            return None, None
         if r.status_code != 200:
             msg = (
                 "  Ignoring an image URL with non-200 status code "
                 "({status_code}): {url}"
             )
             verbose(msg.format(status_code=r.status_code, url=image_url))
-            return
-        img_temp.write(r.content)
-        img_temp.flush()
+            return None, None
 
-        # Trying to get the image extension checks that this really is
-        # an image:
-        if get_image_extension(img_temp.name) is None:
+        # Check that this really is an image
+        if not is_image(r.content):
             msg = "  The image at {url} wasn't of a known type"
             verbose(msg.format(url=image_url))
-            return
+            return None, None
+        return r.content, hashlib.md5(r.content).hexdigest()
 
-        justification_for_use = (
-            "Auto imported from Twitter: "
-            "https://twitter.com/intent/user?user_id={user_id}".format(
-                user_id=user_id
+    def images_to_queue(self):
+        """
+        Yield the person ID, image URL and Twitter user ID of each avatar
+        that should be added to the queue
+        """
+        # Don't add an image to the queue if there is one already
+        # in the queue. It doesn't matter if that queued image has
+        # been moderated or not, or whether it's been rejected or
+        # not. At the moment we just want to be really careful not
+        # to make people check the same Twitter avatar twice.
+        people_in_queue = set(
+            QueuedImage.objects.exclude(person=None).values_list(
+                "person_id", flat=True
             )
         )
-        qi = QueuedImage(
-            decision=QueuedImage.UNDECIDED,
-            why_allowed=CopyrightOptions.PROFILE_PHOTO,
-            justification_for_use=justification_for_use,
-            person=person,
+        identifiers = (
+            PersonIdentifier.objects.filter(value_type="twitter_username")
+            .exclude(internal_identifier=None)
+            .select_related("person")
+            .order_by("person__name", "person_id")
         )
-        qi.save()
-        qi.image.save(image_url, ContentFile(r.content))
-        qi.save()
-
-    def handle_person(self, person):
-        twitter_identifiers = person.get_identifiers_of_type("twitter_username")
-        for identifier in twitter_identifiers:
+        for identifier in identifiers:
+            person = identifier.person
             user_id = identifier.internal_identifier
 
             if user_id and user_id in self.twitter_data.user_id_to_photo_url:
@@ -82,19 +117,78 @@ class Command(BaseCommand):
                     "user ID: {user_id}"
                 )
                 verbose(msg.format(person=person, user_id=user_id))
-                self.add_twitter_image_to_queue(
-                    person,
-                    self.twitter_data.user_id_to_photo_url[user_id],
-                    user_id,
+                if person.pk in people_in_queue:
+                    verbose(
+                        "  That person already had an image in the queue, so skipping."
+                    )
+                    continue
+
+                verbose(
+                    "  Adding that person's Twitter avatar to the moderation queue"
                 )
+                image_url = self.twitter_data.user_id_to_photo_url[user_id]
+                image_url = image_url.replace("_normal.", ".")
+                # Only queue one avatar for people with more than one
+                # Twitter account
+                people_in_queue.add(person.pk)
+                yield person.pk, image_url, user_id
 
     def handle(self, *args, **options):
         global VERBOSE
         VERBOSE = int(options["verbosity"]) > 1
         self.twitter_data = TwitterAPIData()
         self.twitter_data.update_from_api()
-        # Now go through every person in the database and see if we
-        # should add their Twitter avatar to the image moderation
-        # queue:
-        for person in Person.objects.order_by("name"):
-            self.handle_person(person)
+        self.session = self.get_session(options["workers"])
+
+        to_queue = list(self.images_to_queue())
+        if not to_queue:
+            return
+
+        # Don't queue an image the person already has. Anyone with an
+        # image in the queue has been skipped already, so this only needs
+        # to check their existing images.
+        person_md5sums = set(
+            PersonImage.objects.filter(
+                person_id__in=[person_id for person_id, _, _ in to_queue]
+            )
+            .exclude(md5sum="")
+            .values_list("person_id", "md5sum")
+        )
+
+        queued_images = []
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            downloads = executor.map(
+                self.download, [image_url for _, image_url, _ in to_queue]
+            )
+            # Each image is saved as soon as it's downloaded, so only the
+            # unsaved QueuedImages are kept until they're all created
+            for (person_id, image_url, user_id), (content, md5sum) in zip(
+                to_queue, downloads
+            ):
+                if content is None:
+                    continue
+                if (person_id, md5sum) in person_md5sums:
+                    verbose(
+                        "  The image at {url} is already known, so skipping".format(
+                            url=image_url
+                        )
+                    )
+                    continue
+
+                justification_for_use = (
+                    "Auto imported from Twitter: "
+                    "https://twitter.com/intent/user?user_id={user_id}".format(
+                        user_id=user_id
+                    )
+                )
+                qi = QueuedImage(
+                    decision=QueuedImage.UNDECIDED,
+                    why_allowed=CopyrightOptions.PROFILE_PHOTO,
+                    justification_for_use=justification_for_use,
+                    person_id=person_id,
+                    md5sum=md5sum,
+                )
+                qi.image.save(image_url, ContentFile(content), save=False)
+                queued_images.append(qi)
+
+        QueuedImage.objects.bulk_create(queued_images)
@@ -1,7 +1,11 @@
+from collections import OrderedDict
+
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.utils import timezone
 
-from people.models import Person
+from api.next.cache import invalidate_serializer_cache
+from people.models import Person, PersonIdentifier
 from twitterbot.helpers import TwitterBot
 
 from ..twitter import TwitterAPIData
@@ -20,9 +24,22 @@ class Command(BaseCommand):
         "Use the Twitter API to check / fix Twitter screen names and user IDs"
     )
 
-    def handle_person(self, person):
-        twitter_identifiers = person.get_identifiers_of_type("twitter_username")
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="The number of requests to make to the Twitter API at once",
+        )
+
+    def save_person(self, person, msg=None):
+        """
+        Note that a version needs recording for `person`, once all the
+        identifier changes have been saved
+        """
+        self.person_messages.setdefault(person.pk, []).append(msg)
 
+    def handle_person(self, person, twitter_identifiers):
         # If they have any Twitter user IDs, then check to see if we
         # need to update the screen name from that; if so, update
         # the screen name.  Skip to the next person. This catches
@@ -48,16 +65,16 @@ class Command(BaseCommand):
                             person_url=person.get_absolute_url(),
                         )
                     )
-                    self.twitterbot.save(
+                    self.save_person(
                         person,
                         msg="This Twitter user ID no longer exists; removing it ",
                     )
                     if screen_name:
-                        self.twitterbot.save(
+                        self.save_person(
                             person,
                             msg="This Twitter screen name no longer exists; removing it ",
                         )
-                    identifier.delete()
+                    self.deleted_identifiers.append(identifier)
 
                     return
                 correct_screen_name = self.twitter_data.user_id_to_screen_name[
@@ -70,8 +87,8 @@ class Command(BaseCommand):
                     )
                     print(msg)
                     identifier.value = correct_screen_name
-                    identifier.save()
-                    self.twitterbot.save(person, msg)
+                    self.changed_identifiers.append(identifier)
+                    self.save_person(person, msg)
                 else:
                     verbose(
                         "The screen name ({screen_name}) was already correct".format(
@@ -102,7 +119,7 @@ class Command(BaseCommand):
                         )
                     )
                     identifier.value = ""
-                    identifier.save()
+                    self.changed_identifiers.append(identifier)
                     return
                 print(
                     "Adding the user ID {user_id}".format(
@@ -112,17 +129,11 @@ class Command(BaseCommand):
                     )
                 )
 
-                person.tmp_person_identifiers.update_or_create(
-                    person=person,
-                    value_type="twitter_username",
-                    value=screen_name,
-                    defaults={
-                        "internal_identifier": self.twitter_data.screen_name_to_user_id[
-                            screen_name.lower()
-                        ]
-                    },
-                )
-                self.twitterbot.save(person)
+                identifier.internal_identifier = self.twitter_data.screen_name_to_user_id[
+                    screen_name.lower()
+                ]
+                self.changed_identifiers.append(identifier)
+                self.save_person(person)
             else:
                 verbose(
                     "{person} had no Twitter account information".format(
@@ -130,25 +141,56 @@ class Command(BaseCommand):
                     )
                 )
 
+    def save_changes(self):
+        """
+        Save the changes to identifiers in bulk, and then record a version
+        for each person whose identifiers changed.
+        """
+        now = timezone.now()
+        for identifier in self.changed_identifiers:
+            identifier.modified = now
+        PersonIdentifier.objects.bulk_update(
+            self.changed_identifiers,
+            ["value", "internal_identifier", "modified"],
+        )
+        PersonIdentifier.objects.filter(
+            pk__in=[identifier.pk for identifier in self.deleted_identifiers]
+        ).delete()
+        # The `post_save` signal isn't sent for bulk updates, so touch the
+        # people here. Not everyone gets a version saved, e.g. when an
+        # invalid screen name is blanked, but the API and CSV exports still
+        # need to find them.
+        person_ids = {
+            identifier.person_id
+            for identifier in self.changed_identifiers
+            + self.deleted_identifiers
+        }
+        Person.objects.filter(pk__in=person_ids).update(
+            last_touched=now, updated_at=now
+        )
+        invalidate_serializer_cache("person", list(person_ids))
+
+        self.twitterbot.save_many(self.person_messages.items())
+
     def handle(self, *args, **options):
         global VERBOSE
         VERBOSE = int(options["verbosity"]) > 1
         self.twitterbot = TwitterBot()
-        self.twitter_data = TwitterAPIData()
+        self.twitter_data = TwitterAPIData(workers=options["workers"])
         self.twitter_data.update_from_api()
-        # Now go through every person in the database and check their
-        # Twitter details. This can take a long time, so use one
-        # transaction per person.
-        for person_id in Person.objects.order_by("name").values_list(
-            "pk", flat=True
-        ):
-            with transaction.atomic():
-                # n.b. even though it's inefficient query-wise, we get
-                # each person from the database based on their ID
-                # within the transaction because the loop we're in
-                # takes a long time, other otherwise we might end up
-                # with out of date information (e.g. this has happened
-                # with the person.versions field, with confusing
-                # results...)
-                person = Person.objects.get(pk=person_id)
-                self.handle_person(person)
+
+        # Now check the Twitter details of everyone that has any. Only the
+        # people whose details have changed are saved, all together at the
+        # end, so this is done in one transaction.
+        self.changed_identifiers = []
+        self.deleted_identifiers = []
+        self.person_messages = OrderedDict()
+        with transaction.atomic():
+            identifiers = (
+                PersonIdentifier.objects.filter(value_type="twitter_username")
+                .select_related("person")
+                .order_by("person__name", "person_id")
+            )
+            for identifier in identifiers:
+                self.handle_person(identifier.person, [identifier])
+            self.save_changes()
@@ -1,3 +1,7 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 from django.conf import settings
 from django.utils.six import text_type
@@ -21,8 +25,13 @@ def none_found_error(parsed_result):
 class TwitterAPIData(object):
 
     MAX_IN_A_REQUEST = 100
+    LOOKUP_URL = "https://api.twitter.com/1.1/users/lookup.json"
+    # How long to wait if we're rate limited and Twitter doesn't say when
+    # the limit resets
+    RATE_LIMIT_WAIT = 60
+    MAX_RATE_LIMITED_ATTEMPTS = 3
 
-    def __init__(self):
+    def __init__(self, workers=1):
         self.token = settings.TWITTER_APP_ONLY_BEARER_TOKEN
         if not self.token:
             raise Exception("TWITTER_APP_ONLY_BEARER_TOKEN was not set")
@@ -32,6 +41,10 @@ class TwitterAPIData(object):
         self.screen_name_to_user_id = {}
         self.user_id_to_screen_name = {}
         self.user_id_to_photo_url = {}
+        # Requests can be made `workers` at a time, sharing the rate limit
+        self.workers = workers
+        self.rate_limit_lock = threading.Lock()
+        self.rate_limit_reset = None
 
     def update_id_mapping(self, data):
         user_id = text_type(data["id"])
@@ -69,16 +82,59 @@ class TwitterAPIData(object):
             .values_list("internal_identifier", flat=True)
         )
 
-    def twitter_results(self, key, values):
-        sorted_values = sorted(values)
-        for i in range(0, len(sorted_values), self.MAX_IN_A_REQUEST):
-            some_values = sorted_values[i : (i + self.MAX_IN_A_REQUEST)]
+    def update_rate_limit(self, response):
+        """
+        Record when we can next make a request, if the rate limit headers
+        say we've run out
+        """
+        try:
+            remaining = int(response.headers["x-rate-limit-remaining"])
+            reset = int(response.headers["x-rate-limit-reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self.rate_limit_lock:
+            self.rate_limit_reset = reset if remaining < 1 else None
+
+    def wait_for_rate_limit(self):
+        with self.rate_limit_lock:
+            reset = self.rate_limit_reset
+        if reset:
+            time.sleep(max(reset - time.time(), 0))
+
+    def lookup(self, key, values):
+        """
+        Look up to MAX_IN_A_REQUEST users by `key`, returning the parsed JSON
+        """
+        for attempt in range(self.MAX_RATE_LIMITED_ATTEMPTS):
+            self.wait_for_rate_limit()
             r = requests.post(
-                "https://api.twitter.com/1.1/users/lookup.json",
-                data={key: ",".join(some_values)},
+                self.LOOKUP_URL,
+                data={key: ",".join(values)},
                 headers=self.headers,
             )
-            parsed_result = r.json()
+            self.update_rate_limit(r)
+            if r.status_code != 429:
+                return r.json()
+            with self.rate_limit_lock:
+                if not self.rate_limit_reset:
+                    self.rate_limit_reset = time.time() + self.RATE_LIMIT_WAIT
+        raise Exception("Rate limited by the Twitter API")
+
+    def twitter_results(self, key, values):
+        sorted_values = sorted(values)
+        batches = [
+            sorted_values[i : (i + self.MAX_IN_A_REQUEST)]
+            for i in range(0, len(sorted_values), self.MAX_IN_A_REQUEST)
+        ]
+        if self.workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                parsed_results = list(
+                    executor.map(lambda batch: self.lookup(key, batch), batches)
+                )
+        else:
+            parsed_results = (self.lookup(key, batch) for batch in batches)
+
+        for parsed_result in parsed_results:
             if not none_found_error(parsed_result):
                 for data in parsed_result:
                     yield data
@@ -1,3 +1,9 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs
+
 from django.test import TestCase, override_settings
 from mock import Mock, PropertyMock, call, patch
 
@@ -203,3 +209,73 @@ class TestTwitterData(TestCase):
         mock_requests.post.side_effect = fake_twitter_api_post
         with self.assertRaises(Exception):
             list(twitter_data.twitter_results("screen_name", ["foo", "bar"]))
+
+
+class StubTwitterHandler(BaseHTTPRequestHandler):
+    """
+    Answers users/lookup requests with a user for each screen name. The
+    first request is rate limited.
+    """
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        data = parse_qs(self.rfile.read(length).decode("utf8"))
+        server = self.server
+        with server.lock:
+            server.requests.append(data)
+            rate_limited = len(server.requests) == 1
+        if rate_limited:
+            self.send_response(429)
+            self.send_header("x-rate-limit-remaining", "0")
+            self.send_header("x-rate-limit-reset", str(int(time.time())))
+            self.end_headers()
+            return
+        results = [
+            {"id": len(name), "screen_name": name}
+            for name in data["screen_name"][0].split(",")
+        ]
+        body = json.dumps(results).encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("x-rate-limit-remaining", "100")
+        self.send_header("x-rate-limit-reset", str(int(time.time())))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTwitterDataStubServer(TestCase):
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), StubTwitterHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    @override_settings(TWITTER_APP_ONLY_BEARER_TOKEN="madeuptoken")
+    def test_concurrent_lookups(self):
+        twitter_data = TwitterAPIData(workers=3)
+        twitter_data.MAX_IN_A_REQUEST = 2
+        twitter_data.LOOKUP_URL = "http://127.0.0.1:{}/lookup.json".format(
+            self.server.server_port
+        )
+        screen_names = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff", "g"]
+        twitter_results = list(
+            twitter_data.twitter_results("screen_name", screen_names)
+        )
+        self.assertEqual(
+            twitter_results,
+            [
+                {"id": len(name), "screen_name": name}
+                for name in sorted(screen_names)
+            ],
+        )
+        # One request for each batch of 2, plus the rate limited one
+        self.assertEqual(len(self.server.requests), 5)
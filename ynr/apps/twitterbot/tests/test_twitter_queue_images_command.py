@@ -1,8 +1,10 @@
-import re
+import hashlib
+from io import BytesIO
 
 from django.core.management import call_command
 from django.test import TestCase
-from mock import Mock, call, patch
+from mock import Mock, patch
+from PIL import Image as PillowImage
 
 from candidates.tests.auth import TestUserMixin
 from candidates.tests.output import capture_output, split_output
@@ -12,6 +14,28 @@ from people.models import PersonImage
 from people.tests.factories import PersonFactory
 
 
+def image_data(colour):
+    """
+    A small PNG, so that each avatar has a different md5sum
+    """
+    f = BytesIO()
+    PillowImage.new("RGB", (10, 10), colour).save(f, "PNG")
+    return f.getvalue()
+
+
+AVATARS = {
+    "https://pbs.twimg.com/profile_images/abc/foo.jpg": image_data("red"),
+    "https://pbs.twimg.com/profile_images/def/bar.jpg": image_data("green"),
+    "https://pbs.twimg.com/profile_images/ghi/baz.jpg": image_data("blue"),
+    "https://pbs.twimg.com/profile_images/jkl/quux.jpg": image_data("white"),
+    "https://pbs.twimg.com/profile_images/mno/xyzzy.jpg": image_data("black"),
+}
+
+
+def fake_get_avatar(url, *args, **kwargs):
+    return Mock(content=AVATARS[url], status_code=200)
+
+
 @patch("twitterbot.management.commands.twitterbot_add_images_to_queue.requests")
 @patch(
     "twitterbot.management.commands.twitterbot_add_images_to_queue.TwitterAPIData"
@@ -100,6 +124,11 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
             QueuedImage.objects.values_list("pk", flat=True)
         )
 
+    def requested_urls(self, mock_requests):
+        return sorted(
+            c[1][0] for c in mock_requests.Session.return_value.get.mock_calls
+        )
+
     def test_command(self, mock_twitter_data, mock_requests):
 
         mock_twitter_data.return_value.user_id_to_photo_url = {
@@ -110,9 +139,7 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
             "1006": "https://pbs.twimg.com/profile_images/mno/xyzzy.jpg",
         }
 
-        mock_requests.get.return_value = Mock(
-            content=self.example_image_binary_data, status_code=200
-        )
+        mock_requests.Session.return_value.get.side_effect = fake_get_avatar
 
         call_command("twitterbot_add_images_to_queue")
 
@@ -121,10 +148,10 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
         )
 
         self.assertEqual(
-            mock_requests.get.mock_calls,
+            self.requested_urls(mock_requests),
             [
-                call("https://pbs.twimg.com/profile_images/mno/xyzzy.jpg"),
-                call("https://pbs.twimg.com/profile_images/abc/foo.jpg"),
+                "https://pbs.twimg.com/profile_images/abc/foo.jpg",
+                "https://pbs.twimg.com/profile_images/mno/xyzzy.jpg",
             ],
         )
 
@@ -150,9 +177,7 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
             "1006": "https://pbs.twimg.com/profile_images/mno/xyzzy.jpg",
         }
 
-        mock_requests.get.return_value = Mock(
-            content=self.example_image_binary_data, status_code=200
-        )
+        mock_requests.Session.return_value.get.side_effect = fake_get_avatar
 
         with capture_output() as (out, err):
             call_command("twitterbot_add_images_to_queue", verbosity=3)
@@ -181,8 +206,8 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
         )
 
         self.assertEqual(
-            mock_requests.get.mock_calls,
-            [call("https://pbs.twimg.com/profile_images/mno/xyzzy.jpg")],
+            self.requested_urls(mock_requests),
+            ["https://pbs.twimg.com/profile_images/mno/xyzzy.jpg"],
         )
 
         self.assertEqual(new_queued_images.count(), 1)
@@ -213,11 +238,9 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
                     content=self.example_image_binary_data, status_code=404
                 )
             else:
-                return Mock(
-                    content=self.example_image_binary_data, status_code=200
-                )
+                return fake_get_avatar(url)
 
-        mock_requests.get.side_effect = fake_get
+        mock_requests.Session.return_value.get.side_effect = fake_get
 
         call_command("twitterbot_add_images_to_queue")
 
@@ -226,10 +249,10 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
         )
 
         self.assertEqual(
-            mock_requests.get.mock_calls,
+            self.requested_urls(mock_requests),
             [
-                call("https://pbs.twimg.com/profile_images/mno/xyzzy.jpg"),
-                call("https://pbs.twimg.com/profile_images/abc/foo.jpg"),
+                "https://pbs.twimg.com/profile_images/abc/foo.jpg",
+                "https://pbs.twimg.com/profile_images/mno/xyzzy.jpg",
             ],
         )
 
@@ -262,19 +285,17 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
             if url == "https://pbs.twimg.com/profile_images/abc/foo.jpg":
                 return Mock(content=b"I am not an image.", status_code=200)
             else:
-                return Mock(
-                    content=self.example_image_binary_data, status_code=200
-                )
+                return fake_get_avatar(url)
 
-        mock_requests.get.side_effect = fake_get
+        mock_requests.Session.return_value.get.side_effect = fake_get
 
         with capture_output() as (out, err):
-            call_command("twitterbot_add_images_to_queue")
+            call_command("twitterbot_add_images_to_queue", verbosity=3)
 
-        output_lines = split_output(out)
-        self.assertEqual(len(output_lines), 1)
-        self.assertTrue(
-            re.search(r"^Ignoring a non-image file \S+$", output_lines[0])
+        self.assertIn(
+            "  The image at https://pbs.twimg.com/profile_images/abc/foo.jpg "
+            "wasn't of a known type",
+            split_output(out),
         )
 
         new_queued_images = QueuedImage.objects.exclude(
@@ -282,10 +303,10 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
         )
 
         self.assertEqual(
-            mock_requests.get.mock_calls,
+            self.requested_urls(mock_requests),
             [
-                call("https://pbs.twimg.com/profile_images/mno/xyzzy.jpg"),
-                call("https://pbs.twimg.com/profile_images/abc/foo.jpg"),
+                "https://pbs.twimg.com/profile_images/abc/foo.jpg",
+                "https://pbs.twimg.com/profile_images/mno/xyzzy.jpg",
             ],
         )
 
@@ -300,3 +321,83 @@ class TestTwitterImageQueueCommand(TestUserMixin, TestCase):
             newly_enqueued.justification_for_use,
             "Auto imported from Twitter: https://twitter.com/intent/user?user_id=1006",
         )
+
+    def test_skip_known_images(self, mock_twitter_data, mock_requests):
+        mock_twitter_data.return_value.user_id_to_photo_url = {
+            "1001": "https://pbs.twimg.com/profile_images/abc/foo.jpg",
+            "1006": "https://pbs.twimg.com/profile_images/mno/xyzzy.jpg",
+        }
+        mock_requests.Session.return_value.get.side_effect = fake_get_avatar
+        # The person already has this image
+        PersonImage.objects.filter(
+            person=self.p_existing_image_but_none_in_queue
+        ).update(
+            md5sum=hashlib.md5(
+                AVATARS["https://pbs.twimg.com/profile_images/mno/xyzzy.jpg"]
+            ).hexdigest()
+        )
+
+        call_command("twitterbot_add_images_to_queue")
+
+        self.assertEqual(
+            self.requested_urls(mock_requests),
+            [
+                "https://pbs.twimg.com/profile_images/abc/foo.jpg",
+                "https://pbs.twimg.com/profile_images/mno/xyzzy.jpg",
+            ],
+        )
+        self.assertEqual(
+            list(
+                QueuedImage.objects.exclude(
+                    id__in=self.existing_queued_image_ids
+                ).values_list("person__name", flat=True)
+            ),
+            ["Person With No Existing Images"],
+        )
+
+    def test_same_image_for_different_people(
+        self, mock_twitter_data, mock_requests
+    ):
+        # Two people can share an avatar, e.g. a party logo, and each of
+        # them should still have it checked
+        mock_twitter_data.return_value.user_id_to_photo_url = {
+            "1001": "https://pbs.twimg.com/profile_images/abc/foo.jpg",
+            "1006": "https://pbs.twimg.com/profile_images/abc/foo.jpg",
+        }
+        mock_requests.Session.return_value.get.side_effect = fake_get_avatar
+        # It's been queued for someone else before
+        QueuedImage.objects.filter(pk=self.existing_rejected_image.pk).update(
+            md5sum=hashlib.md5(
+                AVATARS["https://pbs.twimg.com/profile_images/abc/foo.jpg"]
+            ).hexdigest()
+        )
+
+        call_command("twitterbot_add_images_to_queue")
+
+        self.assertEqual(
+            sorted(
+                QueuedImage.objects.exclude(
+                    id__in=self.existing_queued_image_ids
+                ).values_list("person__name", flat=True)
+            ),
+            [
+                "Person With An Existing Image But None In The Queue",
+                "Person With No Existing Images",
+            ],
+        )
+
+    def test_queued_image_md5sum(self, mock_twitter_data, mock_requests):
+        mock_twitter_data.return_value.user_id_to_photo_url = {
+            "1001": "https://pbs.twimg.com/profile_images/abc/foo.jpg"
+        }
+        mock_requests.Session.return_value.get.side_effect = fake_get_avatar
+
+        call_command("twitterbot_add_images_to_queue")
+
+        queued_image = QueuedImage.objects.get(person=self.p_no_images)
+        self.assertEqual(
+            queued_image.md5sum,
+            hashlib.md5(
+                AVATARS["https://pbs.twimg.com/profile_images/abc/foo.jpg"]
+            ).hexdigest(),
+        )
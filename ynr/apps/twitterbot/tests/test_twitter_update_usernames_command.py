@@ -2,6 +2,7 @@ from django.core.management import call_command
 from django.test import TestCase, override_settings
 from mock import Mock, patch
 
+from candidates.models import LoggedAction
 from candidates.tests.auth import TestUserMixin
 from candidates.tests.output import capture_output, split_output
 from people.tests.factories import PersonFactory
@@ -231,12 +232,19 @@ class TestUpdateTwitterUsernamesCommand(TestUserMixin, TestCase):
             )
 
         mock_requests.post.side_effect = fake_post_screen_name_disappeared
+        updated_at = self.just_screen_name.updated_at
+        last_touched = self.just_screen_name.last_touched
 
         with capture_output() as (out, err):
             call_command("twitterbot_update_usernames")
 
         self.assertEqual(self.just_screen_name.get_twitter_username, "")
         self.assertEqual(self.just_screen_name.get_twitter_username, "")
+        # Removing the identifier leaves nothing with a timestamp behind, so
+        # the person's is updated
+        self.just_screen_name.refresh_from_db()
+        self.assertGreater(self.just_screen_name.updated_at, updated_at)
+        self.assertGreater(self.just_screen_name.last_touched, last_touched)
 
         self.assertEqual(
             split_output(out),
@@ -285,6 +293,7 @@ class TestUpdateTwitterUsernamesCommand(TestUserMixin, TestCase):
             )
 
         mock_requests.post.side_effect = fake_post_user_id_disappeared
+        last_touched = self.just_userid.last_touched
 
         self.assertEqual(
             self.screen_name_and_user_id.get_twitter_username,
@@ -295,6 +304,8 @@ class TestUpdateTwitterUsernamesCommand(TestUserMixin, TestCase):
 
         self.assertIsNone(self.just_userid.get_twitter_username)
         self.assertEqual(self.just_userid.get_twitter_username, None)
+        self.just_userid.refresh_from_db()
+        self.assertGreater(self.just_userid.last_touched, last_touched)
 
         # Clear the cached_property for this object
         del self.screen_name_and_user_id.get_all_idenfitiers
@@ -319,3 +330,21 @@ class TestUpdateTwitterUsernamesCommand(TestUserMixin, TestCase):
                 ),
             ],
         )
+
+    @override_settings(TWITTER_APP_ONLY_BEARER_TOKEN="madeuptoken")
+    def test_commmand_only_saves_changed_people(self, mock_requests):
+        mock_requests.post.side_effect = fake_post_for_username_updater
+
+        with capture_output() as (out, err):
+            call_command("twitterbot_update_usernames")
+
+        self.assertEqual(
+            sorted(LoggedAction.objects.values_list("person_id", flat=True)),
+            sorted([self.just_screen_name.pk, self.just_userid.pk]),
+        )
+        self.assertEqual(
+            self.just_userid.version_set.first().information_source,
+            "Correcting the screen name from None to "
+            "ascreennamewewereunawareof",
+        )
+        self.assertFalse(self.screen_name_and_user_id.version_set.exists())
@@ -1,4 +1,13 @@
-from django.db.models import Transform
+from functools import lru_cache
+
+from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import Exists, OuterRef, Transform
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+# The number of objects to check for related objects in each query
+RELATED_OBJECTS_BATCH_SIZE = 1000
 
 
 class LastWord(Transform):
@@ -18,3 +27,80 @@ class LastWord(Transform):
 
     def as_postgresql(self, compiler, connection):
         return self.as_sql(compiler, connection)
+
+
+@lru_cache(maxsize=None)
+def get_dependent_relations(model):
+    """
+    Return the relations to `model` of objects that depend on it: those
+    that would be deleted along with it, or that stop it being deleted.
+
+    Relations that are set to NULL or left alone don't count, as deleting
+    wouldn't lose any data from them.
+    """
+    relations = []
+    for relation in get_candidate_relations_to_delete(model._meta):
+        if relation.on_delete in (models.CASCADE, models.PROTECT):
+            relations.append(relation)
+    for field in model._meta.private_fields:
+        if isinstance(field, GenericRelation):
+            relations.append(field)
+    return relations
+
+
+def get_dependent_queryset(model, relation):
+    """
+    Return a queryset of the objects related to the outer `model` object by
+    `relation`, for use in an `Exists` subquery
+    """
+    if isinstance(relation, GenericRelation):
+        content_type = ContentType.objects.get_for_model(
+            model, for_concrete_model=relation.for_concrete_model
+        )
+        return relation.remote_field.model._base_manager.filter(
+            **{
+                relation.content_type_field_name: content_type,
+                relation.object_id_field_name: OuterRef("pk"),
+            }
+        )
+    field = relation.field
+    return relation.related_model._base_manager.filter(
+        **{field.attname: OuterRef(field.target_field.attname)}
+    )
+
+
+def get_related_object_labels(model, pks):
+    """
+    Return a dict of the labels of the models with objects that depend on
+    each of the `model` objects with `pks`, leaving out objects that nothing
+    depends on.
+
+    This gives the same answer as collecting the objects that would be
+    deleted with `NestedObjects`, but with an `EXISTS` subquery per relation
+    in one query for a batch of objects, rather than a query per relation
+    for each object.
+    """
+    relations = get_dependent_relations(model)
+    pks = list(pks)
+    if not relations or not pks:
+        return {}
+    annotations = {
+        "related_{}".format(i): Exists(get_dependent_queryset(model, relation))
+        for i, relation in enumerate(relations)
+    }
+    labels = [relation.related_model._meta.label for relation in relations]
+
+    related = {}
+    for start in range(0, len(pks), RELATED_OBJECTS_BATCH_SIZE):
+        rows = (
+            model._base_manager.filter(
+                pk__in=pks[start : start + RELATED_OBJECTS_BATCH_SIZE]
+            )
+            .annotate(**annotations)
+            .values_list("pk", *annotations)
+        )
+        for pk, *exists in rows:
+            row_labels = [label for label, e in zip(labels, exists) if e]
+            if row_labels:
+                related[pk] = row_labels
+    return related